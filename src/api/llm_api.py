@@ -1,12 +1,38 @@
+import gc
 import os
+import copy
+import math
+import ctypes
+import inspect
+import time
+import hashlib
 import torch
 import logging
 import json
-from datetime import datetime
-from typing import Optional, Dict, Any, List
+import threading
+from collections import Counter
+from typing import Optional, Dict, Any, List, Iterator, Tuple, Callable
+from contextlib import contextmanager
 from dataclasses import dataclass
-from flask import Flask, jsonify, request
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from flask import Flask, Response, jsonify, request, stream_with_context
+from transformers import (
+    AutoModelForCausalLM, AutoTokenizer, LogitsProcessorList, StoppingCriteriaList, TextIteratorStreamer
+)
+from utils.log_chunker import ChunkedAnalyzer
+from utils.response_cache import ResponseCache, file_digest
+from utils.report_index import ReportIndex
+from utils.log_templates import compress_report
+from utils.report_compactors import COMPACTOR_VERSION, compact_report
+from utils.report_tokens import STRATEGIES, ReportTokenCache, TokenBudgetPlanner
+from utils.results_store import LLMResultsStore
+from utils.stopping_criteria import GENERATION_INTERRUPTED, AnswerStoppingCriteria, InterruptCriteria
+from utils.decoding_constraints import LeadingStructureSuppressor, classify_vocabulary
+from utils.llm_sessions import SESSION_BUSY, SESSION_EXPIRED, SESSION_FULL, SessionStore, crop_past_key_values
+from utils.llm_backends import create_backend
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.cpu_optimizations import compile_forward, configure_onednn, measure_throughput, restore_forward
+from utils.model_router import DEPTHS, route_question
+from utils.report_digests import DIGEST_INSTRUCTION, DIGEST_MAP_INSTRUCTION, DigestInterrupted, ReportDigestStore, digest_answers_question
 
 
 @dataclass
@@ -17,6 +43,17 @@ class LLMResponse:
     error: Optional[str] = None
 
 
+@dataclass
+class ModelTier:
+    """A model LLMAPI routes questions to, with its batcher and admission queue"""
+    name: str
+    llm: Any
+    generator: Any
+    admission: AdmissionController
+    # Plans prompts with report token counts from this model's tokenizer
+    budget_planner: TokenBudgetPlanner
+
+
 class LLMConfig:
     """Configuration class for LLM settings"""
     def __init__(
@@ -27,6 +64,50 @@ class LLMConfig:
         top_p: float = 0.9,
         num_return_sequences: int = 1,
         max_new_tokens: int = 1024,
+        precision: str = "fp32",
+        cache_dir: Optional[str] = None,
+        max_batch_size: int = 4,
+        batch_window_ms: int = 50,
+        chunk_tokens: Optional[int] = None,
+        max_chunks: Optional[int] = 64,
+        chunk_concurrency: int = 4,
+        map_max_new_tokens: int = 192,
+        use_prefix_cache: bool = True,
+        deterministic: bool = False,
+        response_cache_entries: int = 128,
+        response_cache_bytes: int = 64 * 1024 * 1024,
+        retrieval_top_k: int = 8,
+        retrieval_chunk_tokens: int = 96,
+        draft_model_name_or_path: Optional[str] = None,
+        num_assistant_tokens: int = 5,
+        budget_strategy: str = "proportional",
+        results_retention_days: Optional[int] = 90,
+        results_max_entries: Optional[int] = 10000,
+        stop_sequences: Optional[List[str]] = None,
+        stop_on_sections: bool = True,
+        repetition_max_period: int = 32,
+        suppress_structured_output: bool = True,
+        session_max_tokens: int = 4096,
+        session_max_total_tokens: int = 16384,
+        max_sessions: int = 8,
+        session_idle_seconds: int = 900,
+        backend: str = "transformers",
+        onnx_model_path: Optional[str] = None,
+        onnx_threads: Optional[int] = None,
+        backend_url: Optional[str] = None,
+        backend_model: Optional[str] = None,
+        backend_api_key: Optional[str] = None,
+        backend_pool_size: int = 4,
+        backend_timeout: float = 300,
+        admission_max_concurrent: Optional[int] = None,
+        admission_max_queue: int = 16,
+        request_deadline_seconds: float = 300,
+        idle_unload_minutes: Optional[float] = None,
+        optimize: bool = False,
+        compile_mode: str = "default",
+        report_digests: bool = True,
+        digest_max_new_tokens: int = 256,
+        compact_reports: bool = True,
     ):
         self.model_name_or_path = model_name_or_path
         self.max_length = max_length
@@ -34,26 +115,177 @@ class LLMConfig:
         self.top_p = top_p
         self.num_return_sequences = num_return_sequences
         self.max_new_tokens = max_new_tokens
+        self.precision = precision  # One of: fp32, bf16, int8, int4
+        self.cache_dir = cache_dir  # Where converted (low-precision) weights are cached
+        self.max_batch_size = max_batch_size  # Concurrent requests merged into one generate call
+        self.batch_window_ms = batch_window_ms  # How long the scheduler waits to fill a batch
+        self.chunk_tokens = chunk_tokens  # Token budget per chunk in chunked mode (None = derive from max_length)
+        self.max_chunks = max_chunks  # Upper bound on chunks analyzed per request, findings first (None = all)
+        self.chunk_concurrency = chunk_concurrency  # Chunks extracted per batched generate call
+        self.map_max_new_tokens = map_max_new_tokens  # Generation cap for per-chunk extraction
+        self.use_prefix_cache = use_prefix_cache  # Reuse the preamble's precomputed key/values
+        self.deterministic = deterministic  # Greedy decoding so cached answers are reproducible
+        self.response_cache_entries = response_cache_entries  # In-memory LRU size of the response cache
+        self.response_cache_bytes = response_cache_bytes  # On-disk size limit of the response cache
+        self.retrieval_top_k = retrieval_top_k  # Chunks retrieved per question in retrieval mode
+        self.retrieval_chunk_tokens = retrieval_chunk_tokens  # Approximate size of indexed report chunks
+        self.draft_model_name_or_path = draft_model_name_or_path  # Small same-tokenizer model for speculative decoding
+        self.num_assistant_tokens = num_assistant_tokens  # Tokens drafted per verification step
+        self.budget_strategy = budget_strategy  # Default context allocation: proportional, recency or findings
+        self.results_retention_days = results_retention_days  # Analysis history kept this long (None = forever)
+        self.results_max_entries = results_max_entries  # Cap on stored analyses (None = unlimited)
+        # Generation ends at any of these; by default when the model starts inventing the next user turn
+        self.stop_sequences = ["\nUser:"] if stop_sequences is None else stop_sequences
+        self.stop_on_sections = stop_on_sections  # Stop once the Practical Tips section is finished
+        self.repetition_max_period = repetition_max_period  # Longest repeated token block detected (0 = off)
+        self.suppress_structured_output = suppress_structured_output  # Ban answers opening with {, [ or <
+        self.session_max_tokens = session_max_tokens  # Context length one conversation session may grow to
+        self.session_max_total_tokens = session_max_total_tokens  # Key/value cache budget across all sessions
+        self.max_sessions = max_sessions  # Sessions kept before the least recently used is evicted
+        self.session_idle_seconds = session_idle_seconds  # Sessions unused this long are dropped
+        self.backend = backend  # Generation engine: transformers, onnxruntime or openai_http
+        self.onnx_model_path = onnx_model_path  # Exported decoder (.onnx file or directory; default <model>/onnx)
+        self.onnx_threads = onnx_threads  # ONNX Runtime intra-op threads (None = one per core)
+        self.backend_url = backend_url  # Base URL of an OpenAI-compatible server, e.g. http://127.0.0.1:8080/v1
+        self.backend_model = backend_model  # Model name sent to the server (default: model directory name)
+        self.backend_api_key = backend_api_key  # Bearer token for the server, if it requires one
+        self.backend_pool_size = backend_pool_size  # Keep-alive connections kept open to the server
+        self.backend_timeout = backend_timeout  # Seconds to wait on the server before failing a request
+        self.admission_max_concurrent = admission_max_concurrent  # Requests generating at once (None = max_batch_size)
+        self.admission_max_queue = admission_max_queue  # Requests waiting for the model before new ones get 429
+        self.request_deadline_seconds = request_deadline_seconds  # Longest a request may wait and run (clients may ask for less)
+        self.idle_unload_minutes = idle_unload_minutes  # Release the weights after this long unused (None = keep resident)
+        self.optimize = optimize  # torch.compile + SDPA attention + oneDNN settings (transformers backend)
+        self.compile_mode = compile_mode  # torch.compile mode: default, reduce-overhead or max-autotune
+        self.report_digests = report_digests  # Summarize new reports in the background and answer from the summaries
+        self.digest_max_new_tokens = digest_max_new_tokens  # Generation cap for one report digest
+        self.compact_reports = compact_reports  # Rewrite JSON reports into dense per-scan-type text before prompting
         self.device = "cpu"
 
 
 class MistralLLMAPI:
     """API class for interacting with Mistral on CPU"""
+    PRECISIONS = ("fp32", "bf16", "int8", "int4")
+    # Prompt and generation length used to measure the compiled mode
+    OPTIMIZE_SAMPLE_TOKENS = 128
+    OPTIMIZE_SAMPLE_NEW_TOKENS = 16
+    SYSTEM_PREAMBLE = (
+        "You are a helpful AI assistant specializing in system log analysis. "
+        "Your goal is to provide clear and concise answers to the user's questions about the logs they provided. "
+        "Always respond in plain English, avoiding structured data formats like JSON, XML, or tables.\n\n"
+        "When answering, consider the following:\n"
+        "- Provide a clear answer to the user's question based on the log content.\n"
+        "- Explain your reasoning in plain English, using simple terms and relatable examples where necessary.\n"
+        "- Avoid using any structured data formats (e.g., JSON or XML).\n"
+        "- Highlight potential risks or insights from the logs when applicable.\n\n"
+        "Below is the input for analysis:\n\n"
+    )
+
     def __init__(self, config: LLMConfig):
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.device = torch.device("cpu")
-        self.model = None
+        self.backend = create_backend(config)
+        self.precision = config.precision  # Precision actually loaded; int4 falls back to int8 without optimum-quanto
+        self.model = None  # Set by the transformers backend
         self.tokenizer = None
+        self.offset_tokenizer = None
+        self._offset_lock = threading.Lock()  # The warm-up thread and request threads share offset_tokenizer
         self.initialized = False
+        self.prefix_cache = None
+        self.draft_model = None
+        self.vocabulary_classes = None  # (structured_ids, blank_ids) for the structured-output constraint
+        self.generation_stats = {"generations": 0, "discarded": 0}
+        self.sessions = SessionStore(
+            max_sessions=config.max_sessions,
+            max_total_tokens=config.session_max_total_tokens,
+            idle_seconds=config.session_idle_seconds
+        )
+        self._stats_lock = threading.Lock()
+        self._forward_counts = threading.local()
+        self._interrupt = threading.local()  # InterruptCriteria of an ``interruptible`` block, per thread
+        self._background = threading.local()  # Set inside a ``background`` block, per thread
+        self._init_lock = threading.Lock()
+        self.state = "not_loaded"  # not_loaded -> loading -> ready | failed
+        self.load_stage = None
+        self.load_started = None
+        self.load_seconds = None
+        self.load_error = None
+        # Weights may be released while idle and reloaded on the next generation; the tokenizer stays loaded
+        self._residency_lock = threading.Lock()
+        self._active = 0
+        self.last_used = time.monotonic()
+        self.residency = {"unloads": 0, "reloads": 0, "last_reload_seconds": None}
+        self.optimization = None  # Outcome of the opt-in compiled mode, see optimize_model
+        self.attention_fallback = None  # Why SDPA attention was not used, if it was requested
+
+    def start_background_initialize(self) -> threading.Thread:
+        """Load the model on a daemon thread so the web server can start immediately"""
+        self.state = "loading"
+        thread = threading.Thread(target=self.initialize, name="llm-loader", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def ready(self) -> bool:
+        return self.initialized
+
+    def status(self) -> Dict[str, Any]:
+        """Loading state and progress for the readiness endpoint"""
+        elapsed = None
+        if self.load_started is not None:
+            elapsed = round((self.load_seconds if self.load_seconds is not None
+                             else time.perf_counter() - self.load_started), 2)
+        return {
+            "state": self.state,
+            "stage": self.load_stage,
+            "elapsed_seconds": elapsed,
+            "load_seconds": self.load_seconds,
+            "precision": self.precision,
+            "error": self.load_error,
+            "backend": self.backend.status(),
+            "generations": dict(self.generation_stats, discard_rate=self.discard_rate()),
+            "sessions": self.sessions.stats(),
+            "residency": self.residency_status(),
+            "optimization": self.optimization
+        }
+
+    def residency_status(self) -> Dict[str, Any]:
+        """Whether the weights are in memory, how long they have been idle and what reloading cost"""
+        return dict(
+            self.residency,
+            resident=self.initialized and self.backend.loaded,
+            active_generations=self._active,
+            idle_seconds=round(time.monotonic() - self.last_used, 1),
+            idle_unload_minutes=self.config.idle_unload_minutes
+        )
+
+    def discard_rate(self) -> float:
+        """Share of generations replaced with canned text because they were structured data"""
+        with self._stats_lock:
+            total = self.generation_stats["generations"]
+            return round(self.generation_stats["discarded"] / total, 4) if total else 0.0
 
     def initialize(self) -> bool:
         """Initialize the LLM model and tokenizer"""
         if self.initialized:
             return True
 
+        with self._init_lock:
+            if self.initialized:
+                return True
+            return self._initialize()
+
+    def _initialize(self) -> bool:
+        self.state = "loading"
+        self.load_started = time.perf_counter()
+        self.load_seconds = None
+        self.load_error = None
         try:
-            self.logger.info(f"Initializing Mistral model from {self.config.model_name_or_path} on CPU")
+            self.logger.info(
+                f"Initializing Mistral model from {self.config.model_name_or_path} on CPU ({self.backend.name} backend)"
+            )
+            self.load_stage = "tokenizer"
 
             self.tokenizer = AutoTokenizer.from_pretrained(
                 self.config.model_name_or_path,
@@ -63,24 +295,333 @@ class MistralLLMAPI:
 
             if self.tokenizer.pad_token is None:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
+            # Decoder-only models must be left-padded for batched generation
+            self.tokenizer.padding_side = "left"
+            # Separate instance for report tokenization (guarded by _offset_lock); fast tokenizers are not reentrant
+            self.offset_tokenizer = copy.deepcopy(self.tokenizer)
+            if self.config.suppress_structured_output:
+                self.vocabulary_classes = classify_vocabulary(self.tokenizer)
 
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.config.model_name_or_path,
-                torch_dtype=torch.float32,
-                trust_remote_code=True,
-                pad_token_id=self.tokenizer.pad_token_id,
-                low_cpu_mem_usage=True
-            ).to(self.device)
-
-            self.model.eval()
+            self._load_weights()
             self.initialized = True
-            self.logger.info("Mistral model initialization successful on CPU")
+            self.state = "ready"
+            self.load_stage = None
+            self.load_seconds = round(time.perf_counter() - self.load_started, 2)
+            self.last_used = time.monotonic()
+            if self.config.idle_unload_minutes:
+                threading.Thread(target=self._unload_when_idle, name="llm-idle-unload", daemon=True).start()
+            self.logger.info(
+                f"Mistral model initialization successful on CPU ({self.precision}) in {self.load_seconds}s"
+            )
             return True
 
         except Exception as e:
             self.logger.error(f"Failed to initialize Mistral model: {str(e)}")
+            self.state = "failed"
+            self.load_error = str(e)
+            self.load_seconds = round(time.perf_counter() - self.load_started, 2)
             return False
 
+    def _load_weights(self) -> None:
+        """Load the generation engine plus the draft model and preamble cache built on it"""
+        self.load_stage = "weights"
+        self.backend.load(self)
+
+        if self.backend.supports_cache_reuse:
+            self.model.register_forward_pre_hook(self._count_forward("main"))
+            if self.config.optimize:
+                self.load_stage = "optimize"
+                self.optimize_model()
+            if self.config.draft_model_name_or_path:
+                self.load_stage = "draft_model"
+                self.draft_model = self.load_draft_model()
+        elif self.config.draft_model_name_or_path:
+            self.logger.warning("Speculative decoding needs the transformers backend; ignoring the draft model")
+        elif self.config.optimize:
+            self.logger.warning(f"Compiled mode applies to the transformers backend; {self.backend.name} is unchanged")
+
+        self.prefix_cache = None
+        if self.config.use_prefix_cache and self.backend.supports_cache_reuse and self.draft_model is None:
+            self.load_stage = "prefix_cache"
+            try:
+                self.build_prefix_cache()
+            except Exception as e:
+                self.logger.warning(f"Preamble KV-cache unavailable, prefilling full prompts: {str(e)}")
+
+    def optimize_model(self) -> None:
+        """Compile the model for CPU generation, falling back to eager mode on failure.
+
+        Throughput is measured on the preamble before and after compiling, so
+        ``optimization`` shows whether the compiled mode pays off on this
+        host. Warm-up runs two prompt lengths so the dynamic-shape graph is
+        compiled at load time rather than on the first question. Reloads after
+        an idle unload keep the first load's outcome and skip the measurements
+        and warm-up; the forward is compiled again on first use, mostly from
+        inductor's on-disk caches.
+        """
+        report = self.optimization
+        if report is not None:
+            if report["enabled"]:
+                compile_forward(self.model, self.config.compile_mode)
+                report["recompiles"] = report.get("recompiles", 0) + 1
+            return
+
+        sample_ids = self.tokenizer(self.SYSTEM_PREAMBLE, return_tensors="pt")['input_ids'][:, :self.OPTIMIZE_SAMPLE_TOKENS]
+        sample_ids = sample_ids.to(self.device)
+        pad_token_id = self.tokenizer.pad_token_id
+        report = {
+            "mode": self.config.compile_mode,
+            "attention": getattr(self.model.config, "_attn_implementation", "eager"),
+            "attention_fallback": self.attention_fallback
+        }
+        measure_throughput(self.model, sample_ids, 2, pad_token_id)
+        report["eager"] = measure_throughput(self.model, sample_ids, self.OPTIMIZE_SAMPLE_NEW_TOKENS, pad_token_id)
+
+        original_forward = None
+        started = time.perf_counter()
+        try:
+            report["onednn"] = configure_onednn()
+            original_forward = compile_forward(self.model, self.config.compile_mode)
+            for length in (sample_ids.shape[1], sample_ids.shape[1] // 2):
+                measure_throughput(self.model, sample_ids[:, :length], self.OPTIMIZE_SAMPLE_NEW_TOKENS, pad_token_id)
+            report["warmup_seconds"] = round(time.perf_counter() - started, 2)
+            report["compiled"] = measure_throughput(self.model, sample_ids, self.OPTIMIZE_SAMPLE_NEW_TOKENS, pad_token_id)
+            report["speedup"] = {
+                phase: round(report["compiled"][key] / report["eager"][key], 2) if report["eager"][key] else None
+                for phase, key in (("prefill", "prefill_tokens_per_second"), ("decode", "decode_tokens_per_second"))
+            }
+            report.update(enabled=True, fallback=None)
+            self.logger.info(f"Compiled model in {report['warmup_seconds']}s; speedup {report['speedup']}")
+        except Exception as e:
+            if original_forward is not None:
+                restore_forward(self.model, original_forward)
+            report.update(enabled=False, fallback=str(e), compiled=None, speedup=None)
+            self.logger.warning(f"torch.compile unavailable, running the model in eager mode: {str(e)}")
+        self.optimization = report
+
+    @contextmanager
+    def model_in_use(self):
+        """Hold the weights resident for one generation, reloading them if they were unloaded while idle"""
+        self.ensure_initialized()
+        with self._residency_lock:
+            if not self.backend.loaded:
+                started = time.perf_counter()
+                self.logger.info("Reloading model weights after idle unload")
+                self._load_weights()
+                self.load_stage = None
+                self.residency["reloads"] += 1
+                self.residency["last_reload_seconds"] = round(time.perf_counter() - started, 2)
+                self.logger.info(f"Model weights reloaded in {self.residency['last_reload_seconds']}s")
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._residency_lock:
+                self._active -= 1
+                if not self.in_background():
+                    self.last_used = time.monotonic()
+
+    def unload(self) -> bool:
+        """Release the weights and key/value caches, keeping the tokenizer.
+
+        Returns False when there is nothing to release or a generation is
+        running. The next generation reloads the weights; safetensors and the
+        conversion cache are memory-mapped, so a reload mostly pages weights
+        back in from the OS page cache.
+        """
+        with self._residency_lock:
+            if not self.initialized or self._active or not self.backend.holds_weights or not self.backend.loaded:
+                return False
+            self.backend.unload()
+            self.model = None
+            self.draft_model = None
+            self.prefix_cache = None
+            self.sessions.clear()
+            self.residency["unloads"] += 1
+        gc.collect()
+        self._trim_heap()
+        self.logger.info("Unloaded model weights")
+        return True
+
+    def _unload_when_idle(self) -> None:
+        limit = self.config.idle_unload_minutes * 60
+        while True:
+            time.sleep(max(1.0, min(60.0, limit / 4)))
+            idle = time.monotonic() - self.last_used
+            if idle >= limit and self.backend.loaded and self.unload():
+                self.logger.info(f"Weights released after {idle:.0f}s without LLM requests")
+
+    @staticmethod
+    def _trim_heap() -> None:
+        """Ask glibc to hand freed pages back to the OS; a no-op elsewhere"""
+        try:
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+    def _from_pretrained(self, path: str, dtype: torch.dtype):
+        """Load causal LM weights from a local path or hub id.
+
+        Local safetensors shards are preferred: they are memory-mapped, so
+        weights are paged in from the OS page cache instead of being copied
+        through a pickle load.
+        """
+        kwargs = {}
+        if os.path.isdir(path) and any(name.endswith(".safetensors") for name in os.listdir(path)):
+            kwargs["use_safetensors"] = True
+
+        def load(**extra):
+            return AutoModelForCausalLM.from_pretrained(
+                path,
+                torch_dtype=dtype,
+                trust_remote_code=True,
+                pad_token_id=self.tokenizer.pad_token_id,
+                low_cpu_mem_usage=True,
+                **kwargs,
+                **extra
+            )
+
+        if self.config.optimize:
+            # Fused scaled-dot-product attention where this transformers version implements it for the model
+            try:
+                return load(attn_implementation="sdpa")
+            except (ValueError, TypeError) as e:
+                self.attention_fallback = str(e).split(". ")[0]
+                self.logger.info(f"SDPA attention unavailable, using eager attention: {self.attention_fallback}")
+        return load()
+
+    def weights_fingerprint(self) -> str:
+        """Short hash of the checkpoint files' names, sizes and mtimes, so edited weights are converted again"""
+        path = self.config.model_name_or_path
+        if not os.path.isdir(path):
+            return "hub"
+        files = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith((".safetensors", ".bin", ".pt", ".json")):
+                stat = os.stat(os.path.join(path, name))
+                files.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+        return hashlib.sha256("|".join(files).encode("utf-8")).hexdigest()[:12]
+
+    def conversion_cache_path(self, precision: str) -> Optional[str]:
+        """Path of the cached converted weights for a precision, if caching is enabled"""
+        if not self.config.cache_dir:
+            return None
+        model_name = os.path.basename(os.path.normpath(self.config.model_name_or_path))
+        return os.path.join(
+            self.config.cache_dir,
+            f"{model_name}-{self.weights_fingerprint()}-{precision}-torch{torch.__version__.split('+')[0]}"
+        )
+
+    def load_model(self):
+        """Load the model in the configured precision, reusing cached conversions"""
+        precision = self.config.precision
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unsupported precision '{precision}', expected one of {self.PRECISIONS}")
+        self.precision = precision
+
+        if precision == "fp32":
+            return self._from_pretrained(self.config.model_name_or_path, torch.float32)
+
+        if precision == "bf16":
+            return self._load_bf16()
+
+        if precision == "int4":
+            try:
+                from optimum.quanto import quantize, freeze, qint4
+            except ImportError:
+                self.logger.warning("4-bit weight-only quantization unavailable (optimum-quanto not installed); using int8")
+                self.precision = "int8"
+            else:
+                return self._load_quantized("int4", lambda model: self._quantize_int4(model, quantize, freeze, qint4))
+
+        return self._load_quantized(
+            "int8",
+            lambda model: torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        )
+
+    def _load_bf16(self):
+        """Load bf16 weights, saving a bf16 safetensors copy on first conversion"""
+        cache_path = self.conversion_cache_path("bf16")
+        if cache_path and os.path.exists(os.path.join(cache_path, "config.json")):
+            self.logger.info(f"Loading cached bf16 weights from {cache_path}")
+            return self._from_pretrained(cache_path, torch.bfloat16)
+
+        model = self._from_pretrained(self.config.model_name_or_path, torch.bfloat16)
+        if cache_path:
+            self.logger.info(f"Caching bf16 weights in {cache_path}")
+            model.save_pretrained(cache_path, safe_serialization=True)
+        return model
+
+    def _load_quantized(self, precision: str, convert):
+        """Load a quantized model from the conversion cache or convert from fp32"""
+        cache_path = self.conversion_cache_path(precision)
+        cache_file = os.path.join(cache_path, "model.pt") if cache_path else None
+        if cache_file and os.path.exists(cache_file):
+            self.logger.info(f"Loading cached {precision} model from {cache_file}")
+            # The cache holds a pickled module written by this class, not an external checkpoint
+            kwargs = {"mmap": True} if "mmap" in inspect.signature(torch.load).parameters else {}
+            return torch.load(cache_file, map_location="cpu", weights_only=False, **kwargs)
+
+        self.logger.info(f"Converting model weights to {precision}")
+        model = convert(self._from_pretrained(self.config.model_name_or_path, torch.float32))
+        if cache_file:
+            os.makedirs(cache_path, exist_ok=True)
+            torch.save(model, cache_file)
+            self.logger.info(f"Cached {precision} model in {cache_file}")
+        return model
+
+    def load_draft_model(self):
+        """Load the small draft model used to propose tokens for speculative decoding"""
+        dtype = torch.bfloat16 if self.precision == "bf16" else torch.float32
+        self.logger.info(f"Loading draft model from {self.config.draft_model_name_or_path}")
+        draft_model = self._from_pretrained(self.config.draft_model_name_or_path, dtype).to(self.device)
+        draft_model.eval()
+        draft_model.generation_config.num_assistant_tokens = self.config.num_assistant_tokens
+        draft_model.register_forward_pre_hook(self._count_forward("draft"))
+        return draft_model
+
+    def _count_forward(self, name: str):
+        """Forward pre-hook counting passes per thread while a generation is being measured"""
+        def hook(module, args):
+            counts = getattr(self._forward_counts, "counts", None)
+            if counts is not None:
+                counts[name] += 1
+        return hook
+
+    def speculative_generate(self, **kwargs):
+        """Run model.generate, drafting with the assistant model when one is loaded.
+
+        Returns (outputs, stats) where stats holds draft acceptance counters or
+        None when speculative decoding is off.
+        """
+        if self.draft_model is None:
+            return self.backend.generate(**kwargs), None
+
+        self._forward_counts.counts = {"main": 0, "draft": 0}
+        try:
+            outputs = self.backend.generate(assistant_model=self.draft_model, **kwargs)
+            counts = self._forward_counts.counts
+        finally:
+            self._forward_counts.counts = None
+
+        # Every main-model pass verifies the draft and contributes one token of its own
+        new_tokens = getattr(outputs, "sequences", outputs).shape[1] - kwargs["input_ids"].shape[1]
+        accepted = max(0, new_tokens - counts["main"])
+        return outputs, {
+            "draft_tokens": counts["draft"],
+            "verification_passes": counts["main"],
+            "accepted_tokens": accepted,
+            "acceptance_rate": round(accepted / counts["draft"], 3) if counts["draft"] else 0.0,
+            "tokens_per_pass": round(new_tokens / counts["main"], 2) if counts["main"] else 0.0
+        }
+
+    @staticmethod
+    def _quantize_int4(model, quantize, freeze, qint4):
+        """Apply 4-bit weight-only quantization to the linear layers"""
+        quantize(model, weights=qint4)
+        freeze(model)
+        return model
+
     def ensure_initialized(self) -> None:
         """Ensure the model and tokenizer are initialized before use"""
         if not self.initialized:
@@ -90,18 +631,11 @@ class MistralLLMAPI:
 
     def format_prompt(self, messages: List[Dict[str, str]]) -> str:
         """Format messages into a structured prompt for the LLM"""
-        formatted_text = (
-            "You are a helpful AI assistant specializing in system log analysis. "
-            "Your goal is to provide clear and concise answers to the user's questions about the logs they provided. "
-            "Always respond in plain English, avoiding structured data formats like JSON, XML, or tables.\n\n"
-            "When answering, consider the following:\n"
-            "- Provide a clear answer to the user's question based on the log content.\n"
-            "- Explain your reasoning in plain English, using simple terms and relatable examples where necessary.\n"
-            "- Avoid using any structured data formats (e.g., JSON or XML).\n"
-            "- Highlight potential risks or insights from the logs when applicable.\n\n"
-            "Below is the input for analysis:\n\n"
-        )
+        return (self.SYSTEM_PREAMBLE + self.format_messages(messages)).strip()
 
+    def format_messages(self, messages: List[Dict[str, str]]) -> str:
+        """Format the conversation turns that follow the system preamble"""
+        formatted_text = ""
         for msg in messages:
             role = str(msg.get("role", "")).lower()
             content = str(msg.get("content", ""))
@@ -110,57 +644,289 @@ class MistralLLMAPI:
             elif role == "assistant":
                 formatted_text += f"Assistant: {content}\n\n"
 
-        return formatted_text.strip()
+        return formatted_text
 
-    def generate_response(self, messages: List[Dict[str, str]]) -> LLMResponse:
-        """Generate a response from the model"""
-        self.ensure_initialized()
-        try:
-            prompt = self.format_prompt(messages)
+    def prefix_cache_key(self) -> str:
+        """Identifies the preamble/model pair the cached key/values were computed for"""
+        return hashlib.sha256(
+            f"{self.config.model_name_or_path}|{self.precision}|{self.SYSTEM_PREAMBLE}".encode("utf-8")
+        ).hexdigest()
+
+    def build_prefix_cache(self) -> None:
+        """Prefill the fixed preamble once so requests only prefill their own suffix"""
+        prefix_ids = self.tokenizer(self.SYSTEM_PREAMBLE, return_tensors="pt")['input_ids'].to(self.device)
+        with torch.no_grad():
+            outputs = self.model(input_ids=prefix_ids, use_cache=True)
+
+        past_key_values = outputs.past_key_values
+        if hasattr(past_key_values, "to_legacy_cache"):
+            past_key_values = past_key_values.to_legacy_cache()
+
+        self.prefix_cache = {
+            "key": self.prefix_cache_key(),
+            "input_ids": prefix_ids,
+            "past_key_values": past_key_values
+        }
+        self.logger.info(f"Cached key/values for {prefix_ids.shape[1]} preamble tokens")
+
+    def get_prefix_cache(self) -> Optional[Dict[str, Any]]:
+        """Return the preamble cache, rebuilding it if the preamble or model changed"""
+        if not self.config.use_prefix_cache or self.config.num_return_sequences != 1 or self.draft_model is not None:
+            return None
+        if not self.backend.supports_cache_reuse:  # The preamble's key/values cannot be handed to the engine
+            return None
+        if self.prefix_cache is None or self.prefix_cache["key"] != self.prefix_cache_key():
+            self.build_prefix_cache()
+        return self.prefix_cache
+
+    def prepare_inputs(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Tokenize a conversation into model.generate inputs.
+
+        When the preamble cache is available only the conversation suffix is
+        tokenized; it is appended to the cached preamble ids and the cached
+        key/values are passed so generate prefills just the suffix.
+        """
+        prefix = self.get_prefix_cache()
+        if prefix is None:
             encoded = self.tokenizer(
-                prompt,
+                self.format_prompt(messages),
                 return_tensors="pt",
                 padding=True,
                 truncation=True,
                 max_length=self.config.max_length
             )
+            return {
+                "input_ids": encoded['input_ids'].to(self.device),
+                "attention_mask": encoded['attention_mask'].to(self.device)
+            }
 
-            input_ids = encoded['input_ids'].to(self.device)
-            attention_mask = encoded['attention_mask'].to(self.device)
-            input_length = input_ids.shape[1]
+        prefix_length = prefix["input_ids"].shape[1]
+        suffix_ids = self.tokenizer(
+            self.format_messages(messages).strip(),
+            return_tensors="pt",
+            add_special_tokens=False,
+            truncation=True,
+            max_length=max(1, self.config.max_length - prefix_length)
+        )['input_ids'].to(self.device)
+
+        input_ids = torch.cat([prefix["input_ids"], suffix_ids], dim=1)
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "past_key_values": prefix["past_key_values"]
+        }
+
+    def session_inputs(self, session, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Append a follow-up turn to a session; only the new turn is prefilled"""
+        turn_ids = self.tokenizer(
+            "\n\n" + self.format_messages(messages).strip(),
+            return_tensors="pt",
+            add_special_tokens=False
+        )['input_ids'].to(self.device)
+        input_ids = torch.cat([session.input_ids, turn_ids], dim=1)
+        if self.config.session_max_tokens - input_ids.shape[1] < 64:
+            raise ValueError(SESSION_FULL)
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "past_key_values": session.past_key_values
+        }
+
+    def has_session(self, session_id: str) -> bool:
+        return session_id in self.sessions
+
+    def end_session(self, session_id: str) -> bool:
+        """Drop a session's cached key/values"""
+        return self.sessions.discard(session_id)
+
+    def cached_prefix_length(self, inputs: Dict[str, Any]) -> int:
+        """Number of prompt tokens served from the preamble cache"""
+        if "past_key_values" not in inputs:
+            return 0
+        return inputs["past_key_values"][0][0].shape[2]
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens the tokenizer produces for a piece of text"""
+        self.ensure_initialized()
+        return len(self.tokenizer(text, add_special_tokens=False)['input_ids'])
+
+    def tokenize_with_offsets(self, text: str) -> Tuple[List[int], List[int]]:
+        """Token ids of a text and the character offset where each token ends"""
+        self.ensure_initialized()
+        with self._offset_lock:
+            encoded = self.offset_tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        return encoded['input_ids'], [end for _, end in encoded['offset_mapping']]
+
+    def generation_kwargs(self, **overrides) -> Dict[str, Any]:
+        """Sampling parameters passed to model.generate"""
+        kwargs = {
+            "max_new_tokens": self.config.max_new_tokens,
+            "num_return_sequences": self.config.num_return_sequences,
+            "temperature": self.config.temperature,
+            "top_p": self.config.top_p,
+            "do_sample": True,
+            "pad_token_id": self.tokenizer.pad_token_id,
+            "eos_token_id": self.tokenizer.eos_token_id
+        }
+        if self.config.deterministic:
+            kwargs["do_sample"] = False
+            del kwargs["temperature"], kwargs["top_p"]
+        kwargs.update(overrides)
+        return kwargs
+
+    def answer_stopper(self, prompt_length: int) -> AnswerStoppingCriteria:
+        """Stopping criteria that end generation once the answer is complete"""
+        return AnswerStoppingCriteria(
+            self.tokenizer,
+            prompt_length,
+            stop_sequences=self.config.stop_sequences,
+            stop_on_sections=self.config.stop_on_sections,
+            repetition_max_period=self.config.repetition_max_period
+        )
+
+    def stopping_criteria(self, stopper: AnswerStoppingCriteria) -> StoppingCriteriaList:
+        """``stopper`` plus the interrupt check of an enclosing ``interruptible`` block on this thread"""
+        criteria = StoppingCriteriaList([stopper])
+        interrupt = getattr(self._interrupt, "criteria", None)
+        if interrupt is not None:
+            criteria.append(interrupt)
+        return criteria
+
+    @contextmanager
+    def interruptible(self, should_stop: Callable[[], bool]):
+        """Let generations on this thread end early once ``should_stop()`` is true.
+
+        Yields the InterruptCriteria; once its ``interrupted`` flag is set,
+        generations in the block stop at their next token and later ones
+        return an error without prefilling.
+        """
+        criteria = InterruptCriteria(should_stop)
+        self._interrupt.criteria = criteria
+        try:
+            yield criteria
+        finally:
+            self._interrupt.criteria = None
+
+    @contextmanager
+    def background(self, enabled: bool = True):
+        """Generations on this thread do not count as use, so background work never holds off the idle unload"""
+        previous = self.in_background()
+        self._background.active = enabled
+        try:
+            yield
+        finally:
+            self._background.active = previous
 
+    def in_background(self) -> bool:
+        """Whether this thread is inside a ``background`` block"""
+        return getattr(self._background, "active", False)
+
+    def interrupted(self) -> bool:
+        """Check the enclosing ``interruptible`` block before starting a generation"""
+        interrupt = getattr(self._interrupt, "criteria", None)
+        return interrupt is not None and interrupt(None, None)
+
+    def logits_processors(self, prompt_length: int) -> LogitsProcessorList:
+        """Decoding constraints applied to every generate call"""
+        processors = LogitsProcessorList()
+        if self.vocabulary_classes is not None:
+            processors.append(LeadingStructureSuppressor(prompt_length, *self.vocabulary_classes))
+        return processors
+
+    def postprocess_text(self, response_text: str) -> str:
+        """Ensure response is plain English"""
+        response_text = response_text.strip()
+        discarded = response_text.startswith("{") or response_text.startswith("[")
+        with self._stats_lock:
+            self.generation_stats["generations"] += 1
+            self.generation_stats["discarded"] += discarded
+        if discarded:
+            self.logger.warning("Detected structured data format in response; rephrasing to plain English.")
+            response_text = (
+                "The logs were analyzed successfully. Key insights include system activities, "
+                "potential risks, and normal operations, all summarized in simple terms."
+            )
+        return response_text
+
+    def build_metadata(self, input_length: int, output_length: int) -> Dict[str, Any]:
+        """Metadata returned alongside every response"""
+        return {
+            "input_length": input_length,
+            "output_length": output_length,
+            "device": self.device.type,
+            "backend": self.backend.name,
+            "precision": self.precision,
+            "temperature": self.config.temperature,
+            "top_p": self.config.top_p,
+            "deterministic": self.config.deterministic,
+        }
+
+    def cache_params(self) -> Dict[str, Any]:
+        """Settings that change the generated text, used in response cache keys"""
+        return {
+            "model": self.config.model_name_or_path,
+            "backend": self.backend.name,
+            "precision": self.precision,
+            "max_length": self.config.max_length,
+            "max_new_tokens": self.config.max_new_tokens,
+            "temperature": self.config.temperature,
+            "top_p": self.config.top_p,
+            "deterministic": self.config.deterministic,
+            "stopping": [self.config.stop_sequences, self.config.stop_on_sections, self.config.repetition_max_period],
+            "suppress_structured_output": self.config.suppress_structured_output,
+            "preamble": hashlib.sha256(self.SYSTEM_PREAMBLE.encode("utf-8")).hexdigest()
+        }
+
+    def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        session_id: Optional[str] = None,
+        start_session: bool = False
+    ) -> LLMResponse:
+        """Generate a response from the model.
+
+        With ``start_session`` the conversation's key/values are kept for
+        follow-ups; a follow-up passes the returned ``session_id`` and only the
+        new question in ``messages``.
+        """
+        if session_id or start_session:
+            for event in self.stream_response(messages, session_id=session_id, start_session=start_session):
+                if event.get("done"):
+                    return event["response"]
+
+        if self.interrupted():
+            return LLMResponse(text="", metadata={}, error=GENERATION_INTERRUPTED)
+        with self.model_in_use():
+            return self._generate_response(messages)
+
+    def _generate_response(self, messages: List[Dict[str, str]]) -> LLMResponse:
+        try:
+            inputs = self.prepare_inputs(messages)
+            input_length = inputs["input_ids"].shape[1]
+
+            stopper = self.answer_stopper(input_length)
             with torch.no_grad():
-                outputs = self.model.generate(
-                    input_ids=input_ids,
-                    attention_mask=attention_mask,
-                    max_new_tokens=self.config.max_new_tokens,
-                    num_return_sequences=self.config.num_return_sequences,
-                    temperature=self.config.temperature,
-                    top_p=self.config.top_p,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.pad_token_id,
-                    eos_token_id=self.tokenizer.eos_token_id
+                outputs, speculative = self.speculative_generate(
+                    **inputs,
+                    stopping_criteria=self.stopping_criteria(stopper),
+                    logits_processor=self.logits_processors(input_length),
+                    **self.generation_kwargs()
                 )
 
             generated_tokens = outputs[0][input_length:]
-            response_text = self.tokenizer.decode(generated_tokens, skip_special_tokens=True).strip()
-
-            # Ensure response is plain English
-            if response_text.startswith("{") or response_text.startswith("["):
-                self.logger.warning("Detected structured data format in response; rephrasing to plain English.")
-                response_text = (
-                    "The logs were analyzed successfully. Key insights include system activities, "
-                    "potential risks, and normal operations, all summarized in simple terms."
-                )
-
-            metadata = {
-                "input_length": input_length,
-                "output_length": len(outputs[0]),
-                "device": self.device.type,
-                "temperature": self.config.temperature,
-                "top_p": self.config.top_p,
-            }
+            stop = stopper.finish(
+                0,
+                self.tokenizer.decode(generated_tokens, skip_special_tokens=True),
+                len(generated_tokens),
+                self.config.max_new_tokens
+            )
+            response_text = self.postprocess_text(stop.pop("text"))
 
+            metadata = self.build_metadata(input_length, len(outputs[0]))
+            metadata.update(stop)
+            metadata["prefix_cached_tokens"] = self.cached_prefix_length(inputs)
+            if speculative:
+                metadata["speculative"] = speculative
             return LLMResponse(
                 text=response_text,
                 metadata=metadata
@@ -174,88 +940,975 @@ class MistralLLMAPI:
                 error=str(e)
             )
 
+    def generate_batch(
+        self,
+        batch: List[List[Dict[str, str]]],
+        max_new_tokens: Optional[int] = None
+    ) -> List[LLMResponse]:
+        """Generate responses for several conversations in one left-padded generate call"""
+        if self.interrupted():
+            return [LLMResponse(text="", metadata={}, error=GENERATION_INTERRUPTED) for _ in batch]
+        with self.model_in_use():
+            return self._generate_batch(batch, max_new_tokens)
 
-class LLMResultsManager:
-    """Manages storing and retrieving LLM results"""
-    def __init__(self, data_dir):
-        self.results_file = os.path.join(data_dir, 'llm_scan_results.json')
-        os.makedirs(data_dir, exist_ok=True)
-
-    def save_result(self, question, response, logs_analyzed):
-        results = self.load_results()
-        results.append({
-            'timestamp': datetime.now().isoformat(),
-            'question': question,
-            'response': response,
-            'logs_analyzed': logs_analyzed
-        })
-        results = results[-10:]
-        with open(self.results_file, 'w') as f:
-            json.dump(results, f, indent=2)
-
-    def load_results(self):
-        if not os.path.exists(self.results_file):
-            return []
+    def _generate_batch(self, batch: List[List[Dict[str, str]]], max_new_tokens: Optional[int]) -> List[LLMResponse]:
         try:
-            with open(self.results_file, 'r') as f:
-                return json.load(f)
-        except Exception:
-            return []
+            encoded = self.tokenizer(
+                [self.format_prompt(messages) for messages in batch],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=self.config.max_length
+            )
+            input_ids = encoded['input_ids'].to(self.device)
+            attention_mask = encoded['attention_mask'].to(self.device)
+            padded_length = input_ids.shape[1]
+            max_new_tokens = max_new_tokens or self.config.max_new_tokens
+
+            # Runs until every row is complete; rows that finish early are trimmed below
+            stopper = self.answer_stopper(padded_length)
+            with torch.no_grad():
+                outputs = self.backend.generate(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    stopping_criteria=self.stopping_criteria(stopper),
+                    logits_processor=self.logits_processors(padded_length),
+                    **self.generation_kwargs(num_return_sequences=1, max_new_tokens=max_new_tokens)
+                )
+
+            responses = []
+            for row, output in enumerate(outputs):
+                generated_tokens = output[padded_length:]
+                input_length = int(attention_mask[row].sum())
+                generated_length = int((generated_tokens != self.tokenizer.pad_token_id).sum())
+                stop = stopper.finish(
+                    row,
+                    self.tokenizer.decode(generated_tokens, skip_special_tokens=True),
+                    generated_length,
+                    max_new_tokens
+                )
+                response_text = self.postprocess_text(stop.pop("text"))
+                metadata = self.build_metadata(input_length, input_length + generated_length)
+                metadata.update(stop)
+                metadata["batch_size"] = len(batch)
+                responses.append(LLMResponse(text=response_text, metadata=metadata))
+            return responses
+
+        except Exception as e:
+            self.logger.error(f"Error generating batched response: {str(e)}")
+            return [LLMResponse(text="", metadata={}, error=str(e)) for _ in batch]
+
+    def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        session_id: Optional[str] = None,
+        start_session: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """Generate a response, yielding decoded text as it is produced.
+
+        Yields {"token": text} events while generating and a final
+        {"done": True, "response": LLMResponse} event. Session arguments work
+        as in ``generate_response``.
+        """
+        with self.model_in_use():
+            yield from self._stream_response(messages, session_id, start_session)
+
+    def _stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        session_id: Optional[str],
+        start_session: bool
+    ) -> Iterator[Dict[str, Any]]:
+        session = None
+        if session_id:
+            try:
+                session = self.sessions.checkout(session_id)
+            except (KeyError, RuntimeError) as e:
+                yield {"done": True, "response": LLMResponse(text="", metadata={}, error=e.args[0])}
+                return
+        try:
+            if session is not None:
+                inputs = self.session_inputs(session, messages)
+            else:
+                inputs = self.prepare_inputs(messages)
+            # Backends that cannot hand back key/values answer without keeping a session
+            keep_state = session is not None or (start_session and self.backend.supports_cache_reuse)
+            input_length = inputs["input_ids"].shape[1]
+            max_new_tokens = self.config.max_new_tokens
+            if keep_state:
+                max_new_tokens = min(max_new_tokens, self.config.session_max_tokens - input_length)
+            start_time = time.perf_counter()
+
+            streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+            stopper = self.answer_stopper(input_length)
+            generation_error = []
+            generation_result = []
+            speculative = {}
+
+            def run_generation():
+                try:
+                    kwargs = dict(
+                        inputs,
+                        streamer=streamer,
+                        stopping_criteria=self.stopping_criteria(stopper),
+                        logits_processor=self.logits_processors(input_length),
+                        **self.generation_kwargs(num_return_sequences=1, max_new_tokens=max_new_tokens)
+                    )
+                    with torch.no_grad():
+                        if keep_state:
+                            # Sessions need the key/values back, which assisted generation does not return
+                            generation_result.append(self.backend.generate(return_dict_in_generate=True, **kwargs))
+                        else:
+                            _, stats = self.speculative_generate(**kwargs)
+                            speculative.update(stats or {})
+                except Exception as e:
+                    generation_error.append(e)
+                    streamer.end()
+
+            worker = threading.Thread(target=run_generation, name="llm-stream", daemon=True)
+            worker.start()
+
+            chunks = []
+            first_token_time = None
+            for text in streamer:
+                if not text:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - start_time
+                chunks.append(text)
+                yield {"token": text}
+            worker.join()
+
+            if generation_error:
+                raise generation_error[0]
+
+            full_text = "".join(chunks)
+            if keep_state:
+                sequences = generation_result[0].sequences
+                generated = sequences[0, input_length:].tolist()
+                output_tokens = len(generated)
+            else:
+                output_tokens = len(self.tokenizer(full_text, add_special_tokens=False)['input_ids'])
+            # Text already streamed past a stop point is dropped from the final response
+            stop = stopper.finish(0, full_text, output_tokens, max_new_tokens)
+            full_text = stop.pop("text")
+            metadata = self.build_metadata(input_length, input_length + output_tokens)
+            metadata.update(stop)
+            metadata["time_to_first_token"] = round(first_token_time, 3) if first_token_time else None
+            metadata["streamed"] = True
+            metadata["prefix_cached_tokens"] = self.cached_prefix_length(inputs)
+            if speculative:
+                metadata["speculative"] = speculative
+
+            if keep_state:
+                # Keep the conversation up to where the answer was cut, so follow-ups see the trimmed text
+                kept = input_length + stopper.kept_tokens(0, generated)
+                saved = self.sessions.save(
+                    sequences[:, :kept],
+                    crop_past_key_values(generation_result[0].past_key_values, kept),
+                    session
+                )
+                session = None
+                metadata["session"] = {
+                    "id": saved.session_id,
+                    "turns": saved.turns,
+                    "cached_tokens": saved.tokens,
+                    "prefilled_tokens": input_length - metadata["prefix_cached_tokens"]
+                }
+            yield {"done": True, "response": LLMResponse(text=self.postprocess_text(full_text), metadata=metadata)}
+
+        except Exception as e:
+            self.logger.error(f"Error streaming response: {str(e)}")
+            yield {"done": True, "response": LLMResponse(text="", metadata={}, error=str(e))}
+        finally:
+            if session is not None:
+                self.sessions.release(session)
 
 
 class LLMAPI:
     """Flask API wrapper for MistralLLMAPI"""
-    def __init__(self, app, llm_api):
+    # Seconds between scans for new reports to tokenize
+    TOKEN_WARM_INTERVAL = 15
+    # Seconds between scans for reports that still need a digest
+    DIGEST_INTERVAL = 30
+    # Earlier exchanges replayed when a follow-up primes a new session
+    MAX_HISTORY_TURNS = 4
+
+    def __init__(self, app, llm_api, scheduler=None, quick_llm=None, quick_scheduler=None):
         self.app = app
         self.llm_api = llm_api
+        # Requests go through the micro-batching scheduler when one is configured
+        self.generator = scheduler or llm_api
+        self.chunked_analyzer = ChunkedAnalyzer(llm_api)
         self.logger = logging.getLogger(__name__)
         self.REPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "log_reports")
-        self.results_manager = LLMResultsManager(os.path.join(os.path.dirname(__file__), '..', 'data'))
+        self.report_index = ReportIndex(self.REPORTS_DIR, chunk_tokens=llm_api.config.retrieval_chunk_tokens)
+        # Build the initial index off the request path; later queries only index new reports
+        threading.Thread(target=self.report_index.refresh, name="report-index", daemon=True).start()
+        # Each tier counts report tokens with its own tokenizer so budgets match the prompt it is sent
+        token_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'report_tokens')
+        self.report_tokens = self.report_token_cache(llm_api, token_dir)
+        self.budget_planner = TokenBudgetPlanner(self.report_tokens, self.REPORTS_DIR)
+        self.report_digests = ReportDigestStore(
+            os.path.join(os.path.dirname(__file__), '..', 'data', 'report_digests'),
+            self.REPORTS_DIR
+        )
+        self.results_manager = LLMResultsStore(
+            os.path.join(os.path.dirname(__file__), '..', 'data'),
+            retention_days=llm_api.config.results_retention_days,
+            max_entries=llm_api.config.results_max_entries
+        )
+        self.response_cache = ResponseCache(
+            os.path.join(os.path.dirname(__file__), '..', 'data', 'llm_cache'),
+            max_entries=llm_api.config.response_cache_entries,
+            max_bytes=llm_api.config.response_cache_bytes
+        )
+        # Bounds how many requests use the model at once and how many may wait for it
+        self.admission = self.admission_controller(llm_api)
+        # An optional small model answers quick lookups; each tier queues separately so they never wait on the 7B
+        self.tiers = {"deep": ModelTier("deep", llm_api, self.generator, self.admission, self.budget_planner)}
+        if quick_llm is not None:
+            self.tiers["quick"] = ModelTier(
+                "quick", quick_llm, quick_scheduler or quick_llm, self.admission_controller(quick_llm),
+                TokenBudgetPlanner(self.report_token_cache(quick_llm, os.path.join(token_dir, "quick")), self.REPORTS_DIR)
+            )
+        threading.Thread(target=self.warm_report_tokens, name="report-tokens", daemon=True).start()
+        if llm_api.config.report_digests:
+            threading.Thread(target=self.build_report_digests, name="report-digests", daemon=True).start()
         self.register_routes()
 
+    @staticmethod
+    def admission_controller(llm) -> AdmissionController:
+        return AdmissionController(
+            max_concurrent=llm.config.admission_max_concurrent or llm.config.max_batch_size,
+            max_queue=llm.config.admission_max_queue,
+            default_deadline=llm.config.request_deadline_seconds
+        )
+
+    def parse_analysis_request(self, data, llm=None):
+        """Validate an analysis payload and build the chat messages for ``llm`` (default: the deep model).
+
+        Unless the logs are compressed or retrieved by relevance, the prompt is
+        built from the report digests when they can answer the question, and
+        otherwise from the part of each report that fits the context budget.
+
+        Returns (question, selected_logs, messages, plan, error).
+        """
+        if not data or 'question' not in data or 'logs' not in data:
+            return None, None, None, None, "Invalid request payload"
+
+        question = data['question'].strip()
+        selected_logs = [log for log in data['logs'] if os.path.exists(os.path.join(self.REPORTS_DIR, log))]
+        if not selected_logs:
+            return question, data['logs'], None, None, "No valid logs found"
+        if self.budget_strategy(data) not in STRATEGIES:
+            return question, selected_logs, None, None, f"Unknown budget strategy: {self.budget_strategy(data)}"
+
+        history = self.history_messages(data)
+        if data.get("mode") == "retrieval":
+            messages, plan = self.retrieval_messages(question, selected_logs, llm, history)
+            return question, selected_logs, history + messages, plan, None
+
+        plan = self.digest_plan(data, question, selected_logs, llm)
+        if plan:
+            return question, selected_logs, [{
+                "role": "user",
+                "content": self.digest_prompt(question, self.digest_contents(plan))
+            }], plan, None
+
+        if data.get("compress_logs"):
+            log_contents = self.load_logs(selected_logs, compress=True)
+        else:
+            plan = self.plan_context(question, selected_logs, self.budget_strategy(data), llm, history)
+            log_contents = self.planner(llm).read(plan)
+
+        messages = history + [{
+            "role": "user",
+            "content": self.analysis_prompt(question, ''.join(content for _, content in log_contents))
+        }]
+        return question, selected_logs, messages, plan, None
+
+    def parse_turn(self, data, llm=None):
+        """Parse an analysis request that may start or continue a conversation session.
+
+        A payload with ``session_id`` is a follow-up: only the new question is
+        sent to the model, which reuses the session's cached log context. A
+        payload with ``session: true`` primes a new session with the logs and
+        the earlier exchanges in ``history`` ([{"question", "answer"}, ...]),
+        so a conversation whose first answer came from the cache or digests
+        only pays for a session once it has a follow-up.
+
+        Returns (question, selected_logs, messages, plan, session_kwargs, error_response).
+        """
+        if data and data.get("session_id"):
+            question = str(data.get("question", "")).strip()
+            if not question:
+                return None, None, None, None, None, (jsonify({"status": "error", "error": "Invalid request payload"}), 400)
+            if not (llm or self.llm_api).has_session(data["session_id"]):
+                return None, None, None, None, None, (jsonify({
+                    "status": "error",
+                    "error": SESSION_EXPIRED,
+                    "session_expired": True
+                }), 410)
+            messages = [{"role": "user", "content": question}]
+            return question, data.get("logs", []), messages, None, {"session_id": data["session_id"]}, None
+
+        question, selected_logs, messages, plan, error = self.parse_analysis_request(data, llm)
+        if error:
+            return None, None, None, None, None, (jsonify({"status": "error", "error": error}), 400)
+        session = {"start_session": True} if data.get("session") else {}
+        return question, selected_logs, messages, plan, session, None
+
+    def history_messages(self, data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Chat messages for the last ``MAX_HISTORY_TURNS`` exchanges a new session is primed with"""
+        history = data.get("history") if data.get("session") else None
+        messages = []
+        for turn in (history if isinstance(history, list) else [])[-self.MAX_HISTORY_TURNS:]:
+            if isinstance(turn, dict) and str(turn.get("question", "")).strip():
+                messages.append({"role": "user", "content": str(turn["question"]).strip()})
+                messages.append({"role": "assistant", "content": str(turn.get("answer", "")).strip()})
+        return messages
+
+    @staticmethod
+    def report_token_cache(llm, cache_dir: str) -> ReportTokenCache:
+        """Token cache for ``llm``; plans, token counts and reads all use the compacted form of each report"""
+        return ReportTokenCache(
+            cache_dir,
+            llm.tokenize_with_offsets,
+            transform=compact_report if llm.config.compact_reports else None,
+            transform_id=f"compact{COMPACTOR_VERSION}"
+        )
+
+    def planner(self, llm=None) -> TokenBudgetPlanner:
+        """Budget planner of the tier ``llm`` belongs to (default: the deep model)"""
+        for tier in self.tiers.values():
+            if tier.llm is llm:
+                return tier.budget_planner
+        return self.budget_planner
+
+    @staticmethod
+    def error_status(error: str) -> int:
+        """HTTP status for a generation error"""
+        if error == SESSION_EXPIRED:
+            return 410
+        if error in (SESSION_BUSY, SESSION_FULL):
+            return 409
+        return 500
+
+    @staticmethod
+    def analysis_prompt(question: str, logs: str) -> str:
+        return f"{question}\n\nLogs:\n{logs}"
+
+    @staticmethod
+    def digest_prompt(question: str, digests: str) -> str:
+        return f"{question}\n\nReport digests:\n{digests}"
+
+    def budget_strategy(self, data: Dict[str, Any]) -> str:
+        return data.get("budget_strategy") or self.llm_api.config.budget_strategy
+
+    def context_budget(self, question: str, llm=None, history: Optional[List[Dict[str, str]]] = None) -> int:
+        """Prompt tokens left for log content after the preamble, earlier exchanges and question"""
+        llm = llm or self.llm_api
+        overhead = llm.count_tokens(
+            llm.format_prompt((history or []) + [{"role": "user", "content": self.analysis_prompt(question, "")}])
+        ) + 1  # BOS token
+        return llm.config.max_length - overhead
+
+    def plan_context(
+        self,
+        question: str,
+        selected_logs: List[str],
+        strategy: str,
+        llm=None,
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """Allocate the prompt tokens left after the preamble, earlier exchanges and question across the reports"""
+        return self.planner(llm).plan(selected_logs, self.context_budget(question, llm, history), strategy)
+
+    def digest_plan(self, data: Dict[str, Any], question: str, selected_logs: List[str], llm=None) -> Optional[Dict[str, Any]]:
+        """Plan a prompt from the report digests, or None when the raw reports are needed.
+
+        Digests replace the reports for one-off questions in the default mode
+        when every selected report has one, the question does not ask for
+        exact details and all digests fit the context. The plan has the same
+        shape as a token budget plan with strategy "digests".
+        """
+        if not self.llm_api.config.report_digests or not data.get("use_digests", True):
+            return None
+        if data.get("mode", "default") != "default" or data.get("compress_logs") or data.get("session"):
+            return None
+        if not digest_answers_question(question):
+            return None
+        digests = [self.report_digests.get(log) for log in selected_logs]
+        if not all(digests):
+            return None
+
+        reports = []
+        for log, digest in zip(selected_logs, digests):
+            entry = self.planner(llm).token_cache.get(os.path.join(self.REPORTS_DIR, log))
+            reports.append({
+                "name": log,
+                "tokens": entry["tokens"],
+                "allocated_tokens": digest["digest_tokens"],
+                "coverage": 1.0,
+                "findings": entry["findings"],
+                "bytes": 0,
+                "truncated": False,
+                "digest": True
+            })
+        budget = self.context_budget(question, llm)
+        allocated = sum(report["allocated_tokens"] for report in reports)
+        if allocated > budget:
+            return None
+        return {
+            "strategy": "digests",
+            "budget": budget,
+            "total_tokens": sum(report["tokens"] for report in reports),
+            "allocated_tokens": allocated,
+            "reports": reports
+        }
+
+    def digest_contents(self, plan: Dict[str, Any]) -> str:
+        """The digests named in a digest plan, one block per report"""
+        blocks = []
+        for report in plan["reports"]:
+            digest = self.report_digests.get(report["name"])
+            blocks.append(f"[{report['name']}]\n{digest['summary'] if digest else 'Digest unavailable.'}")
+        return "\n\n".join(blocks)
+
+    def summarize_report(self, name: str, content: str, interrupt: Optional[InterruptCriteria] = None) -> Dict[str, Any]:
+        """Digest one report with the deep model; reports larger than the context are summarized map-reduce.
+
+        Raises DigestInterrupted when ``interrupt`` cut a generation short.
+        """
+        llm = self.llm_api
+        path = os.path.join(self.REPORTS_DIR, name)
+        source_tokens = content_tokens = self.report_tokens.get(path)["tokens"]
+        if llm.config.compact_reports:
+            content = compact_report(name, content)
+            content_tokens = llm.count_tokens(content)
+        prompt = f"{DIGEST_INSTRUCTION}\n\nReport {name}:\n"
+        if content_tokens <= self.context_budget(prompt, llm):
+            mode = "full"
+            response = llm.generate_batch(
+                [[{"role": "user", "content": prompt + content}]],
+                max_new_tokens=llm.config.digest_max_new_tokens
+            )[0]
+        else:
+            mode = "chunked"
+            response = self.chunked_analyzer.analyze(
+                DIGEST_INSTRUCTION,
+                [(name, content)],
+                map_instruction=DIGEST_MAP_INSTRUCTION,
+                max_new_tokens=llm.config.digest_max_new_tokens
+            )
+        if interrupt is not None and interrupt.interrupted:
+            raise DigestInterrupted(f"Digest of {name} gave way to a request")
+        if response.error:
+            raise RuntimeError(response.error)
+        return {
+            "summary": response.text,
+            "mode": mode,
+            "model": os.path.basename(os.path.normpath(llm.config.model_name_or_path)),
+            "source_tokens": source_tokens,
+            "digest_tokens": llm.count_tokens(response.text)
+        }
+
+    def requests_active(self) -> bool:
+        """Whether a request is running or waiting on any tier"""
+        return any(stats["running"] or stats["queued"] for stats in (tier.admission.stats() for tier in self.tiers.values()))
+
+    def model_idle(self) -> bool:
+        """Whether the deep model is in memory with no request running or waiting on any tier"""
+        if not self.llm_api.ready or self.requests_active():
+            return False
+        # Background work must not reload weights released while idle
+        return self.llm_api.status().get("residency", {}).get("resident", True)
+
+    def build_report_digests(self):
+        """Digest new reports one at a time, only while no request is using the model.
+
+        Digests bypass the admission queue, so they never delay a request's
+        slot or count towards its service time estimate; instead a digest is
+        cut short as soon as a request arrives and is retried later.
+        """
+        while True:
+            try:
+                for name in self.report_digests.pending():
+                    if not self.model_idle():
+                        break
+                    with self.llm_api.background(), self.llm_api.interruptible(self.requests_active) as interrupt:
+                        entry = self.report_digests.build(
+                            name, lambda report, content: self.summarize_report(report, content, interrupt)
+                        )
+                    if entry:
+                        self.logger.info(
+                            f"Built digest for {name}: {entry['digest_tokens']} tokens from {entry['source_tokens']}"
+                        )
+                    elif interrupt.interrupted:
+                        self.logger.info(f"Digest of {name} paused for a request")
+                        break
+            except Exception as e:
+                self.logger.warning(f"Report digest failed: {str(e)}")
+            time.sleep(self.DIGEST_INTERVAL)
+
+    def select_tier(self, data: Dict[str, Any]) -> Tuple[ModelTier, str]:
+        """Choose the model for a request, returning (tier, reason).
+
+        Follow-ups stay with the model holding their session and chunked
+        analyses always use the deep model; otherwise ``route_question``
+        decides from the question, the size of the selected logs and the
+        optional ``depth`` field. Raises ValueError for an unknown depth.
+        """
+        data = data or {}
+        depth = data.get("depth") or "auto"
+        if depth not in DEPTHS:
+            raise ValueError(f"Unknown depth '{depth}', expected one of {DEPTHS}")
+        deep, quick = self.tiers["deep"], self.tiers.get("quick")
+        if quick is None:
+            return deep, "single_model"
+        if data.get("session_id"):
+            return (quick, "session") if quick.llm.has_session(data["session_id"]) else (deep, "session")
+        if data.get("mode") == "chunked":
+            return deep, "mode"
+
+        question = str(data.get("question", "")).strip()
+        selected_logs = [log for log in data.get("logs") or [] if os.path.exists(os.path.join(self.REPORTS_DIR, log))]
+        # A question answered from digests only needs room for the digests
+        plan = self.digest_plan(data, question, selected_logs) if selected_logs else None
+        if plan:
+            context_tokens = plan["allocated_tokens"]
+        else:
+            # Counted with the quick model's tokenizer once it is loaded
+            token_cache = (quick if quick.llm.ready else deep).budget_planner.token_cache
+            context_tokens = sum(
+                token_cache.get(os.path.join(self.REPORTS_DIR, log))["tokens"] for log in selected_logs
+            )
+        tier, reason = route_question(question, context_tokens, quick.llm.config.max_length, depth)
+        if tier == "quick" and not quick.llm.ready:
+            if quick.llm.state == "not_loaded":
+                quick.llm.start_background_initialize()
+            return deep, "quick_model_loading"
+        return self.tiers[tier], reason
+
+    @staticmethod
+    def routing_info(tier: ModelTier, reason: str) -> Dict[str, Any]:
+        return {
+            "tier": tier.name,
+            "reason": reason,
+            "model": os.path.basename(os.path.normpath(tier.llm.config.model_name_or_path))
+        }
+
+    def warm_report_tokens(self):
+        """Tokenize new reports in the background so planning never waits on the tokenizer"""
+        while True:
+            try:
+                for tier in self.tiers.values():
+                    if tier.llm.ready:
+                        processed = tier.budget_planner.token_cache.warm(self.REPORTS_DIR)
+                        if processed:
+                            self.logger.info(f"Tokenized {processed} new report(s) for the {tier.name} model")
+            except Exception as e:
+                self.logger.warning(f"Report tokenization failed: {str(e)}")
+            time.sleep(self.TOKEN_WARM_INTERVAL)
+
+    @staticmethod
+    def retrieval_prompt(question: str, hits: List[Dict[str, Any]]) -> str:
+        excerpts = "\n\n".join(f"[{hit['report']}]\n{hit['text']}" for hit in hits)
+        return f"{question}\n\nRelevant log excerpts:\n{excerpts}"
+
+    def retrieval_messages(
+        self,
+        question: str,
+        selected_logs: List[str],
+        llm=None,
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """Build messages from the report chunks most relevant to the question.
+
+        Hits are added in relevance order until the next one would overflow
+        ``llm``'s context; the rest are dropped and counted per report in the
+        returned plan (strategy "retrieval").
+        """
+        llm = llm or self.llm_api
+        history = history or []
+        hits = self.report_index.search(question, reports=selected_logs, top_k=self.llm_api.config.retrieval_top_k)
+        if not hits:
+            # No lexical overlap with the question; fall back to the start of each report
+            hits = [{"report": name, "position": 0, "text": content[:2000]}
+                    for name, content in self.load_logs(selected_logs)]
+
+        def prompt_tokens(kept):
+            return llm.count_tokens(llm.format_prompt(
+                history + [{"role": "user", "content": self.retrieval_prompt(question, kept)}]
+            )) + 1  # BOS token
+
+        budget = llm.config.max_length - prompt_tokens([])
+        hit_tokens = [llm.count_tokens(self.retrieval_prompt("", [hit])) + TokenBudgetPlanner.BOUNDARY_TOKENS
+                      for hit in hits]
+        kept, allocated = [], 0
+        for hit, tokens in zip(hits, hit_tokens):
+            if allocated + tokens > budget:
+                break
+            kept.append(hit)
+            allocated += tokens
+        # Excerpts counted one at a time can merge into more tokens; drop the least relevant until it fits
+        while kept and prompt_tokens(kept) > llm.config.max_length:
+            kept.pop()
+            allocated -= hit_tokens[len(kept)]
+        if not kept and hits and budget > 0:
+            # Even the best hit is larger than the context: send as much of it as fits
+            best = dict(hits[0])
+            while best["text"] and prompt_tokens([best]) > llm.config.max_length:
+                best["text"] = best["text"][:int(len(best["text"]) * min(0.9, budget / hit_tokens[0]))]
+            if best["text"]:
+                kept.append(best)
+                allocated = prompt_tokens([best]) - prompt_tokens([])
+
+        dropped = Counter(hit["report"] for hit in hits[len(kept):])
+        trimmed = len(kept) == 1 and kept[0]["text"] != hits[0]["text"]
+        if dropped:
+            self.logger.warning(
+                f"Retrieval limited to {len(kept)} of {len(hits)} excerpts; dropped per log: {dict(dropped)}"
+            )
+        reports = []
+        for name in dict.fromkeys(hit["report"] for hit in hits):
+            indexes = [i for i, hit in enumerate(hits) if hit["report"] == name]
+            tokens = sum(hit_tokens[i] for i in indexes)
+            used = sum(hit_tokens[i] for i in indexes if i < len(kept))
+            if trimmed and name == hits[0]["report"]:
+                used = allocated
+            reports.append({
+                "name": name,
+                "tokens": tokens,
+                "allocated_tokens": used,
+                "coverage": round(used / tokens, 3) if tokens else 1.0,
+                "excerpts": len(indexes) - dropped[name],
+                "truncated": bool(dropped[name]) or (trimmed and name == hits[0]["report"])
+            })
+        plan = {
+            "strategy": "retrieval",
+            "budget": budget,
+            "total_tokens": sum(hit_tokens),
+            "allocated_tokens": allocated,
+            "excerpts_total": len(hits),
+            "excerpts_dropped": len(hits) - len(kept),
+            "dropped_excerpts_by_log": dict(dropped),
+            "reports": reports
+        }
+
+        # Keep the excerpts in report order so related records stay together
+        kept.sort(key=lambda hit: (hit["report"], hit["position"]))
+        return [{"role": "user", "content": self.retrieval_prompt(question, kept)}], plan
+
+    def load_logs(self, selected_logs: List[str], compress: bool = False) -> List[tuple]:
+        """Read the selected reports, returning (name, content) pairs for those that exist.
+
+        With ``compress`` set, raw log lines are collapsed into mined templates;
+        otherwise JSON reports are compacted when ``compact_reports`` is on.
+        """
+        log_contents = []
+        for log in selected_logs:
+            log_path = os.path.join(self.REPORTS_DIR, log)
+            if os.path.exists(log_path):
+                with open(log_path, "r", encoding="utf-8", errors="ignore") as file:
+                    content = file.read()
+                if compress:
+                    content = compress_report(content)
+                elif self.llm_api.config.compact_reports:
+                    content = compact_report(log, content)
+                log_contents.append((log, content))
+        return log_contents
+
+    def analysis_variant(self, data: Dict[str, Any], plan: Optional[Dict[str, Any]] = None) -> str:
+        """Describes how the prompt is built from the logs, for cache keys"""
+        if plan and plan["strategy"] == "digests":
+            return "digests"
+        variant = data.get("mode", "default")
+        if data.get("compress_logs"):
+            variant += "+templates"
+        elif variant != "retrieval":
+            variant += f"+{self.budget_strategy(data)}"
+        return variant
+
+    def response_cache_key(self, question: str, selected_logs: List[str], variant: str, llm=None) -> Optional[str]:
+        """Cache key from the question, the selected reports' contents and generation settings.
+
+        None when the model samples: a sampled answer is one draw, not the answer to replay.
+        """
+        if not (llm or self.llm_api).config.deterministic:
+            return None
+        content_hashes = []
+        for log in selected_logs:
+            log_path = os.path.join(self.REPORTS_DIR, log)
+            if os.path.exists(log_path):
+                content_hashes.append(file_digest(log_path))
+        params = dict(
+            (llm or self.llm_api).cache_params(),
+            variant=variant,
+            compactor=COMPACTOR_VERSION if self.llm_api.config.compact_reports else None
+        )
+        return self.response_cache.make_key(question, content_hashes, params)
+
+    def cached_response(self, cache_key: Optional[str]) -> Optional[LLMResponse]:
+        """Return a cached LLMResponse with current hit-rate stats, if present"""
+        if cache_key is None:
+            return None
+        entry = self.response_cache.get(cache_key)
+        if entry is None:
+            return None
+        metadata = dict(entry["metadata"], cache=dict(self.response_cache.stats(), hit=True))
+        return LLMResponse(text=entry["text"], metadata=metadata)
+
+    def store_response(self, cache_key: Optional[str], response: LLMResponse) -> None:
+        """Cache a successful response and annotate it with cache stats"""
+        if response.error or cache_key is None:
+            return
+        self.response_cache.put(cache_key, {"text": response.text, "metadata": dict(response.metadata)})
+        response.metadata["cache"] = dict(self.response_cache.stats(), hit=False)
+
+    def warming_up_response(self):
+        """Fast 503 returned by LLM routes while the model is still loading"""
+        if self.llm_api.state == "not_loaded":
+            self.llm_api.start_background_initialize()
+        status = self.llm_api.status()
+        if status["state"] == "failed":
+            return jsonify({
+                "status": "error",
+                "error": f"LLM failed to load: {status['error']}",
+                "llm": status
+            }), 503
+        return jsonify({
+            "status": "warming_up",
+            "error": "The LLM is still loading, please retry shortly",
+            "llm": status
+        }), 503, {"Retry-After": "10"}
+
+    def admit(self, data: Dict[str, Any], admission: Optional[AdmissionController] = None):
+        """Queue a request for a model, raising AdmissionRejected when it cannot be served in time"""
+        deadline = data.get("deadline_seconds")
+        return (admission or self.admission).enqueue(None if deadline is None else max(1.0, float(deadline)))
+
+    @staticmethod
+    def rejected_response(rejection: AdmissionRejected):
+        """Fast 429/503 for requests the admission controller turned away"""
+        return jsonify({
+            "status": "busy",
+            "error": str(rejection),
+            "admission": rejection.detail
+        }), rejection.status, {"Retry-After": str(max(1, math.ceil(rejection.retry_after)))}
+
+    @staticmethod
+    def sse_event(event: str, payload: Dict[str, Any]) -> str:
+        """Format a Server-Sent Event frame"""
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
     def register_routes(self):
         @self.app.route("/api/analyze_llm", methods=["POST"])
         def analyze_llm():
             try:
                 self.logger.info("Received analyze_llm request")
+                if not self.llm_api.ready:
+                    return self.warming_up_response()
                 data = request.json
-                if not data or 'question' not in data or 'logs' not in data:
-                    return jsonify({"status": "error", "error": "Invalid request payload"}), 400
+                try:
+                    tier, route_reason = self.select_tier(data)
+                except ValueError as e:
+                    return jsonify({"status": "error", "error": str(e)}), 400
+                question, selected_logs, messages, plan, session, error_response = self.parse_turn(data, tier.llm)
+                if error_response:
+                    return error_response
 
-                question = data['question'].strip()
-                selected_logs = data['logs']
-
-                log_contents = []
-                for log in selected_logs:
-                    log_path = os.path.join(self.REPORTS_DIR, log)
-                    if os.path.exists(log_path):
-                        with open(log_path, "r", encoding="utf-8", errors="ignore") as file:
-                            log_contents.append(file.read())
-
-                if not log_contents:
-                    return jsonify({"status": "error", "error": "No valid logs found"}), 400
-
-                messages = [{
-                    "role": "user",
-                    "content": f"{question}\n\nLogs:\n{''.join(log_contents)}"
-                }]
-
-                response = self.llm_api.generate_response(messages)
+                ticket = None
+                if session:
+                    # Session turns keep per-conversation state, so they bypass the cache and batcher
+                    ticket = self.admit(data, tier.admission)
+                    with ticket:
+                        response = tier.llm.generate_response(messages, **session)
+                    if plan and not response.error:
+                        response.metadata["plan"] = plan
+                else:
+                    cache_key = self.response_cache_key(question, selected_logs, self.analysis_variant(data, plan), tier.llm)
+                    response = self.cached_response(cache_key)
+                if response is None:
+                    ticket = self.admit(data, tier.admission)
+                    with ticket:
+                        if data.get("mode") == "chunked":
+                            # Map-reduce over the full logs instead of truncating the concatenation
+                            logs = self.load_logs(selected_logs, compress=data.get("compress_logs", False))
+                            response = self.chunked_analyzer.analyze(question, logs)
+                        else:
+                            response = tier.generator.generate_response(messages)
+                            if plan and not response.error:
+                                response.metadata["plan"] = plan
+                    self.store_response(cache_key, response)
                 if response.error:
-                    return jsonify({"status": "error", "error": response.error}), 500
+                    return jsonify({"status": "error", "error": response.error}), self.error_status(response.error)
+                if ticket:
+                    response.metadata["admission"] = ticket.info()
+                response.metadata["routing"] = self.routing_info(tier, route_reason)
 
                 self.results_manager.save_result(question, response.text, selected_logs)
                 return jsonify({"status": "success", "response": response.text, "metadata": response.metadata}), 200
 
+            except AdmissionRejected as e:
+                self.logger.warning(f"Rejected analyze_llm request: {str(e)}")
+                return self.rejected_response(e)
             except Exception as e:
                 self.logger.error(f"Error in analyze_llm: {str(e)}")
                 return jsonify({"status": "error", "error": str(e)}), 500
 
+        @self.app.route("/api/analyze_llm/stream", methods=["POST"])
+        def analyze_llm_stream():
+            """Stream the analysis to the browser as Server-Sent Events"""
+            self.logger.info("Received analyze_llm stream request")
+            if not self.llm_api.ready:
+                return self.warming_up_response()
+            data = request.json
+            try:
+                tier, route_reason = self.select_tier(data)
+            except ValueError as e:
+                return jsonify({"status": "error", "error": str(e)}), 400
+            question, selected_logs, messages, plan, session, error_response = self.parse_turn(data, tier.llm)
+            if error_response:
+                return error_response
+            routing = self.routing_info(tier, route_reason)
+
+            cache_key = None
+            if not session:
+                cache_key = self.response_cache_key(question, selected_logs, self.analysis_variant(data, plan), tier.llm)
+            cached = self.cached_response(cache_key) if cache_key else None
+            ticket = None
+            if cached is None:
+                try:
+                    ticket = self.admit(data, tier.admission)
+                except AdmissionRejected as e:
+                    self.logger.warning(f"Rejected analyze_llm stream request: {str(e)}")
+                    return self.rejected_response(e)
+
+            def events():
+                if plan:
+                    # Tell the user what fits in the context before generation starts
+                    yield self.sse_event("plan", plan)
+                if cached is not None:
+                    cached.metadata["routing"] = routing
+                    self.results_manager.save_result(question, cached.text, selected_logs)
+                    yield self.sse_event("token", {"text": cached.text})
+                    yield self.sse_event("done", {"status": "success", "response": cached.text, "metadata": cached.metadata})
+                    return
+
+                yield self.sse_event("queued", ticket.info())
+                try:
+                    ticket.wait()
+                except AdmissionRejected as e:
+                    yield self.sse_event("error", {"status": "busy", "error": str(e), "admission": e.detail})
+                    return
+
+                try:
+                    for event in tier.llm.stream_response(messages, **session):
+                        if "token" in event:
+                            yield self.sse_event("token", {"text": event["token"]})
+                            continue
+
+                        response = event["response"]
+                        if response.error:
+                            yield self.sse_event("error", {
+                                "status": "error",
+                                "error": response.error,
+                                "session_expired": response.error == SESSION_EXPIRED
+                            })
+                            return
+                        if plan:
+                            response.metadata["plan"] = plan
+                        if cache_key:
+                            self.store_response(cache_key, response)
+                        response.metadata["admission"] = ticket.info()
+                        response.metadata["routing"] = routing
+                        self.results_manager.save_result(question, response.text, selected_logs)
+                        yield self.sse_event("done", {
+                            "status": "success",
+                            "response": response.text,
+                            "metadata": response.metadata
+                        })
+                finally:
+                    ticket.release()
+
+            stream = Response(
+                stream_with_context(events()),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+            if ticket:
+                # Frees the queue slot even if the client disconnects before the stream starts
+                stream.call_on_close(ticket.release)
+            return stream
+
+        @self.app.route("/api/analyze_llm/plan", methods=["POST"])
+        def analyze_llm_plan():
+            """Preview how the context budget would be split across the selected logs"""
+            try:
+                if not self.llm_api.ready:
+                    return self.warming_up_response()
+                data = request.json
+                if not data or 'question' not in data or 'logs' not in data:
+                    return jsonify({"status": "error", "error": "Invalid request payload"}), 400
+                selected_logs = [log for log in data['logs'] if os.path.exists(os.path.join(self.REPORTS_DIR, log))]
+                if not selected_logs:
+                    return jsonify({"status": "error", "error": "No valid logs found"}), 400
+                strategy = self.budget_strategy(data)
+                if strategy not in STRATEGIES:
+                    return jsonify({"status": "error", "error": f"Unknown budget strategy: {strategy}"}), 400
+                tier, route_reason = self.select_tier(data)
+                question = data['question'].strip()
+                plan = self.digest_plan(data, question, selected_logs, tier.llm) or self.plan_context(
+                    question, selected_logs, strategy, tier.llm, self.history_messages(data)
+                )
+                return jsonify({"status": "success", "plan": plan, "routing": self.routing_info(tier, route_reason)}), 200
+            except ValueError as e:
+                return jsonify({"status": "error", "error": str(e)}), 400
+            except Exception as e:
+                self.logger.error(f"Error in analyze_llm_plan: {str(e)}")
+                return jsonify({"status": "error", "error": str(e)}), 500
+
+        @self.app.route("/api/llm/sessions/<session_id>", methods=["DELETE"])
+        def end_llm_session(session_id):
+            """Free a conversation session's cached log context"""
+            try:
+                # Sessions live in whichever model answered their first question
+                ended = any([tier.llm.end_session(session_id) for tier in self.tiers.values()])
+                return jsonify({"status": "success", "ended": ended}), 200
+            except Exception as e:
+                self.logger.error(f"Error ending session: {str(e)}")
+                return jsonify({"status": "error", "error": str(e)}), 500
+
+        @self.app.route("/api/llm/status", methods=["GET"])
+        def llm_status():
+            """Readiness and loading progress of the LLM"""
+            status = {
+                "status": "success",
+                "llm": self.llm_api.status(),
+                "admission": self.admission.stats(),
+                "digests": self.report_digests.stats()
+            }
+            if "quick" in self.tiers:
+                quick = self.tiers["quick"]
+                status["quick_llm"] = dict(quick.llm.status(), admission=quick.admission.stats())
+            return jsonify(status), 200
+
         @self.app.route("/api/recent-llm-results", methods=["GET"])
         def get_recent_results():
+            """Page through past analyses, newest first, optionally filtered by time range and text"""
             try:
-                results = self.results_manager.load_results()
-                return jsonify({"status": "success", "results": results})
+                page = self.results_manager.query(
+                    limit=request.args.get("limit", 10, type=int),
+                    before_id=request.args.get("before_id", type=int),
+                    since=request.args.get("since"),
+                    until=request.args.get("until"),
+                    text=request.args.get("q")
+                )
+                return jsonify({"status": "success", **page})
+            except ValueError as e:
+                return jsonify({"status": "error", "error": f"Invalid query: {str(e)}"}), 400
             except Exception as e:
                 self.logger.error(f"Error fetching results: {str(e)}")
                 return jsonify({"status": "error", "error": str(e)}), 500
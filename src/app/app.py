@@ -1,5 +1,6 @@
 import os
 import sys
+import copy
 import torch
 from datetime import datetime
 from flask import Flask, jsonify, request, render_template
@@ -61,6 +62,9 @@ from api.system_api import SystemAPI
 from api.logs_api import LogsAPI
 from api.script_api import ScriptAPI
 from api.llm_api import MistralLLMAPI, LLMConfig, LLMAPI
+from utils.llm_scheduler import InferenceScheduler
+from utils.llm_server import RemoteLLMAPI
+from utils.cpu_optimizations import default_precision
 
 # Import script_map from static/py
 from script_map import SCRIPT_MAP
@@ -162,9 +166,15 @@ system_api = SystemAPI(app, logger)
 logs_api = LogsAPI(app, logger, REPORTS_DIR)
 script_api = ScriptAPI(app, logger, SCRIPTS_DIR, SCRIPT_MAP)
 
-# Set environment variable for transformers cache
+# Set environment variable for transformers cache (converted low-precision weights are cached here too)
 os.environ['TRANSFORMERS_CACHE'] = CACHE_DIR
 
+# bf16 halves memory but is only faster than fp32 on CPUs with native bf16 instructions
+LLM_PRECISION = os.environ.get("GUARDSTICK_LLM_PRECISION")
+if not LLM_PRECISION:
+    LLM_PRECISION, precision_reason = default_precision()
+    logger.info(f"LLM precision {LLM_PRECISION}: {precision_reason}; set GUARDSTICK_LLM_PRECISION to override")
+
 # Initialize LLM with lazy initialization
 llm_config = LLMConfig(
     model_name_or_path=os.path.join(PROJECT_ROOT, "models", "Mistral-7B-v0.3"),
@@ -172,26 +182,62 @@ llm_config = LLMConfig(
     temperature=0.7,
     top_p=0.9,
     num_return_sequences=1,
-    max_new_tokens=1024
+    max_new_tokens=1024,
+    # Greedy decoding makes answers reproducible, which the answer cache requires
+    deterministic=os.environ.get("GUARDSTICK_LLM_DETERMINISTIC", "0") == "1",
+    precision=LLM_PRECISION,
+    cache_dir=CACHE_DIR,
+    draft_model_name_or_path=os.environ.get("GUARDSTICK_LLM_DRAFT_MODEL"),
+    backend=os.environ.get("GUARDSTICK_LLM_BACKEND", "transformers"),
+    onnx_model_path=os.environ.get("GUARDSTICK_LLM_ONNX_MODEL"),
+    backend_url=os.environ.get("GUARDSTICK_LLM_BACKEND_URL"),
+    backend_model=os.environ.get("GUARDSTICK_LLM_BACKEND_MODEL"),
+    backend_api_key=os.environ.get("GUARDSTICK_LLM_BACKEND_API_KEY"),
+    # Give the model's memory back to the scans when the LLM page has not been used for a while
+    idle_unload_minutes=float(os.environ.get("GUARDSTICK_LLM_IDLE_UNLOAD_MINUTES", "30")) or None,
+    optimize=os.environ.get("GUARDSTICK_LLM_OPTIMIZE", "0") == "1",
+    report_digests=os.environ.get("GUARDSTICK_LLM_REPORT_DIGESTS", "1") == "1",
+    compact_reports=os.environ.get("GUARDSTICK_LLM_COMPACT_REPORTS", "1") == "1"
 )
 
 llm_config.device = "cpu"  # Force CPU usage
-mistral_llm = MistralLLMAPI(llm_config)
-llm_api = LLMAPI(app, mistral_llm)
+
+# Optional small model (ideally sharing Mistral's tokenizer) that answers quick lookups in seconds
+quick_config = None
+if os.environ.get("GUARDSTICK_LLM_SMALL_MODEL"):
+    quick_config = copy.copy(llm_config)
+    quick_config.model_name_or_path = os.environ["GUARDSTICK_LLM_SMALL_MODEL"]
+    quick_config.max_new_tokens = 256
+    quick_config.draft_model_name_or_path = None
+
+# With GUARDSTICK_LLM_SOCKET set, the model lives in a shared utils.llm_server process
+LLM_SOCKET = os.environ.get("GUARDSTICK_LLM_SOCKET")
+quick_llm = quick_scheduler = None
+if LLM_SOCKET:
+    mistral_llm = RemoteLLMAPI(llm_config, LLM_SOCKET)
+    llm_scheduler = None  # The server batches requests from all web workers
+    if quick_config and os.environ.get("GUARDSTICK_LLM_SMALL_SOCKET"):
+        quick_llm = RemoteLLMAPI(quick_config, os.environ["GUARDSTICK_LLM_SMALL_SOCKET"])
+else:
+    mistral_llm = MistralLLMAPI(llm_config)
+    llm_scheduler = InferenceScheduler(mistral_llm)
+    if quick_config:
+        quick_llm = MistralLLMAPI(quick_config)
+        quick_scheduler = InferenceScheduler(quick_llm)
+llm_api = LLMAPI(app, mistral_llm, scheduler=llm_scheduler, quick_llm=quick_llm, quick_scheduler=quick_scheduler)
 
 def initialize_llm():
-    """Lazy initialization for LLM."""
+    """Start loading the LLM in the background so the server is reachable immediately."""
     try:
-        logger.info("Initializing Mistral-7B model...")
-        if mistral_llm.initialize():
-            logger.info(f"Mistral-7B initialized successfully on {mistral_llm.device}")
-            logger.info(f"Using Metal Performance Shaders: {torch.backends.mps.is_available()}")
-            return True
-        else:
-            logger.warning("Failed to initialize Mistral-7B - continuing without LLM functionality")
-            return False
+        logger.info("Loading Mistral-7B model in the background...")
+        logger.info(f"Using Metal Performance Shaders: {torch.backends.mps.is_available()}")
+        mistral_llm.start_background_initialize()
+        if quick_llm is not None:
+            logger.info(f"Loading quick-answer model {quick_config.model_name_or_path} in the background...")
+            quick_llm.start_background_initialize()
+        return True
     except Exception as e:
-        logger.error(f"Error initializing Mistral-7B: {str(e)}")
+        logger.error(f"Error starting Mistral-7B initialization: {str(e)}")
         logger.warning("Continuing without LLM functionality")
         return False
 
@@ -208,14 +254,14 @@ if __name__ == "__main__":
     print(f"Template folder: {TEMPLATES_DIR}")
     print(f"Static folder: {STATIC_DIR}")
 
-    # Initialize LLM before starting the server
+    # Load the LLM in the background; LLM routes report "warming up" until it is ready
     llm_initialized = initialize_llm()
     if not llm_initialized:
         logger.warning("LLM functionality is unavailable; API will still serve non-LLM endpoints.")
 
     try:
         # Start Flask app with debug mode off
-        app.run(host="0.0.0.0", port=5002, debug=False, use_reloader=False)
+        app.run(host="0.0.0.0", port=5002, debug=False, use_reloader=False, threaded=True)
     except Exception as e:
         logger.error(f"Failed to start Flask server: {str(e)}")
         sys.exit(1)
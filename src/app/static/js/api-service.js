@@ -16,6 +16,10 @@ const ENDPOINTS = {
     },
     ANALYSIS: {
         LLM: '/api/analyze_llm',
+        LLM_STREAM: '/api/analyze_llm/stream',
+        LLM_STATUS: '/api/llm/status',
+        LLM_PLAN: '/api/analyze_llm/plan',
+        LLM_SESSIONS: '/api/llm/sessions',
         LOGS: '/api/get-logs'
     },
     MONITORING: {
@@ -107,6 +111,82 @@ const apiService = {
                 })
             });
         },
+        /**
+         * Streams an LLM analysis over Server-Sent Events
+         * @param {Object} payload - { question, logs, budget_strategy, depth, session, history, session_id }
+         * @param {Function} onToken - Called with each decoded text chunk
+         * @param {Function} [onPlan] - Called with the context plan before generation starts
+         * @param {Function} [onQueued] - Called with the queue position and estimated wait
+         * @returns {Promise<Object>} The final { status, response, metadata } payload
+         */
+        async analyzeLLMStream({ question, logs, budget_strategy, depth, session, history, session_id }, onToken, onPlan, onQueued) {
+            const response = await fetch(`${BASE_URL}${ENDPOINTS.ANALYSIS.LLM_STREAM}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ question, logs, budget_strategy, depth, session, history, session_id })
+            });
+
+            if (!response.ok) {
+                let errorDetails;
+                try {
+                    errorDetails = await response.json();
+                } catch {
+                    errorDetails = { error: response.statusText };
+                }
+                const error = new Error(errorDetails.error || `API call failed: ${response.status}`);
+                error.sessionExpired = Boolean(errorDetails.session_expired);
+                throw error;
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // SSE frames are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const frame = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+
+                    const event = (frame.match(/^event: (.*)$/m) || [])[1] || 'message';
+                    const data = JSON.parse((frame.match(/^data: (.*)$/m) || [])[1] || '{}');
+
+                    if (event === 'token') {
+                        onToken(data.text);
+                    } else if (event === 'plan') {
+                        if (onPlan) onPlan(data);
+                    } else if (event === 'queued') {
+                        if (onQueued) onQueued(data);
+                    } else if (event === 'done') {
+                        return data;
+                    } else if (event === 'error') {
+                        const error = new Error(data.error || 'Analysis failed');
+                        error.sessionExpired = Boolean(data.session_expired);
+                        throw error;
+                    }
+                }
+            }
+            throw new Error('Stream ended before analysis completed');
+        },
+        async planLLM({ question, logs, budget_strategy }) {
+            return apiCall(ENDPOINTS.ANALYSIS.LLM_PLAN, {
+                method: 'POST',
+                body: JSON.stringify({ question, logs, budget_strategy })
+            });
+        },
+        async endLLMSession(sessionId) {
+            return apiCall(`${ENDPOINTS.ANALYSIS.LLM_SESSIONS}/${encodeURIComponent(sessionId)}`, {
+                method: 'DELETE'
+            });
+        },
+        async getLLMStatus() {
+            return apiCall(ENDPOINTS.ANALYSIS.LLM_STATUS);
+        },
         async getLogs() {
             return apiCall(ENDPOINTS.ANALYSIS.LOGS);
         },
@@ -1,4 +1,5 @@
 import os
+import sys
 import subprocess
 from datetime import datetime
 import json
@@ -10,6 +11,12 @@ DATA_DIR = os.path.join(SRC_DIR, "data")
 REPORTS_DIR = os.path.join(DATA_DIR, "log_reports")
 os.makedirs(REPORTS_DIR, exist_ok=True)
 LOG_FILE = os.path.join(REPORTS_DIR, "Security_Logs.json")
+TEMPLATES_FILE = os.path.join(REPORTS_DIR, "Security_Log_Templates.json")
+
+# Make the shared src/utils helpers importable
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+from utils.log_templates import mine_templates
 
 def collect_relevant_logs():
     """Collect relevant security logs and save them in JSON format."""
@@ -41,6 +48,15 @@ def collect_relevant_logs():
     with open(LOG_FILE, "w") as f:
         json.dump(logs, f, indent=4)
 
+    # Save a compact template view: near-identical lines collapsed with counts and time spans
+    templates = [{
+        "category": entry["category"],
+        "total_lines": len(entry["logs"]),
+        "templates": mine_templates(entry["logs"])
+    } for entry in logs]
+    with open(TEMPLATES_FILE, "w") as f:
+        json.dump(templates, f, indent=4)
+
 def main():
     """Main function to collect logs and store them in a structured format."""
     collect_relevant_logs()
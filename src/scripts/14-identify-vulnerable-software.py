@@ -1,6 +1,9 @@
 import os
+import re
 import subprocess
 import json
+import zipfile
+from bisect import bisect_left, bisect_right
 from datetime import datetime
 from rich.console import Console
 from rich.progress import Progress
@@ -14,6 +17,19 @@ REPORTS_DIR = os.path.join(DATA_DIR, "log_reports")
 EXPLOITS_DB_DIR = os.path.join(DATA_DIR, "Exploit_DB")
 EXPLOITS_CSV = os.path.join(EXPLOITS_DB_DIR, "files_exploits.csv")
 SHELLCODES_CSV = os.path.join(EXPLOITS_DB_DIR, "files_shellcodes.csv")
+OSV_DB_DIR = os.path.join(DATA_DIR, "OSV_DB")
+OSV_INDEX_FILE = os.path.join(OSV_DB_DIR, "osv_index.json")
+OSV_INDEX_VERSION = 3  # Bump when version ordering or the index layout changes
+# Tags marking a release made before the version they precede, ranked dev < alpha < beta < candidate
+PRE_RELEASE_TAGS = {"dev": 0, "a": 1, "alpha": 1, "b": 2, "beta": 2, "c": 3, "pre": 3, "preview": 3, "rc": 3}
+# Tags that name the release itself, e.g. 2.0-final
+RELEASE_TAGS = ("final", "ga", "release", "stable")
+
+# OSV ecosystems consulted for each inventory source
+OSV_ECOSYSTEMS = {
+    "homebrew": ["Homebrew", "OSS-Fuzz"],
+    "application": ["macOS", "OSS-Fuzz"]
+}
 os.makedirs(REPORTS_DIR, exist_ok=True)
 
 def generate_report_filename(scan_type):
@@ -77,9 +93,208 @@ def search_vulnerabilities(software, version, vulnerabilities):
 
     return found_vulnerabilities
 
+def version_key(version):
+    """Build a sortable key from a version string (e.g. '3.1.4_1', '2.0rc1' or '1.1.1w').
+
+    Known pre-release tags sort before the release they precede. Any other
+    letters are post-release suffixes (1.0.post1, 9.0p1, OpenSSL's 1.1.1w)
+    sorting after the release and before the next one; an "a" or "b" written
+    straight after a number is a suffix unless digits follow it (2.0a1).
+    Trailing zero components are ignored, so 1.0 == 1.0.0.
+    """
+    version = re.sub(r"_\d+$", "", str(version).strip().lower())  # Drop Homebrew revision suffix
+    key, numbers = [], []
+
+    def flush_numbers():
+        while numbers and numbers[-1] == 0:
+            numbers.pop()
+        key.extend((3, number, "") for number in numbers)
+        numbers.clear()
+
+    for match in re.finditer(r"\d+|[a-z]+", version):
+        token = match.group()
+        if token.isdigit():
+            numbers.append(int(token))
+            continue
+        flush_numbers()
+        after_number = match.start() > 0 and version[match.start() - 1].isdigit()
+        before_number = version[match.end():match.end() + 1].isdigit()
+        if token in RELEASE_TAGS:
+            continue
+        if token in PRE_RELEASE_TAGS and not (len(token) == 1 and after_number and not before_number):
+            key.append((0, PRE_RELEASE_TAGS[token], ""))
+        else:
+            key.append((2, 0, token))
+    flush_numbers()
+    key.append((1, 0, ""))  # End of version: after pre-releases, before suffixes and further numbers
+    return tuple(key)
+
+def iter_osv_records():
+    """Yield OSV advisories from JSON files and zip dumps under the OSV directory."""
+    for root, _, files in os.walk(OSV_DB_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            if path == OSV_INDEX_FILE:
+                continue
+            try:
+                if name.endswith(".zip"):
+                    with zipfile.ZipFile(path) as archive:
+                        for member in archive.namelist():
+                            if member.endswith(".json"):
+                                yield json.loads(archive.read(member))
+                elif name.endswith(".json"):
+                    with open(path, "r", encoding="utf-8") as f:
+                        yield json.load(f)
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                console.print(f"[yellow]Skipping unreadable OSV file {path}: {e}[/yellow]")
+
+def osv_sources_mtime():
+    """Return the newest modification time of the OSV dump files."""
+    newest = 0
+    for root, _, files in os.walk(OSV_DB_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            if path != OSV_INDEX_FILE and name.endswith((".json", ".zip")):
+                newest = max(newest, os.path.getmtime(path))
+    return newest
+
+def build_osv_index():
+    """Build the compact (ecosystem, package) -> sorted affected ranges index."""
+    packages = {}
+    summaries = {}
+    advisories = 0
+
+    for record in iter_osv_records():
+        vuln_id = record.get("id", "")
+        advisories += 1
+        for affected in record.get("affected", []):
+            package = affected.get("package", {})
+            ecosystem = package.get("ecosystem", "").split(":")[0]
+            name = package.get("name", "").lower()
+            if not ecosystem or not name:
+                continue
+            entry = packages.setdefault(f"{ecosystem}\t{name}", {"ranges": [], "versions": {}})
+
+            for affected_range in affected.get("ranges", []):
+                if affected_range.get("type") not in ("SEMVER", "ECOSYSTEM"):
+                    continue  # GIT ranges are commit hashes, not comparable versions
+                introduced = "0"
+                for event in affected_range.get("events", []):
+                    if "introduced" in event:
+                        introduced = event["introduced"]
+                    elif "fixed" in event:
+                        entry["ranges"].append([introduced, event["fixed"], "", vuln_id])
+                        introduced = None
+                    elif "last_affected" in event:
+                        entry["ranges"].append([introduced, "", event["last_affected"], vuln_id])
+                        introduced = None
+                if introduced is not None:
+                    entry["ranges"].append([introduced, "", "", vuln_id])
+
+            for version in affected.get("versions", []):
+                entry["versions"].setdefault(version, []).append(vuln_id)
+
+        summaries[vuln_id] = record.get("summary") or record.get("details", "")[:200]
+
+    for entry in packages.values():
+        entry["ranges"].sort(key=lambda r: version_key(r[0]))
+        entry["versions"] = sorted(entry["versions"].items(), key=lambda v: version_key(v[0]))
+
+    index = {
+        "index_version": OSV_INDEX_VERSION,
+        "built": datetime.now().isoformat(),
+        "advisories": advisories,
+        "summaries": summaries,
+        "packages": packages
+    }
+    with open(OSV_INDEX_FILE, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    console.print(f"[green]Indexed {advisories} OSV advisories for {len(packages)} packages.[/green]")
+    return index
+
+def load_osv_index():
+    """Load the OSV index, rebuilding it when the dumps are newer than the index."""
+    if not os.path.isdir(OSV_DB_DIR):
+        return None
+    if os.path.isfile(OSV_INDEX_FILE) and os.path.getmtime(OSV_INDEX_FILE) >= osv_sources_mtime():
+        try:
+            with open(OSV_INDEX_FILE, "r") as f:
+                index = json.load(f)
+            if index.get("index_version") == OSV_INDEX_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+    console.print("[yellow]Building OSV vulnerability index...[/yellow]")
+    return build_osv_index()
+
+class OSVMatcher:
+    """Matches installed software versions against the OSV index with binary search."""
+
+    def __init__(self, index):
+        self.index = index
+        self._keys = {}
+
+    def _package_keys(self, package_id, entry):
+        """Compute (once per package) the sorted version keys used for bisection."""
+        if package_id not in self._keys:
+            self._keys[package_id] = (
+                [version_key(r[0]) for r in entry["ranges"]],
+                [version_key(v[0]) for v in entry["versions"]]
+            )
+        return self._keys[package_id]
+
+    def match(self, software, version, ecosystems):
+        """Return OSV advisories affecting the given software version."""
+        matches = {}
+        target = version_key(version)
+
+        for ecosystem in ecosystems:
+            package_id = f"{ecosystem}\t{software.lower()}"
+            entry = self.index["packages"].get(package_id)
+            if not entry:
+                continue
+            range_keys, version_keys = self._package_keys(package_id, entry)
+
+            # Only ranges introduced at or before the target version can contain it
+            for introduced, fixed, last_affected, vuln_id in entry["ranges"][:bisect_right(range_keys, target)]:
+                if fixed and target >= version_key(fixed):
+                    continue
+                if last_affected and target > version_key(last_affected):
+                    continue
+                matches.setdefault(vuln_id, (ecosystem, introduced, fixed or last_affected))
+
+            position = bisect_left(version_keys, target)
+            if position < len(version_keys) and version_keys[position] == target:
+                for vuln_id in entry["versions"][position][1]:
+                    matches.setdefault(vuln_id, (ecosystem, version, version))
+
+        return [{
+            "id": vuln_id,
+            "software": software,
+            "installed_version": version,
+            "ecosystem": ecosystem,
+            "affected_range": {"introduced": introduced, "fixed_or_last": upper},
+            "summary": self.index["summaries"].get(vuln_id, ""),
+            "url": f"https://osv.dev/vulnerability/{vuln_id}"
+        } for vuln_id, (ecosystem, introduced, upper) in matches.items()]
+
+def search_osv_vulnerabilities(inventory):
+    """Match the app and Homebrew inventory against the local OSV database."""
+    index = load_osv_index()
+    if not index:
+        console.print(f"[yellow]No OSV database found in {OSV_DB_DIR}; skipping OSV matching.[/yellow]")
+        return []
+
+    matcher = OSVMatcher(index)
+    found = []
+    for source, software, version in inventory:
+        found.extend(matcher.match(software, version, OSV_ECOSYSTEMS.get(source, [])))
+    return found
+
 def scan_applications(search_path, vulnerabilities):
     """Scan applications in a directory for vulnerabilities."""
     console.print(f"[cyan]Scanning applications in {search_path}...[/cyan]")
+    inventory = []
     apps = subprocess.run(["find", search_path, "-name", "*.app", "-maxdepth", "1"], 
                           capture_output=True, text=True).stdout.strip().splitlines()
 
@@ -94,10 +309,14 @@ def scan_applications(search_path, vulnerabilities):
                                           "CFBundleVersion"], capture_output=True, text=True).stdout.strip()
                 
             if version:
+                inventory.append(("application", app_name, version))
                 search_vulnerabilities(app_name, version, vulnerabilities)
 
+    return inventory
+
 def check_homebrew_packages(vulnerabilities):
     """Check installed Homebrew packages for vulnerabilities."""
+    inventory = []
     if subprocess.call(["command", "-v", "brew"], stdout=subprocess.DEVNULL) == 0:
         console.print("[cyan]Scanning Homebrew packages...[/cyan]")
         brew_output = subprocess.run(["brew", "list", "--versions"], 
@@ -109,8 +328,11 @@ def check_homebrew_packages(vulnerabilities):
                 if len(parts) >= 2:
                     app_name = parts[0]
                     version = parts[1]
+                    inventory.append(("homebrew", app_name, version))
                     search_vulnerabilities(app_name, version, vulnerabilities)
 
+    return inventory
+
 def main():
     # Ensure Exploit-DB is available
     if not is_exploit_db_populated():
@@ -120,10 +342,14 @@ def main():
     vulnerabilities = []
 
     # Scan directories and Homebrew packages
-    scan_applications("/Applications", vulnerabilities)
-    scan_applications("/System/Applications", vulnerabilities)
-    scan_applications(os.path.expanduser("~/Applications"), vulnerabilities)
-    check_homebrew_packages(vulnerabilities)
+    inventory = []
+    inventory += scan_applications("/Applications", vulnerabilities)
+    inventory += scan_applications("/System/Applications", vulnerabilities)
+    inventory += scan_applications(os.path.expanduser("~/Applications"), vulnerabilities)
+    inventory += check_homebrew_packages(vulnerabilities)
+
+    # Match the collected inventory against the offline OSV database
+    osv_vulnerabilities = search_osv_vulnerabilities(inventory)
 
     # Prepare JSON report data
     report_data = {
@@ -133,8 +359,10 @@ def main():
             "tool_name": "Vulnerability Scanner"
         },
         "vulnerabilities": vulnerabilities,
+        "osv_vulnerabilities": osv_vulnerabilities,
         "summary": {
-            "total_vulnerabilities": len(vulnerabilities)
+            "total_vulnerabilities": len(vulnerabilities),
+            "total_osv_vulnerabilities": len(osv_vulnerabilities)
         }
     }
 
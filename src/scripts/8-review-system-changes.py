@@ -1,4 +1,5 @@
 import os
+import sys
 import subprocess
 from datetime import datetime
 import json
@@ -9,12 +10,18 @@ from rich.panel import Panel
 REPORTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../src/data/log_reports"))
 os.makedirs(REPORTS_DIR, exist_ok=True)
 
+# Make the shared src/utils helpers importable
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+from utils.log_templates import mine_templates
+
 console = Console()
 
-def save_json(data):
+def save_json(data, report_name="System_Changes"):
     """Save data as JSON file."""
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-    report_file = os.path.join(REPORTS_DIR, f"System_Changes_{timestamp}.json")
+    report_file = os.path.join(REPORTS_DIR, f"{report_name}_{timestamp}.json")
     with open(report_file, 'w') as f:
         json.dump(data, f, indent=4)
     return report_file
@@ -86,10 +93,20 @@ def main():
     # Perform scan and save results
     report_data = process_scan()
     report_file = save_json(report_data)
+
+    # Save the same events collapsed into templates with counts and time spans
+    templates = mine_templates(report_data["system_changes"]["important_events"])
+    templates_file = save_json({
+        "scan_time": report_data["scan_time"],
+        "total_important_events": report_data["summary"]["total_important_events"],
+        "event_templates": templates
+    }, "System_Changes_Templates")
     
     # Show brief summary
     console.print(f"\nFound {report_data['summary']['total_important_events']} important system changes")
+    console.print(f"Collapsed into {len(templates)} event templates")
     console.print(f"Report saved to: {report_file}")
+    console.print(f"Template report saved to: {templates_file}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
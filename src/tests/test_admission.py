@@ -0,0 +1,42 @@
+# src/tests/test_admission.py
+import pytest
+
+from utils.admission import AdmissionController, AdmissionRejected
+
+
+def running_controller(max_concurrent, service_seconds):
+    """A controller with one request holding a slot and a measured service time"""
+    controller = AdmissionController(max_concurrent=max_concurrent, max_queue=4, default_deadline=120.0)
+    controller.service_seconds = service_seconds
+    ticket = controller.enqueue()
+    ticket.wait()
+    return controller, ticket
+
+
+def test_free_slot_admits_despite_slow_service():
+    controller, running = running_controller(max_concurrent=2, service_seconds=500.0)
+    ticket = controller.enqueue(deadline_seconds=60.0)
+    assert ticket.estimated_wait == 0
+    ticket.wait()
+    assert controller.stats()["running"] == 2
+    ticket.release()
+    running.release()
+
+
+def test_no_free_slot_rejects_when_deadline_cannot_be_met():
+    controller, running = running_controller(max_concurrent=1, service_seconds=500.0)
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.enqueue(deadline_seconds=60.0)
+    assert rejected.value.status == 503
+    assert controller.stats()["rejected_deadline"] == 1
+    running.release()
+
+
+def test_no_free_slot_queues_when_deadline_allows():
+    controller, running = running_controller(max_concurrent=1, service_seconds=5.0)
+    ticket = controller.enqueue(deadline_seconds=60.0)
+    assert ticket.position == 1
+    assert ticket.estimated_wait == 5.0
+    running.release()
+    ticket.wait()
+    ticket.release()
@@ -0,0 +1,66 @@
+# src/tests/test_retrieval_budget.py
+import logging
+from types import SimpleNamespace
+
+from api.llm_api import LLMAPI
+
+
+class WordLLM:
+    """Stand-in model that counts one token per whitespace-separated word"""
+    def __init__(self, max_length):
+        self.config = SimpleNamespace(max_length=max_length, retrieval_top_k=50, compact_reports=False)
+
+    def count_tokens(self, text):
+        return len(text.split())
+
+    def format_prompt(self, messages):
+        return "System preamble.\n\n" + "".join(f"User: {message['content']}\n\n" for message in messages)
+
+
+def retrieval_api(llm, hits):
+    api = LLMAPI.__new__(LLMAPI)
+    api.llm_api = llm
+    api.logger = logging.getLogger(__name__)
+    api.report_index = SimpleNamespace(search=lambda question, reports, top_k: [dict(hit) for hit in hits[:top_k]])
+    return api
+
+
+def test_retrieval_prompt_fits_context_with_many_large_hits():
+    llm = WordLLM(max_length=1024)
+    # Most relevant first, as ReportIndex.search returns them
+    hits = [
+        {"report": f"report{i % 3}.txt", "position": i, "text": f"relevant{i} " + "word " * 200}
+        for i in range(30)
+    ]
+    api = retrieval_api(llm, hits)
+
+    messages, plan = api.retrieval_messages("Which errors happened?", ["report0.txt", "report1.txt", "report2.txt"])
+
+    assert llm.count_tokens(llm.format_prompt(messages)) + 1 <= llm.config.max_length
+    # The most relevant hits are kept, the rest are reported as dropped
+    content = messages[0]["content"]
+    kept = 30 - plan["excerpts_dropped"]
+    assert 0 < kept < 30
+    assert all(f"relevant{i} " in content for i in range(kept))
+    assert not any(f"relevant{i} " in content for i in range(kept, 30))
+    assert sum(plan["dropped_excerpts_by_log"].values()) == plan["excerpts_dropped"]
+    assert plan["allocated_tokens"] <= plan["budget"]
+
+
+def test_retrieval_keeps_every_hit_that_fits():
+    llm = WordLLM(max_length=1024)
+    hits = [{"report": "a.txt", "position": i, "text": f"line{i} error"} for i in range(5)]
+    messages, plan = retrieval_api(llm, hits).retrieval_messages("Errors?", ["a.txt"])
+
+    assert plan["excerpts_dropped"] == 0 and plan["dropped_excerpts_by_log"] == {}
+    assert all(f"line{i} error" in messages[0]["content"] for i in range(5))
+
+
+def test_retrieval_trims_a_best_hit_larger_than_the_context():
+    llm = WordLLM(max_length=256)
+    hits = [{"report": "a.txt", "position": i, "text": f"best{i} " + "word " * 1000} for i in range(3)]
+    messages, plan = retrieval_api(llm, hits).retrieval_messages("Errors?", ["a.txt"])
+
+    assert llm.count_tokens(llm.format_prompt(messages)) + 1 <= llm.config.max_length
+    assert "best0 " in messages[0]["content"]
+    assert plan["excerpts_dropped"] == 2 and plan["reports"][0]["truncated"]
@@ -0,0 +1,47 @@
+# src/tests/test_version_key.py
+import os
+import importlib.util
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts",
+                      "14-identify-vulnerable-software.py")
+spec = importlib.util.spec_from_file_location("identify_vulnerable_software", SCRIPT)
+scan = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(scan)
+version_key = scan.version_key
+
+
+@pytest.mark.parametrize("ordered", [
+    ["1.1.1", "1.1.1a", "1.1.1w", "1.1.2"],
+    ["2.0.dev1", "2.0a1", "2.0b2", "2.0rc1", "2.0", "2.0.post1", "2.0.1"],
+    ["8.9", "9.0", "9.0p1", "9.1"],
+])
+def test_version_order(ordered):
+    keys = [version_key(version) for version in ordered]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+
+
+@pytest.mark.parametrize("left, right", [("1.0", "1.0.0"), ("2.0", "2.0.0"), ("3.1.4_1", "3.1.4"), ("2.0-final", "2.0")])
+def test_equal_versions(left, right):
+    assert version_key(left) == version_key(right)
+
+
+def matcher(ranges):
+    index = {
+        "packages": {"OSS-Fuzz\topenssl": {"ranges": ranges, "versions": []}},
+        "summaries": {}
+    }
+    return scan.OSVMatcher(index)
+
+
+def test_letter_suffixed_fix_covers_the_base_release():
+    found = matcher([["0", "1.1.1w", None, "OSV-1"]]).match("openssl", "1.1.1", ["OSS-Fuzz"])
+    assert [match["id"] for match in found] == ["OSV-1"]
+    assert matcher([["0", "1.1.1w", None, "OSV-1"]]).match("openssl", "1.1.1w", ["OSS-Fuzz"]) == []
+
+
+def test_short_version_matches_range_starting_at_padded_release():
+    found = matcher([["2.0.0", "2.0.5", None, "OSV-2"]]).match("openssl", "2.0", ["OSS-Fuzz"])
+    assert [match["id"] for match in found] == ["OSV-2"]
@@ -0,0 +1,157 @@
+# src/utils/admission.py
+import math
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """A request the controller will not queue; carries the HTTP status to answer with"""
+    def __init__(self, reason: str, status: int, retry_after: float, detail: Dict[str, Any]):
+        super().__init__(reason)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class AdmissionTicket:
+    """A queued request; ``wait`` blocks until it may use the model"""
+    def __init__(self, controller: "AdmissionController", deadline: float, position: int, estimated_wait: float):
+        self.controller = controller
+        self.deadline = deadline
+        self.position = position
+        self.estimated_wait = estimated_wait
+        self.enqueued = time.monotonic()
+        self.started = None
+        self.finished = False
+
+    def wait(self) -> None:
+        self.controller._wait(self)
+
+    def release(self) -> None:
+        self.controller._release(self)
+
+    def __enter__(self):
+        self.wait()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def info(self) -> Dict[str, Any]:
+        """Queue position, estimated and actual wait for response metadata"""
+        waited = (self.started if self.started is not None else time.monotonic()) - self.enqueued
+        return {
+            "queue_position": self.position,
+            "estimated_wait": round(self.estimated_wait, 1),
+            "queue_wait": round(waited, 3),
+            "deadline_seconds": round(self.deadline - self.enqueued, 1)
+        }
+
+
+class AdmissionController:
+    """Bounded FIFO in front of the model.
+
+    At most ``max_concurrent`` requests generate at once; up to ``max_queue``
+    more wait in arrival order. A request is rejected immediately with 429
+    when the queue is full, or 503 when it would have to wait for a slot and
+    its deadline would pass before it is likely to finish, based on a moving
+    average of recent service times. A request that gets a free slot straight
+    away is always admitted.
+    A queued request whose deadline passes is dropped with 503 before it
+    reaches the model.
+    """
+    # Assumed service time until the first request has been measured
+    DEFAULT_SERVICE_SECONDS = 30.0
+    # Weight of the newest measurement in the service time average
+    SMOOTHING = 0.3
+
+    def __init__(self, max_concurrent: int = 1, max_queue: int = 16, default_deadline: float = 120.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.default_deadline = default_deadline
+        self.logger = logging.getLogger(__name__)
+        self.service_seconds = None
+        self._queue = deque()
+        self._running = 0
+        self._condition = threading.Condition()
+        self.stats_counters = {"admitted": 0, "completed": 0, "rejected_full": 0, "rejected_deadline": 0, "expired": 0}
+
+    def estimated_service(self) -> float:
+        return self.service_seconds if self.service_seconds is not None else self.DEFAULT_SERVICE_SECONDS
+
+    def _estimate_wait(self, ahead: int) -> float:
+        """Seconds until a request with ``ahead`` queued requests before it gets a slot"""
+        waves = math.ceil(max(0, self._running + ahead - self.max_concurrent + 1) / self.max_concurrent)
+        return waves * self.estimated_service()
+
+    def enqueue(self, deadline_seconds: Optional[float] = None) -> AdmissionTicket:
+        """Queue a request or raise AdmissionRejected right away"""
+        deadline_seconds = self.default_deadline if deadline_seconds is None else min(deadline_seconds, self.default_deadline)
+        with self._condition:
+            ahead = len(self._queue)
+            estimated_wait = self._estimate_wait(ahead)
+            detail = {"queue_length": ahead, "running": self._running, "estimated_wait": round(estimated_wait, 1)}
+            if ahead >= self.max_queue:
+                self.stats_counters["rejected_full"] += 1
+                raise AdmissionRejected("LLM queue is full, please retry later", 429, estimated_wait, detail)
+            if estimated_wait and estimated_wait + self.estimated_service() > deadline_seconds:
+                self.stats_counters["rejected_deadline"] += 1
+                raise AdmissionRejected(
+                    f"The LLM cannot answer within {deadline_seconds:.0f}s at current load", 503, estimated_wait, detail
+                )
+            ticket = AdmissionTicket(self, time.monotonic() + deadline_seconds, ahead + 1, estimated_wait)
+            self._queue.append(ticket)
+            self.stats_counters["admitted"] += 1
+            return ticket
+
+    def _wait(self, ticket: AdmissionTicket) -> None:
+        with self._condition:
+            while not (self._queue[0] is ticket and self._running < self.max_concurrent):
+                remaining = ticket.deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue.remove(ticket)
+                    ticket.finished = True
+                    self.stats_counters["expired"] += 1
+                    self._condition.notify_all()
+                    raise AdmissionRejected(
+                        "Request deadline passed while queued", 503, self._estimate_wait(len(self._queue)), ticket.info()
+                    )
+                self._condition.wait(remaining)
+            self._queue.popleft()
+            self._running += 1
+            ticket.started = time.monotonic()
+            # The next request may also fit in a free slot
+            self._condition.notify_all()
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        with self._condition:
+            if ticket.finished:
+                return
+            ticket.finished = True
+            if ticket.started is None:
+                # Never reached the model (e.g. the client went away while queued)
+                self._queue.remove(ticket)
+            else:
+                self._running -= 1
+                elapsed = time.monotonic() - ticket.started
+                self.service_seconds = elapsed if self.service_seconds is None else (
+                    self.SMOOTHING * elapsed + (1 - self.SMOOTHING) * self.service_seconds
+                )
+                self.stats_counters["completed"] += 1
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return dict(
+                self.stats_counters,
+                queued=len(self._queue),
+                running=self._running,
+                max_concurrent=self.max_concurrent,
+                max_queue=self.max_queue,
+                service_seconds=round(self.estimated_service(), 2),
+                estimated_wait=round(self._estimate_wait(len(self._queue)), 1)
+            )
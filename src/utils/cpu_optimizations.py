@@ -0,0 +1,123 @@
+# src/utils/cpu_optimizations.py
+import sys
+import time
+import subprocess
+from typing import Any, Dict, Set, Tuple
+
+import torch
+
+COMPILE_MODES = ("default", "reduce-overhead", "max-autotune")
+# CPU flags of native bf16 matrix instructions: AVX512-BF16 and AMX on x86, BF16 on Arm
+BF16_CPU_FLAGS = ("amx_bf16", "avx512_bf16", "bf16")
+
+
+def cpu_flags() -> Set[str]:
+    """Instruction set flags of this CPU, from /proc/cpuinfo or sysctl; empty when unknown"""
+    flags = set()
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith(("flags", "Features")):
+                    flags.update(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    if sys.platform == "darwin":
+        try:
+            result = subprocess.run(
+                ["sysctl", "-n", "hw.optional.arm.FEAT_BF16"], capture_output=True, text=True, timeout=5
+            )
+            if result.stdout.strip() == "1":
+                flags.add("bf16")
+        except (OSError, subprocess.SubprocessError):
+            pass
+    return {flag.lower() for flag in flags}
+
+
+def default_precision() -> Tuple[str, str]:
+    """(precision, reason): bf16 when oneDNN can run it on native CPU instructions, else fp32.
+
+    Without those instructions bf16 matmuls are emulated and run slower
+    than fp32.
+    """
+    if not torch.backends.mkldnn.is_available():
+        return "fp32", "PyTorch was built without oneDNN"
+    flags = cpu_flags()
+    supported = [flag for flag in BF16_CPU_FLAGS if flag in flags]
+    if supported:
+        return "bf16", f"CPU supports {supported[0]}"
+    return "fp32", "CPU has no native bf16 instructions"
+
+
+def configure_onednn() -> Dict[str, Any]:
+    """Enable the oneDNN paths TorchInductor uses on CPU, returning what was applied.
+
+    Freezing turns the (inference-only) weights into constants so linear
+    layers are lowered to prepacked oneDNN kernels instead of re-reading
+    weights in their training layout on every call.
+    """
+    torch.backends.mkldnn.enabled = True
+    settings = {"mkldnn": torch.backends.mkldnn.is_available()}
+    try:
+        import torch._inductor.config as inductor_config
+    except ImportError:
+        return settings
+    inductor_config.freezing = True
+    inductor_config.cpp.weight_prepack = True
+    settings.update(freezing=True, weight_prepack=True)
+    if hasattr(inductor_config, "fx_graph_cache"):
+        # Lets a reload after an idle unload reuse the graphs compiled at first load
+        inductor_config.fx_graph_cache = True
+        settings["fx_graph_cache"] = True
+    return settings
+
+
+def compile_forward(model, mode: str = "default"):
+    """Replace ``model.forward`` with a torch.compile'd version; returns the original for fallback.
+
+    Shapes are marked dynamic because every generate step changes the
+    sequence and key/value lengths.
+    """
+    if not hasattr(torch, "compile"):
+        raise RuntimeError(f"torch.compile is not available in torch {torch.__version__}")
+    if mode not in COMPILE_MODES:
+        raise ValueError(f"Unknown compile mode '{mode}', expected one of {COMPILE_MODES}")
+    original = model.forward
+    model.forward = torch.compile(original, mode=mode, dynamic=True)
+    return original
+
+
+def restore_forward(model, original) -> None:
+    """Undo ``compile_forward``.
+
+    Dynamo's caches are left alone: they are process-wide, so resetting them
+    would also drop the graphs of other compiled models such as a second
+    tier. Graphs compiled for this model are guarded on it and go unused.
+    """
+    model.forward = original
+
+
+def measure_throughput(model, input_ids: torch.LongTensor, new_tokens: int, pad_token_id: int) -> Dict[str, float]:
+    """Prefill and decode tokens per second for one greedy generate call.
+
+    The time to the first token is taken as the prefill; the remaining
+    tokens are decode steps.
+    """
+    kwargs = {
+        "input_ids": input_ids,
+        "attention_mask": torch.ones_like(input_ids),
+        "do_sample": False,
+        "pad_token_id": pad_token_id
+    }
+    with torch.no_grad():
+        start = time.perf_counter()
+        model.generate(max_new_tokens=1, min_new_tokens=1, **kwargs)
+        prefill = time.perf_counter() - start
+        start = time.perf_counter()
+        model.generate(max_new_tokens=new_tokens, min_new_tokens=new_tokens, **kwargs)
+        total = time.perf_counter() - start
+
+    decode = max(total - prefill, 1e-9)
+    return {
+        "prefill_tokens_per_second": round(input_ids.shape[1] / prefill, 1),
+        "decode_tokens_per_second": round((new_tokens - 1) / decode, 1)
+    }
@@ -0,0 +1,47 @@
+# src/utils/decoding_constraints.py
+from typing import Set, Tuple
+
+import torch
+from transformers import LogitsProcessor
+
+# Answers opening with these are JSON/XML-shaped and get discarded by postprocessing
+STRUCTURED_PREFIXES = ("{", "[", "<")
+
+
+def classify_vocabulary(tokenizer) -> Tuple[Set[int], Set[int]]:
+    """Return (structured_ids, blank_ids) for a tokenizer's vocabulary.
+
+    structured_ids decode to text starting with a JSON/XML opener (after any
+    leading whitespace); blank_ids decode to whitespace only.
+    """
+    structured_ids, blank_ids = set(), set()
+    special_ids = set(tokenizer.all_special_ids)
+    texts = tokenizer.batch_decode([[token_id] for token_id in range(len(tokenizer))])
+    for token_id, text in enumerate(texts):
+        if token_id in special_ids:
+            continue
+        stripped = text.lstrip()
+        if not stripped:
+            blank_ids.add(token_id)
+        elif stripped.startswith(STRUCTURED_PREFIXES):
+            structured_ids.add(token_id)
+    return structured_ids, blank_ids
+
+
+class LeadingStructureSuppressor(LogitsProcessor):
+    """Bans JSON/XML openers until a row has produced its first visible token.
+
+    Rows whose output so far is empty or whitespace can only continue with
+    prose, so an answer can never start with ``{``, ``[`` or ``<``. Once a row
+    has visible text the constraint no longer applies to it.
+    """
+    def __init__(self, prompt_length: int, structured_ids: Set[int], blank_ids: Set[int]):
+        self.prompt_length = prompt_length
+        self.blank_ids = blank_ids
+        self.structured_ids = torch.tensor(sorted(structured_ids), dtype=torch.long)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        for row in range(input_ids.shape[0]):
+            if all(token in self.blank_ids for token in input_ids[row, self.prompt_length:].tolist()):
+                scores[row, self.structured_ids.to(scores.device)] = -float("inf")
+        return scores
@@ -0,0 +1,367 @@
+# src/utils/llm_backends.py
+import os
+import json
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+from transformers import LogitsProcessorList, TemperatureLogitsWarper, TopPLogitsWarper
+
+
+class GenerationBackend(ABC):
+    """Engine that continues tokenized prompts.
+
+    ``generate`` mirrors the subset of ``model.generate`` that MistralLLMAPI
+    uses: left-padded ``input_ids``/``attention_mask`` in, prompt plus
+    generated ids out, with stopping criteria, logits processors and a
+    streamer honoured where the engine allows. Only backends with
+    ``supports_cache_reuse`` accept and return key/values, which the preamble
+    cache, conversation sessions and speculative decoding depend on.
+    """
+    name = "base"
+    supports_cache_reuse = False
+    holds_weights = True  # Whether ``unload`` frees memory in this process
+
+    def __init__(self, config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def loaded(self) -> bool:
+        return True
+
+    def unload(self) -> None:
+        """Release the engine's memory; ``load`` brings it back"""
+
+    @abstractmethod
+    def load(self, llm) -> None:
+        """Prepare the engine; ``llm`` is the MistralLLMAPI with its tokenizer loaded"""
+
+    @abstractmethod
+    def generate(self, **kwargs):
+        """Generate continuations; see the class docstring for the arguments"""
+
+    def status(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+
+class TransformersBackend(GenerationBackend):
+    """In-process PyTorch model loaded in the configured precision"""
+    name = "transformers"
+    supports_cache_reuse = True
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.model = None
+        self.precision = config.precision  # As loaded; int4 may fall back to int8
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def load(self, llm) -> None:
+        self.model = llm.load_model().to(llm.device)
+        self.model.eval()
+        self.precision = llm.precision
+        llm.model = self.model
+
+    def unload(self) -> None:
+        self.model = None
+
+    def generate(self, **kwargs):
+        return self.model.generate(**kwargs)
+
+    def status(self) -> Dict[str, Any]:
+        return {"name": self.name, "precision": self.precision}
+
+
+class OnnxRuntimeBackend(GenerationBackend):
+    """Decoder exported to ONNX, run on the CPU execution provider.
+
+    Expects an export with key/value inputs (``optimum-cli export onnx
+    --task text-generation-with-past``); ``onnx_model_path`` is the .onnx
+    file or its directory. The graph is optimized by ONNX Runtime at load
+    (ORT_ENABLE_ALL) and decoded here token by token, so stopping criteria,
+    logits processors and streamers behave as with ``model.generate``.
+    """
+    name = "onnxruntime"
+    MODEL_FILES = ("decoder_model_merged.onnx", "decoder_with_past_model.onnx", "model.onnx")
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.session = None
+        self.model_file = None
+
+    def resolve_model_file(self, llm) -> str:
+        path = self.config.onnx_model_path or os.path.join(self.config.model_name_or_path, "onnx")
+        if path.endswith(".onnx"):
+            return path
+        for name in self.MODEL_FILES:
+            if os.path.exists(os.path.join(path, name)):
+                return os.path.join(path, name)
+        raise FileNotFoundError(f"No ONNX decoder found in {path}")
+
+    @property
+    def loaded(self) -> bool:
+        return self.session is not None
+
+    def unload(self) -> None:
+        self.session = None
+
+    def load(self, llm) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("The onnxruntime backend requires the onnxruntime package")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if self.config.onnx_threads:
+            options.intra_op_num_threads = self.config.onnx_threads
+        self.model_file = self.resolve_model_file(llm)
+        self.session = ort.InferenceSession(self.model_file, options, providers=["CPUExecutionProvider"])
+
+        inputs = {node.name: node for node in self.session.get_inputs()}
+        self.output_names = [node.name for node in self.session.get_outputs()]
+        self.past_names = sorted(
+            (name for name in inputs if name.startswith("past_key_values.")),
+            key=lambda name: (int(name.split(".")[1]), name)
+        )
+        if not self.past_names:
+            raise ValueError(f"{self.model_file} has no key/value inputs; export it with past key/values")
+        self.present_names = [name.replace("past_key_values.", "present.") for name in self.past_names]
+        past = inputs[self.past_names[0]]
+        self.past_dtype = np.float16 if "float16" in past.type else np.float32
+        self.num_heads, self.head_dim = past.shape[1], past.shape[3]
+        self.has_position_ids = "position_ids" in inputs
+        self.has_cache_branch = "use_cache_branch" in inputs
+        self.logger.info(f"Loaded ONNX decoder {self.model_file} ({len(self.past_names) // 2} layers)")
+
+    def generate(
+        self,
+        input_ids: torch.LongTensor,
+        attention_mask: Optional[torch.LongTensor] = None,
+        max_new_tokens: int = 256,
+        stopping_criteria=None,
+        logits_processor=None,
+        streamer=None,
+        do_sample: bool = False,
+        temperature: float = 1.0,
+        top_p: float = 1.0,
+        pad_token_id: Optional[int] = None,
+        eos_token_id: Optional[int] = None,
+        num_return_sequences: int = 1,
+        **kwargs
+    ) -> torch.LongTensor:
+        if kwargs.get("past_key_values") is not None or num_return_sequences != 1:
+            raise ValueError("The onnxruntime backend does not reuse key/values or return several sequences")
+
+        batch = input_ids.shape[0]
+        attention_mask = torch.ones_like(input_ids) if attention_mask is None else attention_mask
+        processors = LogitsProcessorList(logits_processor or [])
+        warpers = LogitsProcessorList()
+        if do_sample:
+            warpers.extend([TemperatureLogitsWarper(temperature), TopPLogitsWarper(top_p)])
+
+        past = {name: np.zeros((batch, self.num_heads, 0, self.head_dim), dtype=self.past_dtype) for name in self.past_names}
+        sequences = input_ids
+        step_ids = input_ids
+        unfinished = torch.ones(batch, dtype=torch.bool)
+        if streamer is not None:
+            streamer.put(input_ids.cpu())
+
+        for step in range(max_new_tokens):
+            feed = {"input_ids": step_ids.numpy(), "attention_mask": attention_mask.numpy(), **past}
+            if self.has_position_ids:
+                position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+                feed["position_ids"] = position_ids[:, -step_ids.shape[1]:].numpy()
+            if self.has_cache_branch:
+                feed["use_cache_branch"] = np.array([step > 0])
+            outputs = dict(zip(self.output_names, self.session.run(None, feed)))
+
+            scores = processors(sequences, torch.from_numpy(outputs["logits"][:, -1, :]).float())
+            if do_sample:
+                probabilities = torch.softmax(warpers(sequences, scores), dim=-1)
+                next_tokens = torch.multinomial(probabilities, num_samples=1).squeeze(1)
+            else:
+                next_tokens = torch.argmax(scores, dim=-1)
+            if pad_token_id is not None:
+                next_tokens = torch.where(unfinished, next_tokens, torch.full_like(next_tokens, pad_token_id))
+
+            sequences = torch.cat([sequences, next_tokens[:, None]], dim=1)
+            attention_mask = torch.cat([attention_mask, torch.ones((batch, 1), dtype=attention_mask.dtype)], dim=1)
+            past = {name: outputs[present] for name, present in zip(self.past_names, self.present_names)}
+            step_ids = next_tokens[:, None]
+            if streamer is not None:
+                streamer.put(next_tokens.cpu())
+
+            if eos_token_id is not None:
+                unfinished &= next_tokens != eos_token_id
+            if not unfinished.any() or (stopping_criteria and stopping_criteria(sequences, scores)):
+                break
+
+        if streamer is not None:
+            streamer.end()
+        return sequences
+
+    def status(self) -> Dict[str, Any]:
+        return {"name": self.name, "model_file": self.model_file, "threads": self.config.onnx_threads}
+
+
+class OpenAIHTTPBackend(GenerationBackend):
+    """OpenAI-compatible completions server (llama.cpp, vLLM, TGI, ...).
+
+    Prompts are decoded with the local tokenizer and sent to
+    ``{backend_url}/completions`` over a pool of keep-alive connections;
+    the streamed text is re-tokenized so the rest of the pipeline sees token
+    ids. Stopping criteria are checked as text arrives for single requests
+    (closing the stream ends generation server-side) and once at the end for
+    batches. Logits processors cannot run remotely and are ignored, so
+    structured answers are only caught by postprocessing.
+    """
+    name = "openai_http"
+    holds_weights = False
+    # Stop strings OpenAI-compatible servers are required to accept
+    MAX_STOP_SEQUENCES = 4
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.http = None
+        self.tokenizer = None
+
+    @property
+    def base_url(self) -> str:
+        return (self.config.backend_url or "http://127.0.0.1:8080/v1").rstrip("/")
+
+    def load(self, llm) -> None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.tokenizer = llm.tokenizer
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.config.backend_pool_size)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        if self.config.backend_api_key:
+            self.http.headers["Authorization"] = f"Bearer {self.config.backend_api_key}"
+
+        # Fail at load time rather than on the first question
+        response = self.http.get(f"{self.base_url}/models", timeout=self.config.backend_timeout)
+        response.raise_for_status()
+        self.logger.info(f"Using OpenAI-compatible server at {self.base_url}")
+
+    @property
+    def model_name(self) -> str:
+        return self.config.backend_model or os.path.basename(self.config.model_name_or_path.rstrip("/"))
+
+    def complete(self, prompt: str, max_new_tokens: int, sampling: Dict[str, Any], on_text=None) -> Tuple[str, Optional[str]]:
+        """Stream one completion; returns (text, finish_reason).
+
+        ``on_text`` is called with the text so far after every chunk and ends
+        the stream early by returning True.
+        """
+        payload = dict(
+            sampling,
+            model=self.model_name,
+            prompt=prompt,
+            max_tokens=max_new_tokens,
+            stream=True,
+            stop=self.config.stop_sequences[:self.MAX_STOP_SEQUENCES] or None
+        )
+        text, finish_reason = "", None
+        with self.http.post(f"{self.base_url}/completions", json=payload, stream=True,
+                            timeout=self.config.backend_timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    # Read to the end of the body so the connection goes back to the pool
+                    continue
+                choice = json.loads(data)["choices"][0]
+                text += choice.get("text") or ""
+                finish_reason = choice.get("finish_reason") or finish_reason
+                if on_text is not None and on_text(choice.get("text") or "", text):
+                    finish_reason = "client_stop"
+                    break
+        return text, finish_reason
+
+    def generate(
+        self,
+        input_ids: torch.LongTensor,
+        attention_mask: Optional[torch.LongTensor] = None,
+        max_new_tokens: int = 256,
+        stopping_criteria=None,
+        logits_processor=None,
+        streamer=None,
+        do_sample: bool = False,
+        temperature: float = 1.0,
+        top_p: float = 1.0,
+        pad_token_id: Optional[int] = None,
+        eos_token_id: Optional[int] = None,
+        num_return_sequences: int = 1,
+        **kwargs
+    ) -> torch.LongTensor:
+        if kwargs.get("past_key_values") is not None or num_return_sequences != 1:
+            raise ValueError("The openai_http backend does not reuse key/values or return several sequences")
+
+        attention_mask = torch.ones_like(input_ids) if attention_mask is None else attention_mask
+        prompts = [
+            self.tokenizer.decode(row[mask.bool()], skip_special_tokens=True)
+            for row, mask in zip(input_ids, attention_mask)
+        ]
+        sampling = {"temperature": temperature, "top_p": top_p} if do_sample else {"temperature": 0}
+
+        def on_text(chunk: str, text: str) -> bool:
+            if streamer is not None and chunk:
+                streamer.on_finalized_text(chunk)
+            if not stopping_criteria:
+                return False
+            # Checked on the text as it grows; criteria that need tokens run once on the final sequence
+            return any(criteria.stop_on_text(text) for criteria in stopping_criteria if hasattr(criteria, "stop_on_text"))
+
+        try:
+            if len(prompts) == 1:
+                results = [self.complete(prompts[0], max_new_tokens, sampling, on_text)]
+            else:
+                with ThreadPoolExecutor(max_workers=min(len(prompts), self.config.backend_pool_size)) as pool:
+                    results = list(pool.map(lambda prompt: self.complete(prompt, max_new_tokens, sampling), prompts))
+        finally:
+            if streamer is not None:
+                streamer.end()
+
+        rows: List[List[int]] = []
+        for text, finish_reason in results:
+            generated = self.tokenizer(text, add_special_tokens=False)['input_ids'][:max_new_tokens]
+            if finish_reason == "stop" and eos_token_id is not None:
+                generated.append(eos_token_id)
+            rows.append(generated)
+        width = max(len(row) for row in rows)
+        pad = pad_token_id if pad_token_id is not None else eos_token_id
+        generated = torch.tensor([row + [pad] * (width - len(row)) for row in rows], dtype=input_ids.dtype)
+        sequences = torch.cat([input_ids, generated], dim=1)
+        if stopping_criteria:
+            # Records where each row of a batch should have stopped so callers can trim it
+            stopping_criteria(sequences, None)
+        return sequences
+
+    def status(self) -> Dict[str, Any]:
+        return {"name": self.name, "url": self.base_url, "model": self.model_name}
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (TransformersBackend, OnnxRuntimeBackend, OpenAIHTTPBackend)
+}
+
+
+def create_backend(config) -> GenerationBackend:
+    """Instantiate the generation backend named by ``config.backend``"""
+    if config.backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{config.backend}', expected one of {tuple(BACKENDS)}")
+    return BACKENDS[config.backend](config)
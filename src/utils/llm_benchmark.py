@@ -0,0 +1,218 @@
+# src/utils/llm_benchmark.py
+"""Offline inference benchmark for MistralLLMAPI.
+
+By default a tiny randomly-initialized model with the Mistral architecture and
+a byte-level tokenizer is written to a temporary directory, so the benchmark
+runs on any CPU box without downloading weights:
+
+    python -m utils.llm_benchmark --precisions fp32,bf16,int8 --threads 1,4 --prompt-tokens 64,256
+
+Pass --model to benchmark real weights instead. Results are appended as JSON
+lines (one per grid cell) to data/benchmarks/.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List
+
+import psutil
+import torch
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from api.llm_api import LLMConfig, MistralLLMAPI
+
+BENCHMARKS_DIR = os.path.join(SRC_DIR, "data", "benchmarks")
+
+
+def build_tiny_model(path: str, hidden_size: int = 256, layers: int = 4, heads: int = 8) -> str:
+    """Save a randomly-initialized Mistral-architecture model and byte-level tokenizer"""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+    from transformers import MistralConfig, MistralForCausalLM, PreTrainedTokenizerFast
+
+    alphabet = pre_tokenizers.ByteLevel.alphabet()
+    vocab = {token: index for index, token in enumerate(["<unk>", "<s>", "</s>"] + sorted(alphabet))}
+    backend = Tokenizer(models.BPE(vocab=vocab, merges=[], unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    backend.decoder = decoders.ByteLevel()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token="<unk>", bos_token="<s>", eos_token="</s>"
+    )
+
+    config = MistralConfig(
+        vocab_size=len(vocab),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 4,
+        num_hidden_layers=layers,
+        num_attention_heads=heads,
+        num_key_value_heads=max(1, heads // 4),
+        max_position_embeddings=4096,
+        bos_token_id=1,
+        eos_token_id=2
+    )
+    torch.manual_seed(0)
+    MistralForCausalLM(config).save_pretrained(path, safe_serialization=True)
+    tokenizer.save_pretrained(path)
+    return path
+
+
+class PeakRSSSampler:
+    """Samples process RSS on a background thread to capture the peak during a run"""
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def make_prompt(llm: MistralLLMAPI, prompt_tokens: int) -> List[Dict[str, str]]:
+    """A log-like user message of roughly ``prompt_tokens`` tokens (excluding the preamble)"""
+    line = "2024-11-28 10:00:00 kernel[0]: Sandbox: deny(1) file-read-data /private/var/db\n"
+    content = "Summarize the following logs.\n"
+    while llm.count_tokens(content + line) <= prompt_tokens:
+        content += line
+    return [{"role": "user", "content": content}]
+
+
+def time_generate(llm: MistralLLMAPI, messages, new_tokens: int) -> float:
+    """Wall time of one generate call that always produces exactly ``new_tokens`` tokens"""
+    inputs = llm.prepare_inputs(messages)
+    start = time.perf_counter()
+    with torch.no_grad():
+        llm.model.generate(**inputs, **llm.generation_kwargs(
+            max_new_tokens=new_tokens, min_new_tokens=new_tokens, num_return_sequences=1
+        ))
+    return time.perf_counter() - start
+
+
+def run_cell(llm: MistralLLMAPI, prompt_tokens: int, new_tokens: int, repeats: int) -> Dict[str, Any]:
+    """Measure one (precision, threads, prompt length) grid cell"""
+    messages = make_prompt(llm, prompt_tokens)
+    inputs = llm.prepare_inputs(messages)
+    input_length = inputs["input_ids"].shape[1]
+    # With the preamble cache warm only the conversation suffix is prefilled
+    cached_length = llm.cached_prefix_length(inputs)
+    time_generate(llm, messages, 2)  # Warm-up
+
+    first_token, totals = [], []
+    with PeakRSSSampler() as rss:
+        for _ in range(repeats):
+            first_token.append(time_generate(llm, messages, 1))
+            totals.append(time_generate(llm, messages, new_tokens))
+
+    ttft = min(first_token)
+    total = min(totals)
+    decode = max(total - ttft, 1e-9)
+    return {
+        "input_tokens": int(input_length),
+        "prefix_cached_tokens": int(cached_length),
+        "prefilled_tokens": int(input_length - cached_length),
+        "new_tokens": new_tokens,
+        "time_to_first_token": round(ttft, 4),
+        "prefill_seconds": round(ttft, 4),
+        "prefill_tokens_per_second": round((input_length - cached_length) / ttft, 2),
+        "decode_seconds": round(decode, 4),
+        "decode_tokens_per_second": round((new_tokens - 1) / decode, 2),
+        "end_to_end_tokens_per_second": round(new_tokens / total, 2),
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 1)
+    }
+
+
+def run_benchmark(args) -> List[Dict[str, Any]]:
+    model_path = args.model
+    temporary = None
+    if not model_path:
+        temporary = tempfile.TemporaryDirectory(prefix="guardstick-bench-")
+        model_path = build_tiny_model(temporary.name, args.hidden_size, args.layers, args.heads)
+
+    environment = {
+        "timestamp": datetime.now().isoformat(),
+        "model": args.model or f"tiny-mistral-h{args.hidden_size}-l{args.layers}",
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+    results = []
+    longest_prompt = max(int(p) for p in args.prompt_tokens.split(","))
+    for precision in args.precisions.split(","):
+        llm = MistralLLMAPI(LLMConfig(
+            model_name_or_path=model_path, precision=precision, deterministic=True, optimize=args.optimize,
+            use_prefix_cache=args.prefix_cache
+        ))
+        if not llm.initialize():
+            results.append(dict(environment, precision=precision, error=llm.load_error))
+            continue
+        # Leave room for the preamble so prompts are never truncated
+        llm.config.max_length = llm.count_tokens(llm.SYSTEM_PREAMBLE) + longest_prompt + 16
+
+        for threads in (int(t) for t in args.threads.split(",")):
+            torch.set_num_threads(threads)
+            for prompt_tokens in (int(p) for p in args.prompt_tokens.split(",")):
+                cell = run_cell(llm, prompt_tokens, args.new_tokens, args.repeats)
+                result = dict(environment, precision=precision, threads=threads, optimized=args.optimize,
+                              prefix_cache=args.prefix_cache, prompt_tokens=prompt_tokens, load_seconds=llm.load_seconds, **cell)
+                if llm.optimization:
+                    result["optimization"] = llm.optimization
+                results.append(result)
+                print(json.dumps(result))
+
+    if temporary:
+        temporary.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MistralLLMAPI CPU inference")
+    parser.add_argument("--model", help="Model path; omit to use a tiny random model")
+    parser.add_argument("--precisions", default="fp32,bf16,int8")
+    parser.add_argument("--threads", default=str(torch.get_num_threads()))
+    parser.add_argument("--prompt-tokens", default="64,256")
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--optimize", action="store_true", help="Benchmark the compiled mode (torch.compile, oneDNN)")
+    parser.add_argument("--prefix-cache", action=argparse.BooleanOptionalAction, default=True,
+                        help="Reuse the preamble's key/values; --no-prefix-cache prefills the whole prompt every call")
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--heads", type=int, default=8)
+    parser.add_argument("--output", help="JSON lines file (default: data/benchmarks/llm_benchmark_<time>.jsonl)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    output = args.output or os.path.join(
+        BENCHMARKS_DIR, f"llm_benchmark_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.jsonl"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "a") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+    print(f"Benchmark results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
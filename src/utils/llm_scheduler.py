@@ -0,0 +1,81 @@
+# src/utils/llm_scheduler.py
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+
+class InferenceScheduler:
+    """Collects concurrent LLM requests into micro-batches for a single model.
+
+    Requests arriving within ``batch_window_ms`` of each other (up to
+    ``max_batch_size``) are left-padded into one ``generate`` call and the
+    outputs are routed back to each caller.
+    """
+    def __init__(self, llm, max_batch_size: Optional[int] = None, batch_window_ms: Optional[int] = None):
+        self.llm = llm
+        self.max_batch_size = max(1, max_batch_size or llm.config.max_batch_size)
+        self.batch_window = (batch_window_ms if batch_window_ms is not None else llm.config.batch_window_ms) / 1000.0
+        self.logger = logging.getLogger(__name__)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "max_batch_size_seen": 0}
+
+    def _ensure_worker(self) -> None:
+        """Start the batching thread on first use"""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="llm-scheduler", daemon=True)
+                self._worker.start()
+
+    def submit(self, messages: List[Dict[str, str]]) -> Future:
+        """Queue a conversation for generation, returning a future LLMResponse"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((messages, future, time.perf_counter()))
+        return future
+
+    def generate_response(self, messages: List[Dict[str, str]], timeout: Optional[float] = None):
+        """Blocking equivalent of MistralLLMAPI.generate_response routed through the batcher"""
+        return self.submit(messages).result(timeout=timeout)
+
+    def _collect_batch(self) -> list:
+        """Block for one request, then gather more until the window closes or the batch is full"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            try:
+                if len(batch) == 1:
+                    responses = [self.llm.generate_response(batch[0][0])]
+                else:
+                    responses = self.llm.generate_batch([messages for messages, _, _ in batch])
+            except Exception as e:
+                self.logger.error(f"Batched generation failed: {str(e)}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["max_batch_size_seen"] = max(self.stats["max_batch_size_seen"], len(batch))
+            for (_, future, queued_at), response in zip(batch, responses):
+                if response.metadata is not None and not response.error:
+                    response.metadata["batch_size"] = len(batch)
+                    response.metadata["queue_wait"] = round(started - queued_at, 3)
+                future.set_result(response)
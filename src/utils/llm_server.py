@@ -0,0 +1,404 @@
+# src/utils/llm_server.py
+"""Dedicated model-serving process shared by several web workers.
+
+Run it once per host:
+
+    python -m utils.llm_server --socket /tmp/guardstick-llm.sock
+
+and start the web workers with GUARDSTICK_LLM_SOCKET pointing at the same
+socket. Connections authenticate with a shared key (GUARDSTICK_LLM_AUTHKEY,
+or the ``<socket>.key`` file the server writes with owner-only permissions)
+before any request is unpickled. Requests carry ids and deadlines; when more
+than ``max_pending`` requests are queued the server answers "busy"
+immediately instead of queueing.
+"""
+import os
+import sys
+import copy
+import time
+import uuid
+import queue
+import logging
+import secrets
+import argparse
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from api.llm_api import LLMConfig, LLMResponse, MistralLLMAPI
+from utils.stopping_criteria import GENERATION_INTERRUPTED
+from utils.llm_scheduler import InferenceScheduler
+from utils.cpu_optimizations import default_precision
+
+
+def socket_authkey(socket_path: str, create: bool = False) -> bytes:
+    """Shared secret for the socket: GUARDSTICK_LLM_AUTHKEY, else the key file next to the socket.
+
+    With ``create`` (the server) and no environment key, a fresh key file is
+    written readable by its owner only.
+    """
+    key = os.environ.get("GUARDSTICK_LLM_AUTHKEY")
+    if key:
+        return key.encode("utf-8")
+    key_path = f"{socket_path}.key"
+    if create:
+        if os.path.exists(key_path):
+            os.remove(key_path)
+        key = secrets.token_hex(32).encode("ascii")
+        with os.fdopen(os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as f:
+            f.write(key)
+        return key
+    with open(key_path, "rb") as f:
+        return f.read().strip()
+
+
+class LLMServer:
+    """Hosts one MistralLLMAPI and serves requests over a Unix socket"""
+    def __init__(self, llm: MistralLLMAPI, socket_path: str, workers: int = 4, max_pending: int = 16):
+        self.llm = llm
+        self.scheduler = InferenceScheduler(llm)
+        self.socket_path = socket_path
+        self.workers = workers
+        self.logger = logging.getLogger(__name__)
+        self._pending = queue.Queue(maxsize=max_pending)
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        # Owner-only from the moment the socket and key file exist, not after a later chmod
+        previous_umask = os.umask(0o177)
+        try:
+            listener = Listener(self.socket_path, family="AF_UNIX", authkey=socket_authkey(self.socket_path, create=True))
+        finally:
+            os.umask(previous_umask)
+        self.logger.info(f"LLM server listening on {self.socket_path}")
+
+        self.llm.start_background_initialize()
+        for index in range(self.workers):
+            threading.Thread(target=self._work, name=f"llm-server-worker-{index}", daemon=True).start()
+
+        try:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, EOFError, OSError) as e:
+                    self.logger.warning(f"Rejected LLM server connection: {str(e)}")
+                    continue
+                threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+        finally:
+            listener.close()
+
+    def _handle(self, connection) -> None:
+        """Read one request; answer status and token counts inline, queue generation"""
+        try:
+            request = connection.recv()
+        except (EOFError, OSError):
+            connection.close()
+            return
+
+        request_id = request.get("id")
+        operation = request.get("op")
+        try:
+            if operation == "status":
+                status = dict(self.llm.status(), settings=self.settings(), cache_params=self.llm.cache_params())
+                self._reply(connection, request_id, result=status, close=True)
+                return
+            if not self.llm.ready:
+                self._reply(connection, request_id, error="warming_up", close=True)
+                return
+            if operation == "count_tokens":
+                self._reply(connection, request_id, result=self.llm.count_tokens(request["text"]), close=True)
+                return
+            if operation == "tokenize_with_offsets":
+                self._reply(connection, request_id, result=self.llm.tokenize_with_offsets(request["text"]), close=True)
+                return
+            if operation == "has_session":
+                self._reply(connection, request_id, result=self.llm.has_session(request["session_id"]), close=True)
+                return
+            if operation == "end_session":
+                self._reply(connection, request_id, result=self.llm.end_session(request["session_id"]), close=True)
+                return
+            self._pending.put_nowait((request, connection))
+        except queue.Full:
+            self._reply(connection, request_id, error="busy", close=True)
+        except Exception as e:
+            self._reply(connection, request_id, error=str(e), close=True)
+
+    def _work(self) -> None:
+        while True:
+            request, connection = self._pending.get()
+            request_id = request.get("id")
+            try:
+                deadline = request.get("deadline")
+                if deadline and time.time() > deadline:
+                    self._reply(connection, request_id, error="timeout")
+                    continue
+
+                operation = request["op"]
+                if operation == "generate" and (request.get("session_id") or request.get("start_session")):
+                    # Session turns reuse a per-conversation cache and cannot join a batch
+                    self._reply(connection, request_id, result=self.llm.generate_response(
+                        request["messages"], session_id=request.get("session_id"), start_session=request.get("start_session", False)
+                    ))
+                elif operation == "generate":
+                    self._reply(connection, request_id, result=self.scheduler.generate_response(request["messages"]))
+                elif operation == "batch":
+                    with self.llm.background(request.get("background", False)):
+                        result = self.llm.generate_batch(request["batch"], max_new_tokens=request.get("max_new_tokens"))
+                    self._reply(connection, request_id, result=result)
+                elif operation == "stream":
+                    for event in self.llm.stream_response(
+                        request["messages"],
+                        session_id=request.get("session_id"),
+                        start_session=request.get("start_session", False)
+                    ):
+                        connection.send({"id": request_id, "event": event})
+                else:
+                    self._reply(connection, request_id, error=f"Unknown operation: {operation}")
+            except (BrokenPipeError, EOFError, OSError):
+                self.logger.warning(f"Client for request {request_id} disconnected")
+            except Exception as e:
+                self._reply(connection, request_id, error=str(e))
+            finally:
+                connection.close()
+
+    def settings(self) -> Dict[str, Any]:
+        """Configuration clients mirror so cache eligibility and prompts match this process"""
+        config = self.llm.config
+        return {name: getattr(config, name) for name in RemoteLLMAPI.SERVER_SETTINGS + RemoteLLMAPI.SHARED_SETTINGS}
+
+    @staticmethod
+    def _reply(connection, request_id, result=None, error=None, close=False) -> None:
+        try:
+            connection.send({"id": request_id, "result": result, "error": error})
+        except (BrokenPipeError, OSError):
+            pass
+        if close:
+            connection.close()
+
+
+class RemoteLLMAPI(MistralLLMAPI):
+    """MistralLLMAPI stand-in that forwards model work to an LLMServer process.
+
+    Prompt formatting and cache-key helpers run locally; anything touching the
+    model goes over the socket, one connection per request.
+    """
+    # Seconds a readiness answer from the server is reused
+    READY_TTL = 2.0
+    # Generation settings of the server process, copied into this config from its status replies
+    SERVER_SETTINGS = ("deterministic", "temperature", "top_p", "max_length", "max_new_tokens")
+    # Prompt-building settings both processes read from their own environment; a mismatch is logged
+    SHARED_SETTINGS = ("compact_reports", "report_digests")
+
+    def __init__(self, config: LLMConfig, socket_path: str, timeout: float = 600.0):
+        # Nothing counts as deterministic (and so cacheable) until the server has said how it decodes
+        config = copy.copy(config)
+        config.deterministic = False
+        super().__init__(config)
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._status_checked = None
+        self._server_cache_params = None
+        self._mismatched = set()
+
+    def _connect(self):
+        # The key is read per connection so a restarted server's new key is picked up
+        return Client(self.socket_path, family="AF_UNIX", authkey=socket_authkey(self.socket_path))
+
+    def _request(self, operation: str, timeout: Optional[float] = None, **payload):
+        timeout = timeout or self.timeout
+        request_id = uuid.uuid4().hex
+        connection = self._connect()
+        try:
+            connection.send(dict(payload, id=request_id, op=operation, deadline=time.time() + timeout))
+            if not connection.poll(timeout):
+                raise TimeoutError(f"LLM server did not answer {operation} within {timeout}s")
+            reply = connection.recv()
+        finally:
+            connection.close()
+        if reply.get("id") != request_id:
+            raise RuntimeError("LLM server returned a reply for a different request")
+        if reply.get("error"):
+            raise RuntimeError(f"LLM server error: {reply['error']}")
+        return reply["result"]
+
+    def initialize(self) -> bool:
+        return self.ready
+
+    def start_background_initialize(self) -> None:
+        """The server process owns model loading"""
+        return None
+
+    def ensure_initialized(self) -> None:
+        if not self.ready:
+            raise RuntimeError("LLM server is not ready")
+
+    @property
+    def ready(self) -> bool:
+        if self._status_checked is None or time.monotonic() - self._status_checked > self.READY_TTL:
+            self.status()
+        return self.state == "ready"
+
+    def status(self) -> Dict[str, Any]:
+        try:
+            status = self._request("status", timeout=5)
+        except (OSError, RuntimeError, TimeoutError, AuthenticationError) as e:
+            status = {"state": "failed", "stage": None, "elapsed_seconds": None, "load_seconds": None,
+                      "precision": self.config.precision, "error": f"LLM server unreachable: {str(e)}"}
+        self._apply_server_settings(status)
+        self.state = status["state"]
+        self._status_checked = time.monotonic()
+        return dict(status, server=self.socket_path)
+
+    def _apply_server_settings(self, status: Dict[str, Any]) -> None:
+        settings = status.get("settings")
+        if not settings:
+            return
+        for name in self.SERVER_SETTINGS:
+            setattr(self.config, name, settings[name])
+        self._server_cache_params = status.get("cache_params")
+        for name in self.SHARED_SETTINGS:
+            if settings[name] != getattr(self.config, name) and name not in self._mismatched:
+                self._mismatched.add(name)
+                self.logger.warning(
+                    f"LLM server runs with {name}={settings[name]} but this process has {getattr(self.config, name)}; "
+                    f"set GUARDSTICK_LLM_{name.upper()} the same for both"
+                )
+
+    def cache_params(self) -> Dict[str, Any]:
+        """The server's settings once known, since it is the process generating the text"""
+        return self._server_cache_params or super().cache_params()
+
+    def count_tokens(self, text: str) -> int:
+        return self._request("count_tokens", text=text)
+
+    def tokenize_with_offsets(self, text: str) -> Tuple[List[int], List[int]]:
+        return self._request("tokenize_with_offsets", text=text)
+
+    def has_session(self, session_id: str) -> bool:
+        return self._request("has_session", session_id=session_id)
+
+    def end_session(self, session_id: str) -> bool:
+        return self._request("end_session", session_id=session_id)
+
+    def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        session_id: Optional[str] = None,
+        start_session: bool = False
+    ) -> LLMResponse:
+        if self.interrupted():
+            return LLMResponse(text="", metadata={}, error=GENERATION_INTERRUPTED)
+        try:
+            return self._request("generate", messages=messages, session_id=session_id, start_session=start_session)
+        except Exception as e:
+            self.logger.error(f"Remote generation failed: {str(e)}")
+            return LLMResponse(text="", metadata={}, error=str(e))
+
+    def generate_batch(self, batch: List[List[Dict[str, str]]], max_new_tokens: Optional[int] = None) -> List[LLMResponse]:
+        # The server cannot be interrupted mid-generation, only between requests
+        if self.interrupted():
+            return [LLMResponse(text="", metadata={}, error=GENERATION_INTERRUPTED) for _ in batch]
+        try:
+            return self._request("batch", batch=batch, max_new_tokens=max_new_tokens, background=self.in_background())
+        except Exception as e:
+            self.logger.error(f"Remote batched generation failed: {str(e)}")
+            return [LLMResponse(text="", metadata={}, error=str(e)) for _ in batch]
+
+    def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        session_id: Optional[str] = None,
+        start_session: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        request_id = uuid.uuid4().hex
+        try:
+            connection = self._connect()
+        except (OSError, AuthenticationError) as e:
+            yield {"done": True, "response": LLMResponse(text="", metadata={}, error=f"LLM server unreachable: {str(e)}")}
+            return
+        try:
+            connection.send({"id": request_id, "op": "stream", "messages": messages,
+                             "session_id": session_id, "start_session": start_session,
+                             "deadline": time.time() + self.timeout})
+            while True:
+                if not connection.poll(self.timeout):
+                    raise TimeoutError("LLM server stopped streaming")
+                reply = connection.recv()
+                if reply.get("error"):
+                    raise RuntimeError(f"LLM server error: {reply['error']}")
+                event = reply["event"]
+                yield event
+                if event.get("done"):
+                    return
+        except Exception as e:
+            yield {"done": True, "response": LLMResponse(text="", metadata={}, error=str(e))}
+        finally:
+            connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GuardStick shared LLM server")
+    parser.add_argument("--socket", default=os.environ.get("GUARDSTICK_LLM_SOCKET", "/tmp/guardstick-llm.sock"))
+    parser.add_argument("--model", default=os.path.join(SRC_DIR, "models", "Mistral-7B-v0.3"))
+    parser.add_argument("--precision", default=os.environ.get("GUARDSTICK_LLM_PRECISION"),
+                        help="fp32, bf16, int8 or int4 (default: bf16 when the CPU supports it, else fp32)")
+    parser.add_argument("--draft-model", default=os.environ.get("GUARDSTICK_LLM_DRAFT_MODEL"),
+                        help="Small model sharing the tokenizer, used for speculative decoding")
+    parser.add_argument("--backend", default=os.environ.get("GUARDSTICK_LLM_BACKEND", "transformers"),
+                        choices=("transformers", "onnxruntime", "openai_http"), help="Generation engine")
+    parser.add_argument("--onnx-model", default=os.environ.get("GUARDSTICK_LLM_ONNX_MODEL"),
+                        help="Exported ONNX decoder for the onnxruntime backend")
+    parser.add_argument("--backend-url", default=os.environ.get("GUARDSTICK_LLM_BACKEND_URL"),
+                        help="OpenAI-compatible server for the openai_http backend")
+    parser.add_argument("--idle-unload-minutes", type=float,
+                        default=float(os.environ.get("GUARDSTICK_LLM_IDLE_UNLOAD_MINUTES", "30")),
+                        help="Release the model weights after this many idle minutes (0 = never)")
+    parser.add_argument("--optimize", action="store_true", default=os.environ.get("GUARDSTICK_LLM_OPTIMIZE", "0") == "1",
+                        help="Compile the model for CPU (torch.compile, fused attention, oneDNN)")
+    parser.add_argument("--deterministic", action="store_true",
+                        default=os.environ.get("GUARDSTICK_LLM_DETERMINISTIC", "0") == "1",
+                        help="Decode greedily so web workers may cache answers")
+    parser.add_argument("--compact-reports", action=argparse.BooleanOptionalAction,
+                        default=os.environ.get("GUARDSTICK_LLM_COMPACT_REPORTS", "1") == "1",
+                        help="Must match the web workers' GUARDSTICK_LLM_COMPACT_REPORTS")
+    parser.add_argument("--report-digests", action=argparse.BooleanOptionalAction,
+                        default=os.environ.get("GUARDSTICK_LLM_REPORT_DIGESTS", "1") == "1",
+                        help="Must match the web workers' GUARDSTICK_LLM_REPORT_DIGESTS")
+    parser.add_argument("--workers", type=int, default=4, help="Requests executed concurrently (batched together)")
+    parser.add_argument("--max-pending", type=int, default=16, help="Queued requests before answering busy")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not args.precision:
+        args.precision, reason = default_precision()
+        logging.getLogger(__name__).info(f"LLM precision {args.precision}: {reason}")
+    config = LLMConfig(
+        model_name_or_path=args.model,
+        max_length=512,
+        temperature=0.7,
+        top_p=0.9,
+        num_return_sequences=1,
+        max_new_tokens=1024,
+        precision=args.precision,
+        cache_dir=os.path.join(SRC_DIR, "models", "cache"),
+        draft_model_name_or_path=args.draft_model,
+        backend=args.backend,
+        onnx_model_path=args.onnx_model,
+        backend_url=args.backend_url,
+        idle_unload_minutes=args.idle_unload_minutes or None,
+        optimize=args.optimize,
+        deterministic=args.deterministic,
+        compact_reports=args.compact_reports,
+        report_digests=args.report_digests
+    )
+    LLMServer(MistralLLMAPI(config), args.socket, workers=args.workers, max_pending=args.max_pending).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# src/utils/llm_sessions.py
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import torch
+
+SESSION_EXPIRED = "Session expired or not found"
+SESSION_BUSY = "Session is already answering a question"
+SESSION_FULL = "Session context is full; start a new session"
+
+
+@dataclass
+class ConversationSession:
+    """Token ids of a conversation and the key/values the model computed for them"""
+    session_id: str
+    input_ids: torch.LongTensor
+    past_key_values: Any
+    turns: int = 1
+    created: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+
+    @property
+    def tokens(self) -> int:
+        return self.input_ids.shape[1]
+
+
+def crop_past_key_values(past_key_values, length: int):
+    """Keep the first ``length`` positions of a legacy (tuple) key/value cache"""
+    return tuple(
+        tuple(tensor[:, :, :length, :] for tensor in layer)
+        for layer in past_key_values
+    )
+
+
+class SessionStore:
+    """Bounded store of conversation sessions.
+
+    A session is checked out while a question is being answered, so two
+    follow-ups cannot race on the same cache. Idle sessions expire after
+    ``idle_seconds``; beyond ``max_sessions`` or ``max_total_tokens`` cached
+    tokens the least recently used sessions are evicted.
+    """
+    def __init__(self, max_sessions: int = 8, max_total_tokens: int = 8192, idle_seconds: float = 900):
+        self.max_sessions = max_sessions
+        self.max_total_tokens = max_total_tokens
+        self.idle_seconds = idle_seconds
+        self.logger = logging.getLogger(__name__)
+        self._sessions = OrderedDict()
+        self._busy = set()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            self._evict_idle()
+            return session_id in self._sessions or session_id in self._busy
+
+    def checkout(self, session_id: str) -> ConversationSession:
+        """Take a session for exclusive use; raises KeyError or RuntimeError with the reason"""
+        with self._lock:
+            self._evict_idle()
+            if session_id in self._busy:
+                raise RuntimeError(SESSION_BUSY)
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                raise KeyError(SESSION_EXPIRED)
+            self._busy.add(session_id)
+            return session
+
+    def release(self, session: ConversationSession) -> None:
+        """Return a checked-out session unchanged (e.g. after a failed turn)"""
+        with self._lock:
+            self._busy.discard(session.session_id)
+            self._sessions[session.session_id] = session
+            self._enforce_limits()
+
+    def save(self, input_ids: torch.LongTensor, past_key_values, session: Optional[ConversationSession] = None) -> ConversationSession:
+        """Store the conversation state after a turn, creating the session on the first turn"""
+        if session is None:
+            session = ConversationSession(uuid.uuid4().hex, input_ids, past_key_values)
+        else:
+            session.input_ids = input_ids
+            session.past_key_values = past_key_values
+            session.turns += 1
+            session.last_used = time.time()
+
+        with self._lock:
+            self._busy.discard(session.session_id)
+            self._sessions[session.session_id] = session
+            self._enforce_limits()
+        return session
+
+    def discard(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def clear(self) -> int:
+        """Drop every idle session (their key/values belong to weights being released)"""
+        with self._lock:
+            dropped = len(self._sessions)
+            self._sessions.clear()
+            self.evictions += dropped
+            return dropped
+
+    def _evict_idle(self) -> None:
+        cutoff = time.time() - self.idle_seconds
+        for session_id in [sid for sid, session in self._sessions.items() if session.last_used < cutoff]:
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def _enforce_limits(self) -> None:
+        self._evict_idle()
+        total = sum(session.tokens for session in self._sessions.values())
+        while self._sessions and (len(self._sessions) > self.max_sessions or total > self.max_total_tokens):
+            session_id, session = self._sessions.popitem(last=False)
+            total -= session.tokens
+            self.evictions += 1
+            self.logger.info(f"Evicted session {session_id} ({session.tokens} cached tokens)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "active": len(self._busy),
+                "cached_tokens": sum(session.tokens for session in self._sessions.values()),
+                "max_total_tokens": self.max_total_tokens,
+                "evictions": self.evictions
+            }
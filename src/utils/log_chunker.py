@@ -0,0 +1,210 @@
+# src/utils/log_chunker.py
+import json
+import logging
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.report_tokens import FINDING_PATTERN
+
+
+def split_records(content: str, count_tokens: Callable[[str], int], budget: int) -> Iterator[str]:
+    """Split a report into records that each fit within the token budget.
+
+    JSON reports are split on list items and top-level keys, descending into
+    any record that is still too large; text reports are split on lines.
+    """
+    try:
+        data = json.loads(content)
+    except ValueError:
+        for line in content.splitlines():
+            if line.strip():
+                yield from _split_text(line, count_tokens, budget)
+        return
+    yield from _split_value(data, "", count_tokens, budget)
+
+
+def _split_value(value: Any, path: str, count_tokens: Callable[[str], int], budget: int) -> Iterator[str]:
+    serialized = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    record = f"{path}: {serialized}" if path else serialized
+    if count_tokens(record) <= budget or not isinstance(value, (list, dict)) or not value:
+        if isinstance(value, str) and count_tokens(record) > budget:
+            yield from _split_text(record, count_tokens, budget)
+        else:
+            yield record
+        return
+
+    items = value.items() if isinstance(value, dict) else enumerate(value)
+    for key, item in items:
+        child_path = f"{path}.{key}" if isinstance(value, dict) else f"{path}[{key}]"
+        yield from _split_value(item, child_path.lstrip("."), count_tokens, budget)
+
+
+def _split_text(text: str, count_tokens: Callable[[str], int], budget: int) -> Iterator[str]:
+    """Hard-split a single oversized line into budget-sized pieces"""
+    if count_tokens(text) <= budget:
+        yield text
+        return
+    # Roughly four characters per token; halve until a piece fits
+    width = max(1, budget * 4)
+    while width > 1 and count_tokens(text[:width]) > budget:
+        width //= 2
+    for start in range(0, len(text), width):
+        yield text[start:start + width]
+
+
+def pack_chunks(records: Iterator[str], count_tokens: Callable[[str], int], budget: int) -> List[str]:
+    """Greedily pack consecutive records into chunks of at most ``budget`` tokens"""
+    chunks, current, current_tokens = [], [], 0
+    for record in records:
+        tokens = count_tokens(record) + 1  # Joining newline
+        if current and current_tokens + tokens > budget:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(record)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class ChunkedAnalyzer:
+    """Map-reduce analysis for logs that exceed the model's context budget.
+
+    The map stage extracts question-relevant findings from each token-budgeted
+    chunk in batched generate calls; the reduce stage merges the findings and
+    answers the question.
+    """
+    MAP_INSTRUCTION = (
+        "List only the facts from this log excerpt that help answer the question "
+        "\"{question}\". Reply \"Nothing relevant.\" if there are none."
+    )
+
+    MAX_REDUCE_PASSES = 3
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.logger = logging.getLogger(__name__)
+
+    def chunk_budget(self, instruction: str) -> int:
+        """Tokens available for log content once the preamble and map instruction are included"""
+        config = self.llm.config
+        if config.chunk_tokens:
+            return config.chunk_tokens
+        overhead = self.llm.count_tokens(self.llm.format_prompt([{
+            "role": "user",
+            "content": instruction
+        }]))
+        return max(64, config.max_length - overhead - 16)
+
+    def build_chunks(self, instruction: str, logs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Split every log on record boundaries into (log name, chunk) pairs"""
+        budget = self.chunk_budget(instruction)
+        count_tokens = self.llm.count_tokens
+        chunks = []
+        for name, content in logs:
+            for chunk in pack_chunks(split_records(content, count_tokens, budget), count_tokens, budget):
+                chunks.append((name, chunk))
+        return chunks
+
+    def select_chunks(self, chunks: List[Tuple[str, str]]) -> Tuple[List[Tuple[str, str]], Dict[str, int]]:
+        """Keep at most ``max_chunks`` chunks, preferring those with error/warning lines.
+
+        Returns the kept chunks in their original order and the number of
+        dropped chunks per log.
+        """
+        limit = self.llm.config.max_chunks
+        if not limit or len(chunks) <= limit:
+            return chunks, {}
+        # Stable sort: chunks with findings first, each group in log order
+        ranked = sorted(range(len(chunks)), key=lambda i: not FINDING_PATTERN.search(chunks[i][1].encode("utf-8")))
+        kept = set(ranked[:limit])
+        dropped = Counter(name for i, (name, _) in enumerate(chunks) if i not in kept)
+        return [chunk for i, chunk in enumerate(chunks) if i in kept], dict(dropped)
+
+    def _map(self, instruction: str, chunks: List[Tuple[str, str]]) -> List[Tuple[str, Any]]:
+        """Run per-chunk extraction, ``chunk_concurrency`` chunks per generate call"""
+        config = self.llm.config
+        batch_size = max(1, config.chunk_concurrency)
+        results = []
+        for start in range(0, len(chunks), batch_size):
+            group = chunks[start:start + batch_size]
+            batch = [[{
+                "role": "user",
+                "content": f"{instruction}\n\nLog excerpt from {name}:\n{chunk}"
+            }] for name, chunk in group]
+            for (name, _), response in zip(group, self.llm.generate_batch(batch, max_new_tokens=config.map_max_new_tokens)):
+                results.append((name, response))
+        return results
+
+    @staticmethod
+    def _collect_findings(results: List[Tuple[str, Any]]) -> Tuple[List[str], int]:
+        """Keep non-empty extractions, tagged with their source log, and count failures"""
+        findings, errors = [], 0
+        for name, response in results:
+            if response.error:
+                errors += 1
+                continue
+            text = response.text.strip()
+            if text and "nothing relevant" not in text.lower():
+                findings.append(text if name == "findings" else f"[{name}] {text}")
+        return findings, errors
+
+    def analyze(
+        self,
+        question: str,
+        logs: List[Tuple[str, str]],
+        map_instruction: Optional[str] = None,
+        max_new_tokens: Optional[int] = None
+    ):
+        """Answer a question over logs of any size, returning an LLMResponse.
+
+        ``map_instruction`` replaces the extraction prompt built from
+        ``MAP_INSTRUCTION`` and ``max_new_tokens`` caps the final answer
+        instead of the configured limit.
+        """
+        instruction = map_instruction or self.MAP_INSTRUCTION.format(question=question)
+        chunks = self.build_chunks(instruction, logs)
+        total_chunks = len(chunks)
+        chunks, dropped = self.select_chunks(chunks)
+        if dropped:
+            self.logger.warning(
+                f"Chunked analysis limited to {len(chunks)} of {total_chunks} chunks; dropped per log: {dropped}"
+            )
+
+        results = self._map(instruction, chunks)
+        findings, errors = self._collect_findings(results)
+        if results and errors == len(results):
+            return results[0][1]  # Every extraction failed; surface the error
+        chunks_with_findings = len(findings)
+
+        # Merge findings in further map passes until they fit a single prompt
+        budget = self.chunk_budget(instruction)
+        reduce_passes = 0
+        while len(findings) > 1 and reduce_passes < self.MAX_REDUCE_PASSES:
+            packed = pack_chunks(iter(findings), self.llm.count_tokens, budget)
+            if len(packed) == 1:
+                break
+            findings, _ = self._collect_findings(self._map(instruction, [("findings", text) for text in packed]))
+            reduce_passes += 1
+
+        summary = "\n".join(f"- {finding}" for finding in findings) or "- No relevant findings in the logs."
+        messages = [{
+            "role": "user",
+            "content": f"{question}\n\nFindings extracted from the logs:\n{summary}"
+        }]
+        if max_new_tokens:
+            result = self.llm.generate_batch([messages], max_new_tokens=max_new_tokens)[0]
+        else:
+            result = self.llm.generate_response(messages)
+        if not result.error:
+            result.metadata.update({
+                "mode": "chunked",
+                "chunks_total": total_chunks,
+                "chunks_analyzed": len(chunks),
+                "chunks_dropped": total_chunks - len(chunks),
+                "dropped_chunks_by_log": dropped,
+                "chunks_with_findings": chunks_with_findings,
+                "chunk_errors": errors,
+                "reduce_passes": reduce_passes
+            })
+        return result
@@ -0,0 +1,160 @@
+# src/utils/log_templates.py
+import re
+import json
+from typing import Any, Dict, List, Optional
+
+TIMESTAMP_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:[+-]\d{2}:?\d{2}|Z)?)\s*")
+MASK_PATTERNS = [
+    re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.IGNORECASE),  # UUID
+    re.compile(r"^\d{1,3}(\.\d{1,3}){3}(:\d+)?$"),  # IPv4 (optionally with port)
+    re.compile(r"^0x[0-9a-f]+$", re.IGNORECASE),  # Hex address / thread id
+    re.compile(r"^[0-9a-f]{12,}$", re.IGNORECASE),  # Hashes
+    re.compile(r"^[-+]?\d+(\.\d+)?[a-z%]*$", re.IGNORECASE),  # Numbers, PIDs, sizes
+    re.compile(r"^\[?\d+\]?:?$"),  # [pid] / pid:
+]
+WILDCARD = "<*>"
+
+
+def mask_token(token: str) -> str:
+    """Replace obviously variable tokens with the wildcard"""
+    stripped = token.strip("()[],;")
+    if any(pattern.match(stripped) for pattern in MASK_PATTERNS):
+        return WILDCARD
+    return token
+
+
+class LogCluster:
+    """A log template with its occurrence count, time span and example variables"""
+    def __init__(self, tokens: List[str]):
+        self.template = tokens
+        self.count = 0
+        self.first_seen = None
+        self.last_seen = None
+        self.examples = []
+
+
+class LogTemplateMiner:
+    """Drain-style online log template miner.
+
+    Lines are routed through a fixed-depth prefix tree keyed on token count and
+    leading tokens, then merged into the most similar cluster in the leaf (or
+    start a new one). Positions that differ between merged lines become
+    wildcards in the template.
+    """
+    def __init__(self, depth: int = 4, similarity_threshold: float = 0.5,
+                 max_children: int = 100, max_examples: int = 3):
+        self.depth = max(3, depth)
+        self.similarity_threshold = similarity_threshold
+        self.max_children = max_children
+        self.max_examples = max_examples
+        self.root = {}
+        self.clusters = []
+
+    def add_line(self, line: str) -> Optional[LogCluster]:
+        """Add a raw log line, returning the cluster it was assigned to"""
+        line = line.strip()
+        if not line:
+            return None
+
+        timestamp = None
+        match = TIMESTAMP_PATTERN.match(line)
+        if match:
+            timestamp = match.group(1)
+            line = line[match.end():]
+
+        raw_tokens = line.split()
+        tokens = [mask_token(token) for token in raw_tokens]
+        cluster = self._match(tokens)
+        if cluster is None:
+            cluster = LogCluster(tokens)
+            self._leaf(tokens).append(cluster)
+            self.clusters.append(cluster)
+        else:
+            cluster.template = [
+                template_token if template_token == token else WILDCARD
+                for template_token, token in zip(cluster.template, tokens)
+            ]
+
+        cluster.count += 1
+        if timestamp:
+            cluster.first_seen = min(cluster.first_seen or timestamp, timestamp)
+            cluster.last_seen = max(cluster.last_seen or timestamp, timestamp)
+        variables = [raw for raw, template_token in zip(raw_tokens, cluster.template) if template_token == WILDCARD]
+        if variables and len(cluster.examples) < self.max_examples and variables not in cluster.examples:
+            cluster.examples.append(variables)
+        return cluster
+
+    def _leaf(self, tokens: List[str]) -> List[LogCluster]:
+        """Walk (creating as needed) the prefix-tree path for a token sequence"""
+        node = self.root.setdefault(len(tokens), {})
+        for token in tokens[:self.depth - 2]:
+            key = WILDCARD if any(char.isdigit() for char in token) else token
+            if key not in node and len(node) >= self.max_children:
+                key = WILDCARD
+            node = node.setdefault(key, {})
+        return node.setdefault("__clusters__", [])
+
+    def _match(self, tokens: List[str]) -> Optional[LogCluster]:
+        best, best_similarity = None, -1.0
+        for cluster in self._leaf(tokens):
+            same = sum(1 for a, b in zip(cluster.template, tokens) if a == b or a == WILDCARD)
+            similarity = same / len(tokens) if tokens else 1.0
+            if similarity > best_similarity:
+                best, best_similarity = cluster, similarity
+        return best if best_similarity >= self.similarity_threshold else None
+
+    def templates(self) -> List[Dict[str, Any]]:
+        """Templates ordered by frequency, as JSON-serializable dicts"""
+        return [{
+            "template": " ".join(cluster.template),
+            "count": cluster.count,
+            "first_seen": cluster.first_seen,
+            "last_seen": cluster.last_seen,
+            "example_variables": cluster.examples
+        } for cluster in sorted(self.clusters, key=lambda c: c.count, reverse=True)]
+
+
+def mine_templates(lines: List[str], **kwargs) -> List[Dict[str, Any]]:
+    """Collapse log lines into templates with counts, time spans and example variables"""
+    miner = LogTemplateMiner(**kwargs)
+    for line in lines:
+        miner.add_line(line)
+    return miner.templates()
+
+
+def format_templates(templates: List[Dict[str, Any]]) -> str:
+    """Render mined templates as compact text lines for prompting"""
+    lines = []
+    for template in templates:
+        span = ""
+        if template["first_seen"]:
+            span = f" {template['first_seen']}..{template['last_seen']}"
+        examples = ""
+        if template["example_variables"]:
+            examples = " | e.g. " + "; ".join(" ".join(v) for v in template["example_variables"])
+        lines.append(f"[{template['count']}x{span}] {template['template']}{examples}")
+    return "\n".join(lines)
+
+
+def _compress_value(value: Any, min_lines: int) -> Any:
+    if isinstance(value, list):
+        if len(value) >= min_lines and all(isinstance(item, str) for item in value):
+            return format_templates(mine_templates(value)).splitlines()
+        return [_compress_value(item, min_lines) for item in value]
+    if isinstance(value, dict):
+        return {key: _compress_value(item, min_lines) for key, item in value.items()}
+    return value
+
+
+def compress_report(content: str, min_lines: int = 20) -> str:
+    """Replace runs of raw log lines in a report with their mined templates.
+
+    In JSON reports every list of at least ``min_lines`` strings is collapsed;
+    plain-text reports are mined line by line.
+    """
+    try:
+        data = json.loads(content)
+    except ValueError:
+        lines = content.splitlines()
+        return format_templates(mine_templates(lines)) if len(lines) >= min_lines else content
+    return json.dumps(_compress_value(data, min_lines), separators=(",", ":"), ensure_ascii=False)
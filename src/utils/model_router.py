@@ -0,0 +1,43 @@
+# src/utils/model_router.py
+import re
+from typing import Tuple
+
+DEPTHS = ("auto", "quick", "deep")
+
+# Lookups with a short factual answer: counts, lists, yes/no and "which/when" questions
+QUICK_PATTERN = re.compile(
+    r"^\s*(how (many|much|often)|count|list|show|which|what (is|was|are|were) the|"
+    r"(is|are|was|were|did|does|do|has|have) there|when|where|who)\b",
+    re.IGNORECASE
+)
+# Questions that need reasoning across the logs
+DEEP_PATTERN = re.compile(
+    r"\b(why|explain|analy[sz]|investigat|root cause|risk|recommend|should|compare|correlat|"
+    r"summar|assess|threat|timeline|suspicious|compromis|secure)",
+    re.IGNORECASE
+)
+# Longer questions usually ask for more than a lookup
+QUICK_MAX_WORDS = 16
+# The quick model only answers when it would see at least this share of the selected logs
+QUICK_MIN_COVERAGE = 0.5
+
+
+def route_question(question: str, context_tokens: int, quick_context_tokens: int, depth: str = "auto") -> Tuple[str, str]:
+    """Pick the model tier for a question, returning (tier, reason).
+
+    ``depth`` forces a tier; with "auto" a question goes to the quick model
+    only when it reads as a lookup, is short, and most of the selected logs
+    (``context_tokens``) fit the quick model's context. Anything else goes to
+    the deep model.
+    """
+    if depth not in DEPTHS:
+        raise ValueError(f"Unknown depth '{depth}', expected one of {DEPTHS}")
+    if depth != "auto":
+        return depth, "requested"
+    if context_tokens * QUICK_MIN_COVERAGE > quick_context_tokens:
+        return "deep", "context_size"
+    if DEEP_PATTERN.search(question):
+        return "deep", "question_type"
+    if QUICK_PATTERN.search(question) and len(question.split()) <= QUICK_MAX_WORDS:
+        return "quick", "question_type"
+    return "deep", "default"
@@ -0,0 +1,194 @@
+# src/utils/report_compactors.py
+import os
+import re
+import json
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+# Bump when the output format changes so token caches and cached answers are rebuilt
+COMPACTOR_VERSION = 1
+# Reports are saved as <Type>_Report_<timestamp>.json
+REPORT_TYPE_PATTERN = re.compile(r"^(?P<type>.+?)_Report_")
+# Placeholders the scans write when a value is missing
+NULL_VALUES = (None, "", "N/A", [], {})
+
+COMPACTORS: Dict[str, Callable[[Any], List[str]]] = {}
+
+
+def register_compactor(report_type: str):
+    """Register a function turning a parsed report of ``report_type`` into prompt lines"""
+    def decorator(func: Callable[[Any], List[str]]) -> Callable[[Any], List[str]]:
+        COMPACTORS[report_type] = func
+        return func
+    return decorator
+
+
+def report_type(name: str) -> Optional[str]:
+    """Scan type of a report file name, e.g. "Network_Connections" """
+    match = REPORT_TYPE_PATTERN.match(os.path.basename(name))
+    return match.group("type") if match else None
+
+
+def is_null(value: Any) -> bool:
+    return value is None or (isinstance(value, (str, list, dict)) and value in NULL_VALUES)
+
+
+def is_scalar(value: Any) -> bool:
+    return not isinstance(value, (dict, list))
+
+
+def scalar_text(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return " ".join(str(value).split())
+
+
+def grouped(values: List[Any]) -> str:
+    """Comma-separated distinct values in first-seen order, with counts for repeats"""
+    counts = Counter(values)
+    return ", ".join(
+        scalar_text(value) + (f" ({counts[value]}x)" if counts[value] > 1 else "")
+        for value in dict.fromkeys(values)
+    )
+
+
+def compact_records(records: List[Dict[str, Any]], indent: str = "") -> List[str]:
+    """Render a list of flat dicts as a table.
+
+    Empty columns are dropped, columns with one value across all rows become a
+    single "all:" line and identical rows are merged with a count.
+    """
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    columns = [column for column in columns if not all(is_null(record.get(column)) for record in records)]
+    constant = [
+        column for column in columns
+        if len(records) > 1 and len({scalar_text(record.get(column)) for record in records}) == 1
+    ]
+    varying = [column for column in columns if column not in constant]
+
+    lines = [f"{indent}{len(records)} entries"]
+    if constant:
+        lines.append(indent + "all: " + "; ".join(f"{column}={scalar_text(records[0][column])}" for column in constant))
+    if varying:
+        rows = [
+            " | ".join("" if is_null(record.get(column)) else scalar_text(record[column]) for column in varying)
+            for record in records
+        ]
+        lines.append(indent + " | ".join(varying))
+        counts = Counter(rows)
+        lines.extend(
+            indent + row + (f" ({counts[row]}x)" if counts[row] > 1 else "")
+            for row in dict.fromkeys(rows)
+        )
+    return lines
+
+
+def compact_value(value: Any, indent: str = "") -> List[str]:
+    """Generic compaction of a parsed JSON value into indented lines.
+
+    Nulls are dropped, flat dicts become one "key: value; ..." line, lists of
+    flat dicts become tables and lists of scalars are grouped with counts.
+    """
+    if is_scalar(value):
+        return [] if is_null(value) else [indent + scalar_text(value)]
+
+    if isinstance(value, dict):
+        scalars = [(key, item) for key, item in value.items() if is_scalar(item) and not is_null(item)]
+        lines = [indent + "; ".join(f"{key}: {scalar_text(item)}" for key, item in scalars)] if scalars else []
+        for key, item in value.items():
+            if is_scalar(item) or is_null(item):
+                continue
+            nested = compact_value(item, indent + "  ")
+            if nested:
+                lines.append(f"{indent}{key}:")
+                lines.extend(nested)
+        return lines
+
+    items = [item for item in value if not is_null(item)]
+    if not items:
+        return []
+    if all(is_scalar(item) for item in items):
+        return [f"{indent}{len(items)} items: {grouped(items)}"]
+    if all(isinstance(item, dict) and all(is_scalar(field) for field in item.values()) for item in items):
+        return compact_records(items, indent)
+    lines = []
+    for item in items:
+        nested = compact_value(item, indent + "  ")
+        if nested:
+            lines.append(f"{indent}- {nested[0].lstrip()}")
+            lines.extend(nested[1:])
+    return lines
+
+
+@register_compactor("Application_Security")
+def compact_application_security(data: Any) -> List[str]:
+    """Application entries from 1-check-malware.py, grouped by status, directory and note"""
+    if not (isinstance(data, list) and data and all(isinstance(entry, dict) and "application_name" in entry
+                                                     for entry in data)):
+        return compact_value(data)
+
+    statuses = Counter(entry.get("status") or "unknown" for entry in data)
+    # Findings first
+    order = sorted(statuses, key=lambda status: (status == "trusted", status))
+    lines = [f"{len(data)} applications: " + ", ".join(f"{statuses[status]} {status}" for status in order)]
+    for status in order:
+        groups = {}  # (directory, note) -> application names
+        for entry in data:
+            if (entry.get("status") or "unknown") != status:
+                continue
+            name, path = entry["application_name"], entry.get("application_path") or ""
+            directory = os.path.dirname(path) if os.path.basename(path) == name else None
+            label = name if directory is not None else f"{name} ({path})" if path else name
+            note = "" if is_null(entry.get("notes")) else scalar_text(entry["notes"])
+            groups.setdefault((directory or "other", note), []).append(label)
+        lines.append(f"{status} ({statuses[status]}):")
+        lines.extend(
+            f"  {directory}{f' [{note}]' if note else ''}: {', '.join(labels)}"
+            for (directory, note), labels in groups.items()
+        )
+    return lines
+
+
+@register_compactor("Network_Connections")
+def compact_network_connections(data: Any) -> List[str]:
+    """Connections from 13-check-suspicious-ports.py, grouped by application and remote endpoint"""
+    if not (isinstance(data, dict) and isinstance(data.get("results"), list)):
+        return compact_value(data)
+
+    lines = []
+    for key in ("scan_metadata", "summary"):
+        lines.extend(compact_value(data.get(key) or {}))
+    applications = {}
+    for connection in data["results"]:
+        owner = (connection.get("application") or "Unknown", connection.get("user") or "")
+        applications.setdefault(owner, []).append(connection)
+
+    for (application, user), connections in sorted(applications.items(), key=lambda item: -len(item[1])):
+        lines.append(f"{application}{f' (user {user})' if user else ''}: {len(connections)} connections")
+        endpoints = [
+            f"{connection.get('ip_address')}:{connection.get('port')} " + " / ".join(
+                scalar_text(connection[field]) for field in ("country", "organization", "network")
+                if not is_null(connection.get(field))
+            )
+            for connection in connections
+        ]
+        counts = Counter(endpoints)
+        lines.extend(
+            f"  {endpoint}" + (f" ({counts[endpoint]}x)" if counts[endpoint] > 1 else "")
+            for endpoint in dict.fromkeys(endpoints)
+        )
+    other = {key: value for key, value in data.items() if key not in ("scan_metadata", "summary", "results")}
+    return lines + compact_value(other)
+
+
+def compact_report(name: str, content: str) -> str:
+    """Dense text form of a JSON report for prompting, using the compactor registered for its type.
+
+    Reports that are not JSON are returned unchanged.
+    """
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return content
+    compactor = COMPACTORS.get(report_type(name), compact_value)
+    return "\n".join(compactor(data)) + "\n"
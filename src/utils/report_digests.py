@@ -0,0 +1,129 @@
+# src/utils/report_digests.py
+import os
+import re
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.response_cache import file_digest
+
+DIGEST_INSTRUCTION = (
+    "Summarize this security report for later questions. Use these headings, one short line or "
+    "bullet list each:\nCheck: what the report covers.\nStatus: overall result.\n"
+    "Findings: every error, warning or suspicious item, with names, counts and values.\n"
+    "Counts: totals of entries by kind.\nWrite \"none\" under a heading with nothing to report."
+)
+# Extraction prompt for each part of a report too large to digest in one prompt
+DIGEST_MAP_INSTRUCTION = (
+    "List what this part of a security report checks, its result, every error, warning or suspicious item "
+    "with names, counts and values, and the totals of entries by kind. Reply \"Nothing relevant.\" if there are none."
+)
+# Questions that need exact lines or values a digest may have left out
+RAW_DETAIL_PATTERN = re.compile(
+    r"\b(exact|verbatim|raw|quote|line \d+|full (log|output|list|report)|(all|every) (the )?(lines?|entr|records?)|"
+    r"show me|print|timestamps?|hash(es)?|pids?|paths?|command line|ip address(es)?|port numbers?)",
+    re.IGNORECASE
+)
+
+
+class DigestInterrupted(Exception):
+    """Raised by a summarizer that gave way to other work; the report stays pending"""
+
+
+def digest_answers_question(question: str) -> bool:
+    """Whether the report digests are likely enough to answer ``question``"""
+    return not RAW_DETAIL_PATTERN.search(question)
+
+
+class ReportDigestStore:
+    """Short LLM-written summaries of reports, generated once per file content.
+
+    Entries are stored on disk as ``<sha256>.json`` so a report keeps its
+    digest across restarts and renames; in memory, reports are tracked by
+    (mtime, size) to avoid re-hashing unchanged files. Digests are built by
+    ``build`` with a caller-supplied summarizer, usually from a background
+    thread.
+    """
+    def __init__(self, cache_dir: str, reports_dir: str):
+        self.cache_dir = cache_dir
+        self.reports_dir = reports_dir
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._hashes = {}  # report name -> ((mtime, size), content hash)
+        self._failed = set()  # content hashes that could not be summarized this run
+        self.built = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def content_hash(self, name: str) -> str:
+        path = os.path.join(self.reports_dir, name)
+        stat = os.stat(path)
+        signature = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            known = self._hashes.get(name)
+        if known is not None and known[0] == signature:
+            return known[1]
+        content_hash = file_digest(path)
+        with self._lock:
+            self._hashes[name] = (signature, content_hash)
+        return content_hash
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.json")
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Digest of a report's current content, or None if it has not been built yet"""
+        try:
+            with open(self._path(self.content_hash(name)), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def pending(self) -> List[str]:
+        """Reports without a digest, newest first"""
+        if not os.path.isdir(self.reports_dir):
+            return []
+        reports = []
+        for name in os.listdir(self.reports_dir):
+            if not name.endswith(('.txt', '.json')):
+                continue
+            try:
+                content_hash = self.content_hash(name)
+                mtime = os.path.getmtime(os.path.join(self.reports_dir, name))
+            except OSError:
+                continue  # Deleted while scanning
+            if content_hash not in self._failed and not os.path.exists(self._path(content_hash)):
+                reports.append((mtime, name))
+        return [name for _, name in sorted(reports, reverse=True)]
+
+    def build(self, name: str, summarize: Callable[[str, str], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Summarize one report and persist the digest.
+
+        ``summarize(name, content)`` returns {"summary", ...} or raises; extra
+        keys (model, token counts) are stored alongside the summary. Reports
+        whose summarizer raised DigestInterrupted are retried on a later call.
+        """
+        content_hash = self.content_hash(name)
+        with open(os.path.join(self.reports_dir, name), "r", encoding="utf-8", errors="ignore") as f:
+            content = f.read()
+        try:
+            result = summarize(name, content)
+        except DigestInterrupted:
+            return None
+        except Exception as e:
+            self._failed.add(content_hash)
+            self.logger.warning(f"Could not build digest for {name}: {str(e)}")
+            return None
+
+        entry = dict(result, report=name, content_hash=content_hash, created=time.time())
+        try:
+            with open(self._path(content_hash), "w") as f:
+                json.dump(entry, f)
+        except OSError as e:
+            self.logger.warning(f"Could not persist digest for {name}: {str(e)}")
+        self.built += 1
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        return {"built": self.built, "failed": len(self._failed), "pending": len(self.pending())}
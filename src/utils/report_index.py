@@ -0,0 +1,139 @@
+# src/utils/report_index.py
+import os
+import re
+import math
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.log_chunker import split_records, pack_chunks
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token) used for chunking"""
+    return len(text) // 4 + 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased lexical terms for BM25"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class ReportIndex:
+    """Incremental BM25 index over record-level chunks of the reports directory.
+
+    Each report is split on record boundaries into chunks of roughly
+    ``chunk_tokens`` tokens. ``refresh`` only re-indexes reports whose size or
+    modification time changed, so it is cheap to call before every query.
+    """
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, reports_dir: str, chunk_tokens: int = 96):
+        self.reports_dir = reports_dir
+        self.chunk_tokens = chunk_tokens
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._files = {}      # report name -> {"signature": (mtime, size), "doc_ids": [...]}
+        self._docs = {}       # doc id -> (report name, position, text, length)
+        self._postings = {}   # term -> {doc id: term frequency}
+        self._total_length = 0
+        self._next_id = 0
+
+    def refresh(self) -> None:
+        """Index new or modified reports and drop deleted ones"""
+        if not os.path.isdir(self.reports_dir):
+            return
+        with self._lock:
+            present = set()
+            for name in os.listdir(self.reports_dir):
+                if not name.endswith(('.txt', '.json')):
+                    continue
+                path = os.path.join(self.reports_dir, name)
+                stat = os.stat(path)
+                signature = (stat.st_mtime, stat.st_size)
+                present.add(name)
+                if self._files.get(name, {}).get("signature") != signature:
+                    self._remove(name)
+                    self._add(name, path, signature)
+            for name in set(self._files) - present:
+                self._remove(name)
+
+    def _add(self, name: str, path: str, signature: Tuple[float, int]) -> None:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            content = f.read()
+        chunks = pack_chunks(
+            split_records(content, estimate_tokens, self.chunk_tokens),
+            estimate_tokens,
+            self.chunk_tokens
+        )
+
+        doc_ids = []
+        for position, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk))
+            if not terms:
+                continue
+            doc_id = self._next_id
+            self._next_id += 1
+            length = sum(terms.values())
+            self._docs[doc_id] = (name, position, chunk, length)
+            self._total_length += length
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = frequency
+            doc_ids.append(doc_id)
+
+        self._files[name] = {"signature": signature, "doc_ids": doc_ids}
+        self.logger.info(f"Indexed {len(doc_ids)} chunks from {name}")
+
+    def _remove(self, name: str) -> None:
+        entry = self._files.pop(name, None)
+        if not entry:
+            return
+        for doc_id in entry["doc_ids"]:
+            _, _, chunk, length = self._docs.pop(doc_id)
+            self._total_length -= length
+            for term in set(tokenize(chunk)):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    def search(self, query: str, reports: Optional[Iterable[str]] = None, top_k: int = 8) -> List[Dict]:
+        """Return the top-k chunks for a query, optionally limited to some reports"""
+        self.refresh()
+        with self._lock:
+            allowed = None
+            if reports is not None:
+                allowed = set()
+                for name in reports:
+                    allowed.update(self._files.get(name, {}).get("doc_ids", []))
+
+            doc_count = len(self._docs)
+            if not doc_count:
+                return []
+            average_length = self._total_length / doc_count
+
+            scores = Counter()
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    length = self._docs[doc_id][3]
+                    scores[doc_id] += idf * frequency * (self.K1 + 1) / (
+                        frequency + self.K1 * (1 - self.B + self.B * length / average_length)
+                    )
+
+            return [{
+                "report": self._docs[doc_id][0],
+                "position": self._docs[doc_id][1],
+                "text": self._docs[doc_id][2],
+                "score": round(score, 4)
+            } for doc_id, score in scores.most_common(top_k)]
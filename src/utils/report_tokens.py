@@ -0,0 +1,236 @@
+# src/utils/report_tokens.py
+import os
+import re
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.response_cache import file_digest
+
+# Lines worth keeping when the budget is tight
+FINDING_PATTERN = re.compile(
+    rb"error|fail|denied|warning|suspicious|malware|vulnerab|unauthori|critical|exploit|blocked",
+    re.IGNORECASE
+)
+ESCAPED_BYTE_PATTERN = re.compile("[\udc80-\udcff]")
+
+STRATEGIES = ("proportional", "recency", "findings")
+
+
+def utf8_byte_lengths(text: str) -> np.ndarray:
+    """Encoded length of each character, counting surrogate-escaped bytes as one"""
+    codepoints = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    lengths = np.select(
+        [codepoints < 0x80, codepoints < 0x800, (codepoints >= 0xDC80) & (codepoints <= 0xDCFF), codepoints < 0x10000],
+        [1, 2, 1, 3],
+        default=4
+    )
+    return lengths.astype(np.int64)
+
+
+class ReportTokenCache:
+    """Token ids and byte offsets of each report, computed once per file content.
+
+    Entries are stored on disk as ``<sha256>.npz`` so a report is tokenized a
+    single time no matter how many questions are asked about it. In memory,
+    reports are tracked by (mtime, size) to avoid re-hashing unchanged files.
+
+    With ``transform(name, text)`` set, the transformed text is what gets
+    tokenized and prompted; it is saved next to the tokens and the entry's
+    ``source`` points at it, so byte offsets refer to that file.
+    ``transform_id`` names the transform's output format in cache file names.
+    """
+    def __init__(
+        self,
+        cache_dir: str,
+        tokenize: Callable[[str], Tuple[List[int], List[int]]],
+        transform: Optional[Callable[[str, str], str]] = None,
+        transform_id: str = ""
+    ):
+        self.cache_dir = cache_dir
+        self.tokenize = tokenize
+        self.transform = transform
+        self.suffix = f"-{transform_id}" if transform else ""
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._entries = {}  # report path -> entry (see _load)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, path: str) -> Dict[str, Any]:
+        """Return {digest, tokens, findings, mtime, byte_ends, source} for a report"""
+        stat = os.stat(path)
+        signature = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry["signature"] == signature:
+            return entry
+
+        entry = self._load(path, file_digest(path))
+        entry.update(signature=signature, mtime=stat.st_mtime)
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+    def warm(self, reports_dir: str) -> int:
+        """Tokenize reports that are not cached yet; returns how many were processed"""
+        processed = 0
+        if not os.path.isdir(reports_dir):
+            return processed
+        for name in sorted(os.listdir(reports_dir)):
+            if not name.endswith(('.txt', '.json')):
+                continue
+            path = os.path.join(reports_dir, name)
+            with self._lock:
+                known = path in self._entries
+            try:
+                self.get(path)
+                processed += not known
+            except Exception as e:
+                self.logger.warning(f"Could not tokenize report {name}: {str(e)}")
+        return processed
+
+    def _load(self, path: str, digest: str) -> Dict[str, Any]:
+        cache_path = os.path.join(self.cache_dir, f"{digest}{self.suffix}.npz")
+        transformed_path = os.path.join(self.cache_dir, f"{digest}{self.suffix}.txt")
+        try:
+            with np.load(cache_path) as cached:
+                transformed = bool(cached["transformed"]) if "transformed" in cached else False
+                if not transformed or os.path.exists(transformed_path):
+                    return {
+                        "digest": digest,
+                        "tokens": int(cached["ids"].shape[0]),
+                        "findings": int(cached["findings"]),
+                        "byte_ends": cached["byte_ends"],
+                        "source": transformed_path if transformed else path
+                    }
+        except (OSError, KeyError, ValueError):
+            pass
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        # surrogateescape keeps one character per undecodable byte so offsets stay exact
+        text = raw.decode("utf-8", errors="surrogateescape")
+        source = path
+        if self.transform:
+            original = raw.decode("utf-8", errors="replace")
+            rewritten = self.transform(os.path.basename(path), original)
+            if rewritten != original:
+                text, source = rewritten, transformed_path
+        ids, char_ends = self.tokenize(ESCAPED_BYTE_PATTERN.sub("\ufffd", text))
+        byte_offsets = np.concatenate([[0], np.cumsum(utf8_byte_lengths(text))])
+        byte_ends = byte_offsets[np.asarray(char_ends, dtype=np.int64)] if len(char_ends) else np.zeros(0, dtype=np.int64)
+        findings = sum(1 for line in raw.splitlines() if FINDING_PATTERN.search(line))
+
+        try:
+            if source != path:
+                with open(transformed_path, "w", encoding="utf-8") as f:
+                    f.write(text)
+            np.savez(
+                cache_path,
+                ids=np.asarray(ids, dtype=np.int32),
+                byte_ends=byte_ends,
+                findings=findings,
+                transformed=source != path
+            )
+        except OSError as e:
+            self.logger.warning(f"Could not persist report tokens: {str(e)}")
+        return {"digest": digest, "tokens": len(ids), "findings": findings, "byte_ends": byte_ends, "source": source}
+
+
+def allocate_budget(reports: List[Dict[str, Any]], budget: int, strategy: str = "proportional") -> List[int]:
+    """Split a token budget across reports, returning tokens allotted to each.
+
+    proportional: every report gets an even floor of half the budget, and the
+        rest is split in proportion to what each report still needs.
+    recency: newest reports are included in full first.
+    findings: reports with the highest density of error/warning lines first.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown budget strategy: {strategy}")
+    allocation = [0] * len(reports)
+    budget = max(0, budget)
+
+    if strategy == "proportional":
+        if not reports:
+            return allocation
+        # Half the budget is shared evenly so one huge report cannot crowd out the rest
+        floor = budget // (2 * len(reports))
+        for i, report in enumerate(reports):
+            allocation[i] = min(report["tokens"], floor)
+        budget -= sum(allocation)
+        missing = [report["tokens"] - allocation[i] for i, report in enumerate(reports)]
+        total_missing = sum(missing)
+        if total_missing:
+            for i in range(len(reports)):
+                allocation[i] += min(missing[i], int(budget * missing[i] / total_missing))
+        return allocation
+
+    if strategy == "recency":
+        order = sorted(range(len(reports)), key=lambda i: reports[i]["mtime"], reverse=True)
+    else:
+        order = sorted(range(len(reports)), key=lambda i: reports[i]["findings"] / max(1, reports[i]["tokens"]), reverse=True)
+    for i in order:
+        allocation[i] = min(reports[i]["tokens"], budget)
+        budget -= allocation[i]
+    return allocation
+
+
+class TokenBudgetPlanner:
+    """Decides how much of each selected report fits in the model context.
+
+    The plan is computed from cached token offsets alone, so it can be shown to
+    the user before anything is read or generated; ``read`` then loads only the
+    planned byte range of each report.
+    """
+    # Slack per report for tokens that merge across the boundaries between reports
+    BOUNDARY_TOKENS = 4
+
+    def __init__(self, token_cache: ReportTokenCache, reports_dir: str):
+        self.token_cache = token_cache
+        self.reports_dir = reports_dir
+
+    def plan(self, selected_logs: List[str], budget: int, strategy: str = "proportional") -> Dict[str, Any]:
+        """Allocate ``budget`` prompt tokens across the selected reports"""
+        reports = []
+        for name in selected_logs:
+            path = os.path.join(self.reports_dir, name)
+            if os.path.exists(path):
+                entry = self.token_cache.get(path)
+                reports.append(dict(entry, name=name, path=path))
+
+        usable = budget - self.BOUNDARY_TOKENS * len(reports)
+        allocation = allocate_budget(reports, usable, strategy)
+
+        planned = []
+        for report, tokens in zip(reports, allocation):
+            byte_end = int(report["byte_ends"][tokens - 1]) if tokens else 0
+            planned.append({
+                "name": report["name"],
+                "tokens": report["tokens"],
+                "allocated_tokens": tokens,
+                "coverage": round(tokens / report["tokens"], 3) if report["tokens"] else 1.0,
+                "findings": report["findings"],
+                "bytes": byte_end,
+                "truncated": tokens < report["tokens"]
+            })
+        return {
+            "strategy": strategy,
+            "budget": budget,
+            "total_tokens": sum(report["tokens"] for report in planned),
+            "allocated_tokens": sum(report["allocated_tokens"] for report in planned),
+            "reports": planned
+        }
+
+    def read(self, plan: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """Read the planned prefix of each report, returning (name, content) pairs"""
+        log_contents = []
+        for report in plan["reports"]:
+            if not report["bytes"]:
+                continue
+            source = self.token_cache.get(os.path.join(self.reports_dir, report["name"]))["source"]
+            with open(source, "rb") as f:
+                content = f.read(report["bytes"]).decode("utf-8", errors="ignore")
+            log_contents.append((report["name"], content))
+        return log_contents
@@ -0,0 +1,120 @@
+# src/utils/response_cache.py
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question"""
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip("?.! ")
+
+
+class ResponseCache:
+    """LRU cache of LLM responses in memory, backed by a size-bounded on-disk store.
+
+    Entries are keyed on the normalized question, the content hashes of the
+    analyzed reports and the generation parameters, so a cached answer is only
+    reused when all three match.
+    """
+    def __init__(self, cache_dir: str, max_entries: int = 128, max_bytes: int = 64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(question: str, content_hashes: Iterable[str], params: Dict[str, Any]) -> str:
+        """Build the cache key for a question over a set of reports"""
+        payload = json.dumps({
+            "question": normalize_question(question),
+            "contents": sorted(content_hashes),
+            "params": params
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for a key, checking memory then disk"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            path = self._path(key)
+            try:
+                with open(path, "r") as f:
+                    entry = json.load(f)
+                os.utime(path)  # Mark as recently used for disk eviction
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+
+            self._remember(key, entry)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        """Store an entry in memory and on disk, evicting old entries as needed"""
+        with self._lock:
+            self._remember(key, entry)
+            try:
+                with open(self._path(key), "w") as f:
+                    json.dump(entry, f)
+                self._evict_disk()
+            except OSError as e:
+                self.logger.warning(f"Could not persist cached response: {str(e)}")
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """Remove least recently used files until the store fits in max_bytes"""
+        files = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                files.append((stat.st_mtime, stat.st_size, name))
+                total += stat.st_size
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            self._memory.pop(name[:-len(".json")], None)
+            total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for response metadata"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory)
+        }
@@ -0,0 +1,175 @@
+# src/utils/results_store.py
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class LLMResultsStore:
+    """Append-only history of LLM analyses in SQLite (WAL mode).
+
+    Each save is a single INSERT, so writes stay O(1) regardless of history
+    size, and SQLite's locking keeps concurrent writers from different threads
+    or worker processes from losing entries. Retention is enforced by age and
+    entry count every ``PRUNE_INTERVAL`` writes.
+    """
+    PRUNE_INTERVAL = 100
+    MAX_PAGE_SIZE = 200
+
+    def __init__(self, data_dir: str, retention_days: Optional[int] = 90, max_entries: Optional[int] = 10000):
+        os.makedirs(data_dir, exist_ok=True)
+        self.db_path = os.path.join(data_dir, "llm_results.db")
+        self.retention_days = retention_days
+        self.max_entries = max_entries
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        self._writes = 0
+
+        # Setup uses a short-lived connection so nothing is left open if the app forks workers
+        with closing(self._connect()) as connection, connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created REAL NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    logs_analyzed TEXT NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+            self._import_legacy(connection, os.path.join(data_dir, "llm_scan_results.json"))
+            self._prune(connection)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread and process; sqlite3 connections are not shareable"""
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _import_legacy(self, connection: sqlite3.Connection, legacy_file: str) -> None:
+        """Move entries from the old rewrite-whole-file JSON history into the store.
+
+        All entries are inserted in one transaction that is rolled back on any
+        error. Entries already present (same timestamp and question) are
+        skipped, in case the file could not be renamed after an earlier import.
+        """
+        if not os.path.exists(legacy_file):
+            return
+        connection.commit()
+        try:
+            with open(legacy_file, "r") as f:
+                legacy = json.load(f)
+            imported = 0
+            for entry in legacy:
+                timestamp = entry.get("timestamp") or datetime.now().isoformat()
+                question = entry.get("question", "")
+                imported += connection.execute(
+                    "INSERT INTO results (created, timestamp, question, response, logs_analyzed) "
+                    "SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM results WHERE timestamp = ? AND question = ?)",
+                    (datetime.fromisoformat(timestamp).timestamp(), timestamp, question, entry.get("response", ""),
+                     json.dumps(entry.get("logs_analyzed", [])), timestamp, question)
+                ).rowcount
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            self.logger.warning(f"Could not import legacy results: {str(e)}")
+            return
+
+        try:
+            os.replace(legacy_file, legacy_file + ".imported")
+        except OSError as e:
+            self.logger.warning(f"Could not rename imported legacy results: {str(e)}")
+        self.logger.info(f"Imported {imported} of {len(legacy)} result(s) from {legacy_file}")
+
+    def save_result(self, question: str, response: str, logs_analyzed: List[str]) -> int:
+        """Append one analysis and return its id"""
+        now = datetime.now()
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO results (created, timestamp, question, response, logs_analyzed) VALUES (?, ?, ?, ?, ?)",
+                (now.timestamp(), now.isoformat(), question, response, json.dumps(logs_analyzed))
+            )
+        self._writes += 1
+        if self._writes % self.PRUNE_INTERVAL == 0:
+            self.prune()
+        return cursor.lastrowid
+
+    def prune(self) -> int:
+        """Drop entries older than the retention period or beyond max_entries"""
+        connection = self._connection()
+        with connection:
+            return self._prune(connection)
+
+    def _prune(self, connection: sqlite3.Connection) -> int:
+        deleted = 0
+        if self.retention_days:
+            cutoff = time.time() - self.retention_days * 86400
+            deleted += connection.execute("DELETE FROM results WHERE created < ?", (cutoff,)).rowcount
+        if self.max_entries:
+            deleted += connection.execute(
+                "DELETE FROM results WHERE id <= (SELECT MAX(id) FROM results) - ?", (self.max_entries,)
+            ).rowcount
+        return deleted
+
+    def query(
+        self,
+        limit: int = 10,
+        before_id: Optional[int] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        text: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Return a page of results, newest first.
+
+        ``since``/``until`` are ISO timestamps, ``text`` matches the question or
+        response case-insensitively, and ``before_id`` is the ``next_before_id``
+        of the previous page.
+        """
+        clauses, params = [], []
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if since:
+            clauses.append("created >= ?")
+            params.append(datetime.fromisoformat(since).timestamp())
+        if until:
+            clauses.append("created <= ?")
+            params.append(datetime.fromisoformat(until).timestamp())
+        if text:
+            pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append("(question LIKE ? ESCAPE '\\' OR response LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+
+        limit = max(1, min(limit, self.MAX_PAGE_SIZE))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT id, timestamp, question, response, logs_analyzed FROM results {where} ORDER BY id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+
+        results = [{
+            "id": row["id"],
+            "timestamp": row["timestamp"],
+            "question": row["question"],
+            "response": row["response"],
+            "logs_analyzed": json.loads(row["logs_analyzed"])
+        } for row in rows[:limit]]
+        return {
+            "results": results,
+            "next_before_id": results[-1]["id"] if len(rows) > limit else None
+        }
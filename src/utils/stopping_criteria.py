@@ -0,0 +1,191 @@
+# src/utils/stopping_criteria.py
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import torch
+from transformers import StoppingCriteria
+
+# Headers of the answer structure the LLM analysis page parses
+SECTION_HEADERS = ("Answer:", "Detailed Explanation:", "Practical Tips:")
+# A blank line followed by something that is not a list item ends the tips
+SECTION_END_PATTERN = re.compile(r"\n[ \t]*\n(?=[ \t]*[^\s\-\*•\d])|\n[ \t]*(?=Answer:)")
+# Error of a generation ended by InterruptCriteria
+GENERATION_INTERRUPTED = "Generation interrupted"
+
+
+class AnswerStoppingCriteria(StoppingCriteria):
+    """Ends generation once every row's answer is complete.
+
+    A row is complete when it emits EOS, produces one of ``stop_sequences``,
+    finishes the Practical Tips section (when ``stop_on_sections`` is set) or
+    starts repeating a block of up to ``repetition_max_period`` tokens. The
+    text up to the stopping point is kept in ``stops`` so callers can drop
+    whatever the row generated afterwards while other rows were finishing.
+    """
+    # Generated tokens inspected by the repetition detector
+    REPETITION_LOOKBACK = 256
+
+    def __init__(
+        self,
+        tokenizer,
+        prompt_length: int,
+        stop_sequences: Sequence[str] = (),
+        stop_on_sections: bool = True,
+        repetition_max_period: int = 32,
+        repetition_min_span: int = 48
+    ):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop_sequences = [sequence for sequence in stop_sequences if sequence]
+        self.stop_on_sections = stop_on_sections
+        self.repetition_max_period = repetition_max_period
+        self.repetition_min_span = repetition_min_span
+        self.stops = {}  # row -> {"reason", "text", "tokens"}
+        self._decoded = {}  # row -> incremental decode state, see decoded_text
+        self._longest_stop = max([len(sequence) for sequence in self.stop_sequences] + [len(SECTION_HEADERS[-1])])
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        for row in range(input_ids.shape[0]):
+            if row in self.stops:
+                continue
+            generated = input_ids[row, self.prompt_length:].tolist()
+            stop = self.check(generated, row)
+            if stop is not None:
+                self.stops[row] = dict(stop, tokens=len(generated))
+        return len(self.stops) == input_ids.shape[0]
+
+    def decoded_text(self, row: int, generated: List[int]) -> Tuple[str, int]:
+        """Text of a row's generated tokens and the offset new text starts at since the last call.
+
+        Each step decodes the tokens from the previous step on and keeps what
+        goes past the previous step's text, so a step costs the same however
+        long the answer is. State is dropped when ``generated`` is not a continuation of
+        the tokens seen before.
+        """
+        state = self._decoded.get(row)
+        if state is None or len(generated) < state["read"] or \
+                generated[state["prefix"]:state["read"]] != state["window"]:
+            state = {"prefix": 0, "read": 0, "window": [], "window_text": "", "text": ""}
+            self._decoded[row] = state
+        previous = len(state["text"])
+        if len(generated) > state["read"]:
+            tail = self.tokenizer.decode(generated[state["prefix"]:], skip_special_tokens=True)
+            # Wait for the rest of a multi-byte character
+            if len(tail) > len(state["window_text"]) and not tail.endswith("\ufffd"):
+                state["text"] += tail[len(state["window_text"]):]
+                state["prefix"], state["read"] = state["read"], len(generated)
+                state["window"] = generated[state["prefix"]:state["read"]]
+                # Decoded on its own so it matches the start of the next tail decode
+                state["window_text"] = self.tokenizer.decode(state["window"], skip_special_tokens=True)
+        return state["text"], previous
+
+    def check(self, generated: List[int], row: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Return {"reason", "text"} if a row with these generated tokens is complete.
+
+        With ``row`` set, text is decoded incrementally across calls.
+        """
+        if self.tokenizer.eos_token_id in generated:
+            return {"reason": "eos", "text": None}
+        if row is None:
+            text, start = self.tokenizer.decode(generated, skip_special_tokens=True), 0
+        else:
+            text, start = self.decoded_text(row, generated)
+        return self.check_text(text, generated, start)
+
+    def check_text(self, text: str, generated: List[int], start: int = 0) -> Optional[Dict[str, Any]]:
+        """Stop checks on decoded text; ``text[:start]`` was already checked by an earlier call.
+
+        Only the last ``REPETITION_LOOKBACK`` entries of ``generated`` are
+        needed to detect a stop, though the repetition text is decoded from all
+        of them.
+        """
+        # A stop string may straddle the old and new text
+        search_from = max(0, start - self._longest_stop)
+        for sequence in self.stop_sequences:
+            position = text.find(sequence, search_from)
+            if position != -1:
+                return {"reason": "stop_sequence", "text": text[:position]}
+
+        if self.stop_on_sections:
+            tips = text.find(SECTION_HEADERS[-1])
+            if tips != -1:
+                body_start = tips + len(SECTION_HEADERS[-1])
+                body = text[body_start:]
+                end = SECTION_END_PATTERN.search(body)
+                if end and body[:end.start()].strip():
+                    return {"reason": "section_complete", "text": text[:body_start + end.start()]}
+
+        period = self.repetition_period(generated[-self.REPETITION_LOOKBACK:])
+        if period:
+            length, repeats = period
+            kept = generated[:len(generated) - length * (repeats - 1)]
+            return {"reason": "repetition", "text": self.tokenizer.decode(kept, skip_special_tokens=True)}
+        return None
+
+    def stop_on_text(self, text: str) -> bool:
+        """Whether streamed ``text`` is complete, for backends that get text rather than tokens.
+
+        Only the tail is tokenized for the repetition check; the stop itself
+        is recorded when the backend calls the criteria on the final tokens.
+        """
+        tail = self.tokenizer(text[-self.REPETITION_LOOKBACK * 8:], add_special_tokens=False)['input_ids']
+        return self.check_text(text, tail) is not None
+
+    def repetition_period(self, tokens: List[int]) -> Optional[Tuple[int, int]]:
+        """(period, repeats) when the tail is the same block of tokens repeated back to back"""
+        for length in range(1, self.repetition_max_period + 1):
+            repeats = max(3, -(-self.repetition_min_span // length))
+            span = length * repeats
+            if span > len(tokens):
+                continue
+            tail = tokens[-span:]
+            if all(tail[i * length:(i + 1) * length] == tail[:length] for i in range(1, repeats)):
+                return length, repeats
+        return None
+
+    def finish(self, row: int, text: str, generated_tokens: int, max_new_tokens: int) -> Dict[str, Any]:
+        """Final text for a row plus stop metadata ({stop_reason, tokens_saved})"""
+        stop = self.stops.get(row)
+        if stop is None:
+            reason = "max_new_tokens" if generated_tokens >= max_new_tokens else "eos"
+            return {"text": text, "stop_reason": reason, "tokens_saved": 0}
+        if stop["reason"] == "eos":
+            return {"text": text, "stop_reason": "eos", "tokens_saved": 0}
+        return {
+            "text": stop["text"],
+            "stop_reason": stop["reason"],
+            "tokens_saved": max(0, max_new_tokens - stop["tokens"])
+        }
+
+    def kept_tokens(self, row: int, generated: List[int]) -> int:
+        """How many generated tokens make up the text ``finish`` returns for a row"""
+        stop = self.stops.get(row)
+        if stop is None or stop["reason"] == "eos":
+            if self.tokenizer.eos_token_id in generated:
+                return generated.index(self.tokenizer.eos_token_id)
+            return len(generated)
+        # Smallest prefix whose decoded text covers the kept text
+        low, high = 0, stop["tokens"]
+        while low < high:
+            middle = (low + high) // 2
+            if len(self.tokenizer.decode(generated[:middle], skip_special_tokens=True)) >= len(stop["text"]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+
+class InterruptCriteria(StoppingCriteria):
+    """Ends generation once ``should_stop()`` returns True, e.g. so background work gives way to a request.
+
+    ``interrupted`` stays set afterwards, so later generations sharing the
+    criteria stop straight away.
+    """
+    def __init__(self, should_stop: Callable[[], bool]):
+        self.should_stop = should_stop
+        self.interrupted = False
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        if not self.interrupted and self.should_stop():
+            self.interrupted = True
+        return self.interrupted